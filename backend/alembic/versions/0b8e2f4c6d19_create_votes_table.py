@@ -0,0 +1,51 @@
+"""create votes table
+
+Revision ID: 0b8e2f4c6d19
+Revises: c6f1d8e4a2b7
+Create Date: 2026-10-19 10:12:44.508231
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0b8e2f4c6d19'
+down_revision: Union[str, Sequence[str], None] = 'c6f1d8e4a2b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 981611951072 was generated empty; databases set up before the app
+    # stopped calling create_all() already have the table
+    if sa.inspect(op.get_bind()).has_table('votes'):
+        return
+    op.create_table('votes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('response_id', sa.Integer(), nullable=False),
+    sa.Column('type', sa.Enum('up', 'down', name='votetype'), nullable=False),
+    sa.ForeignKeyConstraint(['response_id'], ['responses.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'response_id', name='unique_user_response_vote')
+    )
+    op.create_index(op.f('ix_votes_id'), 'votes', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema.
+
+    Destructive: drops the votes, also when the table predates the upgrade
+    (which then had nothing to do). Back them up before downgrading.
+    """
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('votes'):
+        return
+    if 'ix_votes_id' in {index['name'] for index in inspector.get_indexes('votes')}:
+        op.drop_index(op.f('ix_votes_id'), table_name='votes')
+    op.drop_table('votes')
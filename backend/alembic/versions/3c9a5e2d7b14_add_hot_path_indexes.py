@@ -0,0 +1,32 @@
+"""add hot path indexes
+
+Revision ID: 3c9a5e2d7b14
+Revises: 981611951072
+Create Date: 2026-10-18 09:12:41.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9a5e2d7b14'
+down_revision: Union[str, Sequence[str], None] = '981611951072'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_responses_discussion_id_status_aprovacao', 'responses', ['discussion_id', 'status_aprovacao'], unique=False)
+    op.create_index('ix_responses_status_aprovacao', 'responses', ['status_aprovacao'], unique=False)
+    op.create_index('ix_responses_parent_id_user_id', 'responses', ['parent_id', 'user_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_responses_parent_id_user_id', table_name='responses')
+    op.drop_index('ix_responses_status_aprovacao', table_name='responses')
+    op.drop_index('ix_responses_discussion_id_status_aprovacao', table_name='responses')
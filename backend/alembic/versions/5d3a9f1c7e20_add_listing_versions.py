@@ -0,0 +1,33 @@
+"""add listing versions
+
+Revision ID: 5d3a9f1c7e20
+Revises: 0b8e2f4c6d19
+Create Date: 2026-10-19 15:03:27.640182
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d3a9f1c7e20'
+down_revision: Union[str, Sequence[str], None] = '0b8e2f4c6d19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    listing_versions = op.create_table('listing_versions',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(listing_versions, [{'name': 'discussions', 'version': 0}])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('listing_versions')
@@ -0,0 +1,34 @@
+"""add keyset pagination indexes
+
+Revision ID: 7e1f0b6a9c42
+Revises: 3c9a5e2d7b14
+Create Date: 2026-10-18 11:03:27.518240
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e1f0b6a9c42'
+down_revision: Union[str, Sequence[str], None] = '3c9a5e2d7b14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_discussions_created_at_id', 'discussions', ['created_at', 'id'], unique=False)
+    # Create the wider index before dropping the old one: MySQL may be using
+    # the old one to back the discussion_id foreign key.
+    op.create_index('ix_responses_discussion_id_status_aprovacao_created_at', 'responses', ['discussion_id', 'status_aprovacao', 'created_at', 'id'], unique=False)
+    op.drop_index('ix_responses_discussion_id_status_aprovacao', table_name='responses')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_responses_discussion_id_status_aprovacao', 'responses', ['discussion_id', 'status_aprovacao'], unique=False)
+    op.drop_index('ix_responses_discussion_id_status_aprovacao_created_at', table_name='responses')
+    op.drop_index('ix_discussions_created_at_id', table_name='discussions')
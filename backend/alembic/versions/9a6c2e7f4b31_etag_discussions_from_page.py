@@ -0,0 +1,37 @@
+"""etag discussions from page
+
+Revision ID: 9a6c2e7f4b31
+Revises: 5d3a9f1c7e20
+Create Date: 2026-10-20 11:26:51.093417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a6c2e7f4b31'
+down_revision: Union[str, Sequence[str], None] = '5d3a9f1c7e20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_discussions_created_at_id_version', 'discussions', ['created_at', 'id', 'version'], unique=False)
+    op.drop_index('ix_discussions_created_at_id', table_name='discussions')
+    op.drop_table('listing_versions')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    listing_versions = op.create_table('listing_versions',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(listing_versions, [{'name': 'discussions', 'version': 0}])
+    op.create_index('ix_discussions_created_at_id', 'discussions', ['created_at', 'id'], unique=False)
+    op.drop_index('ix_discussions_created_at_id_version', table_name='discussions')
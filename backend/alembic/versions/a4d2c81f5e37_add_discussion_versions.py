@@ -0,0 +1,30 @@
+"""add discussion versions
+
+Revision ID: a4d2c81f5e37
+Revises: 7e1f0b6a9c42
+Create Date: 2026-10-18 14:22:09.361527
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4d2c81f5e37'
+down_revision: Union[str, Sequence[str], None] = '7e1f0b6a9c42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('discussions', sa.Column('version', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('discussions', sa.Column('responses_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('discussions', 'responses_version')
+    op.drop_column('discussions', 'version')
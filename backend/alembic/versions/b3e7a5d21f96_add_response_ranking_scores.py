@@ -0,0 +1,37 @@
+"""add response ranking scores
+
+Revision ID: b3e7a5d21f96
+Revises: f2a9d6c3e814
+Create Date: 2026-10-18 19:03:15.772640
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3e7a5d21f96'
+down_revision: Union[str, Sequence[str], None] = 'f2a9d6c3e814'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema.
+
+    The scores start at 0: compute them with `python -m app.db.ranking`.
+    """
+    op.add_column('responses', sa.Column('score_top', sa.BigInteger(), server_default='0', nullable=False))
+    op.add_column('responses', sa.Column('score_hot', sa.BigInteger(), server_default='0', nullable=False))
+    op.create_index('ix_responses_discussion_id_status_aprovacao_score_top', 'responses', ['discussion_id', 'status_aprovacao', 'score_top', 'id'], unique=False)
+    op.create_index('ix_responses_discussion_id_status_aprovacao_score_hot', 'responses', ['discussion_id', 'status_aprovacao', 'score_hot', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_responses_discussion_id_status_aprovacao_score_hot', table_name='responses')
+    op.drop_index('ix_responses_discussion_id_status_aprovacao_score_top', table_name='responses')
+    op.drop_column('responses', 'score_hot')
+    op.drop_column('responses', 'score_top')
@@ -0,0 +1,35 @@
+"""add rate limit counters
+
+Revision ID: c6f1d8e4a2b7
+Revises: b3e7a5d21f96
+Create Date: 2026-10-18 19:41:08.214357
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c6f1d8e4a2b7'
+down_revision: Union[str, Sequence[str], None] = 'b3e7a5d21f96'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('rate_limit_counters',
+    sa.Column('key', sa.String(length=255), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('expires_at', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index('ix_rate_limit_counters_expires_at', 'rate_limit_counters', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_rate_limit_counters_expires_at', table_name='rate_limit_counters')
+    op.drop_table('rate_limit_counters')
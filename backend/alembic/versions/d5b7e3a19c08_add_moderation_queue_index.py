@@ -0,0 +1,30 @@
+"""add moderation queue index
+
+Revision ID: d5b7e3a19c08
+Revises: a4d2c81f5e37
+Create Date: 2026-10-18 16:40:51.204117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5b7e3a19c08'
+down_revision: Union[str, Sequence[str], None] = 'a4d2c81f5e37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_responses_status_aprovacao_created_at', 'responses', ['status_aprovacao', 'created_at', 'id'], unique=False)
+    op.drop_index('ix_responses_status_aprovacao', table_name='responses')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_responses_status_aprovacao', 'responses', ['status_aprovacao'], unique=False)
+    op.drop_index('ix_responses_status_aprovacao_created_at', table_name='responses')
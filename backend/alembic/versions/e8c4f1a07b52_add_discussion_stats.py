@@ -0,0 +1,49 @@
+"""add discussion stats
+
+Revision ID: e8c4f1a07b52
+Revises: d5b7e3a19c08
+Create Date: 2026-10-18 17:05:32.918406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8c4f1a07b52'
+down_revision: Union[str, Sequence[str], None] = 'd5b7e3a19c08'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('discussions', sa.Column('agree_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('discussions', sa.Column('disagree_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('discussions', sa.Column('pending_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('discussions', sa.Column('total_votes', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('discussions', sa.Column('last_activity_at', sa.DateTime(timezone=True), nullable=True))
+    # Same as `python -m app.db.stats`
+    op.execute(
+        "UPDATE discussions SET "
+        "agree_count = (SELECT COUNT(*) FROM responses WHERE responses.discussion_id = discussions.id "
+        "AND status_aprovacao = 'aprovada' AND type = 'concordo'), "
+        "disagree_count = (SELECT COUNT(*) FROM responses WHERE responses.discussion_id = discussions.id "
+        "AND status_aprovacao = 'aprovada' AND type = 'discordo'), "
+        "pending_count = (SELECT COUNT(*) FROM responses WHERE responses.discussion_id = discussions.id "
+        "AND status_aprovacao = 'pendente'), "
+        "total_votes = (SELECT COALESCE(SUM(COALESCE(upvotes, 0) + COALESCE(downvotes, 0)), 0) FROM responses "
+        "WHERE responses.discussion_id = discussions.id), "
+        "last_activity_at = (SELECT MAX(created_at) FROM responses WHERE responses.discussion_id = discussions.id)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('discussions', 'last_activity_at')
+    op.drop_column('discussions', 'total_votes')
+    op.drop_column('discussions', 'pending_count')
+    op.drop_column('discussions', 'disagree_count')
+    op.drop_column('discussions', 'agree_count')
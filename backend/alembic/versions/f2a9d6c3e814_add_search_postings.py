@@ -0,0 +1,41 @@
+"""add search postings
+
+Revision ID: f2a9d6c3e814
+Revises: e8c4f1a07b52
+Create Date: 2026-10-18 18:12:47.530291
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a9d6c3e814'
+down_revision: Union[str, Sequence[str], None] = 'e8c4f1a07b52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema.
+
+    The index starts empty: fill it with `python -m app.db.search`.
+    """
+    op.create_table('search_postings',
+    sa.Column('term', sa.String(length=64), nullable=False),
+    sa.Column('doc_type', sa.Enum('discussion', 'response', name='searchdoctype'), nullable=False),
+    sa.Column('doc_id', sa.Integer(), nullable=False),
+    sa.Column('discussion_id', sa.Integer(), nullable=False),
+    sa.Column('weight', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['discussion_id'], ['discussions.id'], ),
+    sa.PrimaryKeyConstraint('term', 'doc_type', 'doc_id')
+    )
+    op.create_index('ix_search_postings_doc_type_doc_id', 'search_postings', ['doc_type', 'doc_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_search_postings_doc_type_doc_id', table_name='search_postings')
+    op.drop_table('search_postings')
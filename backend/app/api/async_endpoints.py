@@ -0,0 +1,65 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Union
+from ..db import database, models
+from .. import schemas
+from ..core import texts
+from . import auth, endpoints
+from .etags import check_etag
+from .fastjson import fast_json
+from ..core.limiter import limiter
+from fastapi import Request, Response
+
+# Non-blocking versions of the read endpoints, mounted ahead of the sync router
+# when DB_ASYNC is enabled. The queries are the ones in endpoints.py, run on the
+# async connection through run_sync, so both paths return the same data.
+router = APIRouter()
+
+@router.get("/users/me", response_model=schemas.UserOut)
+@limiter.limit("60/minute")
+async def read_users_me(request: Request, current_user: models.User = Depends(auth.get_current_user_async)):
+    return current_user
+
+@router.get("/discussions/", response_model=List[schemas.DiscussionOut])
+@limiter.limit("60/minute")
+async def read_discussions(request: Request, response: Response, cursor: Optional[str] = None, limit: Optional[int] = None, db: AsyncSession = Depends(database.get_async_db)):
+    not_modified = check_etag(request, response, await db.run_sync(endpoints.discussions_etag, cursor, limit))
+    if not_modified:
+        return not_modified
+    return fast_json(await db.run_sync(endpoints.list_discussions, cursor, limit, response), response)
+
+@router.get("/discussions/{discussion_id}", response_model=schemas.DiscussionOut)
+@limiter.limit("60/minute")
+async def read_discussion(request: Request, response: Response, discussion_id: int, db: AsyncSession = Depends(database.get_async_db)):
+    not_modified = check_etag(request, response, await db.run_sync(endpoints.discussion_etag, discussion_id))
+    if not_modified:
+        return not_modified
+    return await db.run_sync(endpoints.get_discussion, discussion_id)
+
+@router.get("/discussions/{discussion_id}/responses/", response_model=Union[List[schemas.ResponseOut], List[schemas.ResponseTreeOut]])
+@limiter.limit("60/minute")
+async def read_responses(
+    request: Request,
+    response: Response,
+    discussion_id: int,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    sort: schemas.ResponseSort = schemas.ResponseSort.new,
+    tree: bool = False,
+    parent_id: Optional[int] = None,
+    replies: Optional[int] = None,
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: Optional[models.User] = Depends(auth.get_current_user_optional_async)
+):
+    if tree and sort != schemas.ResponseSort.new:
+        raise HTTPException(status_code=400, detail=texts.ERROR_TREE_SORT)
+    version = await db.run_sync(endpoints.responses_version, discussion_id)
+    not_modified = check_etag(request, response, endpoints.responses_etag(version, discussion_id, current_user), vary="Cookie")
+    if not_modified:
+        return not_modified
+    if tree:
+        items = await db.run_sync(
+            endpoints.list_response_tree, discussion_id, version, parent_id, cursor, limit, replies, response, current_user)
+    else:
+        items = await db.run_sync(endpoints.list_responses, discussion_id, version, cursor, limit, response, current_user, sort)
+    return fast_json(items, response)
@@ -1,22 +1,32 @@
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status, Cookie
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from ..core import config, texts
-from ..db import database, models
+from ..core import config, security, texts
+from ..core.cache import TTLCache
+from ..db import database, models, replicas
 from .. import schemas
 
-pwd_context = CryptContext(schemes=["sha256_crypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
+# Authenticated users by token subject (email). Entries are detached UserOut
+# snapshots, not ORM objects, so they can be shared between requests. Call
+# user_cache.invalidate(email) whenever a user's row changes; other workers
+# keep their copy up to USER_CACHE_TTL, so the admin and moderator checks
+# read the role from the database instead.
+user_cache = TTLCache(config.USER_CACHE_SIZE, config.USER_CACHE_TTL, "users")
+
+# Both run in the hashing process pool (core/security.py). Callers should not
+# hold a database connection while they wait.
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return security.run_hashing(security.check_password, plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return security.run_hashing(security.hash_password, password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -28,51 +38,103 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, config.SECRET_KEY, algorithm=config.ALGORITHM)
     return encoded_jwt
 
-def get_current_user(access_token: Optional[str] = Cookie(None), db: Session = Depends(database.get_db)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail=texts.ERROR_INVALID_CREDENTIALS,
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+def get_token_data(access_token: Optional[str]) -> Optional[schemas.TokenData]:
+    """Decode the access token cookie, returning None if it is missing or invalid."""
     if not access_token:
-        raise credentials_exception
+        return None
     token = access_token.replace("Bearer ", "")
     try:
         payload = jwt.decode(token, config.SECRET_KEY, algorithms=[config.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-        token_data = schemas.TokenData(email=email)
     except JWTError:
-        raise credentials_exception
-    user = db.query(models.User).filter(models.User.email == token_data.email).first()
+        return None
+    email: str = payload.get("sub")
+    if email is None:
+        return None
+    return schemas.TokenData(email=email)
+
+def snapshot_user(db_user: models.User) -> schemas.UserOut:
+    return schemas.UserOut(id=db_user.id, email=db_user.email, name=db_user.name, role=db_user.role)
+
+def load_user(db: Session, email: str, fresh: bool = False) -> Optional[schemas.UserOut]:
+    """The user named by a token, from user_cache unless `fresh`."""
+    user = None if fresh else user_cache.get(email)
+    if user is None:
+        db_user = db.query(models.User).filter(models.User.email == email).first()
+        if db_user is None:
+            return None
+        user = snapshot_user(db_user)
+        user_cache.set(email, user)
+    return user
+
+async def load_user_async(db: AsyncSession, email: str) -> Optional[schemas.UserOut]:
+    user = user_cache.get(email)
     if user is None:
-        raise credentials_exception
+        db_user = (await db.execute(select(models.User).where(models.User.email == email))).scalars().first()
+        if db_user is None:
+            return None
+        user = snapshot_user(db_user)
+        user_cache.set(email, user)
     return user
 
-def get_current_active_admin(current_user: models.User = Depends(get_current_user)):
+def credentials_exception():
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=texts.ERROR_INVALID_CREDENTIALS,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+def get_current_user(access_token: Optional[str] = Cookie(None), db: Session = Depends(database.get_db)):
+    token_data = get_token_data(access_token)
+    if token_data is None:
+        raise credentials_exception()
+    user = load_user(db, token_data.email)
+    if user is None:
+        raise credentials_exception()
+    return user
+
+def get_current_user_fresh(access_token: Optional[str] = Cookie(None), db: Session = Depends(database.get_db)):
+    """get_current_user, bypassing user_cache: for checks that must see a role change at once."""
+    token_data = get_token_data(access_token)
+    if token_data is None:
+        raise credentials_exception()
+    user = load_user(db, token_data.email, fresh=True)
+    if user is None:
+        raise credentials_exception()
+    return user
+
+def get_current_active_admin(current_user: models.User = Depends(get_current_user_fresh)):
     if current_user.role != models.Role.admin:
         raise HTTPException(status_code=400, detail=texts.ERROR_FORBIDDEN)
     return current_user
 
-def get_current_active_moderator(current_user: models.User = Depends(get_current_user)):
+def get_current_active_moderator(current_user: models.User = Depends(get_current_user_fresh)):
     if current_user.role not in [models.Role.admin, models.Role.moderator]:
         raise HTTPException(status_code=400, detail=texts.ERROR_FORBIDDEN)
     return current_user
 
 oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False)
 
-def get_current_user_optional(access_token: Optional[str] = Cookie(None), db: Session = Depends(database.get_db)):
-    if not access_token:
+# Only used by read endpoints, so it shares their read session
+def get_current_user_optional(access_token: Optional[str] = Cookie(None), db: Session = Depends(replicas.get_read_db)):
+    token_data = get_token_data(access_token)
+    if token_data is None:
         return None
-    token = access_token.replace("Bearer ", "")
-    try:
-        payload = jwt.decode(token, config.SECRET_KEY, algorithms=[config.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            return None
-        token_data = schemas.TokenData(email=email)
-    except JWTError:
+    user = load_user(db, token_data.email)
+    return user
+
+# Async variants for the routes served by async_endpoints.py
+async def get_current_user_async(access_token: Optional[str] = Cookie(None), db: AsyncSession = Depends(database.get_async_db)):
+    token_data = get_token_data(access_token)
+    if token_data is None:
+        raise credentials_exception()
+    user = await load_user_async(db, token_data.email)
+    if user is None:
+        raise credentials_exception()
+    return user
+
+async def get_current_user_optional_async(access_token: Optional[str] = Cookie(None), db: AsyncSession = Depends(database.get_async_db)):
+    token_data = get_token_data(access_token)
+    if token_data is None:
         return None
-    user = db.query(models.User).filter(models.User.email == token_data.email).first()
+    user = await load_user_async(db, token_data.email)
     return user
@@ -1,12 +1,22 @@
+import hashlib
+import json
+from collections import Counter
+from datetime import datetime, timedelta, timezone
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from ..db import database, models
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session, joinedload
+from starlette.concurrency import run_in_threadpool
+from typing import Dict, List, Optional, Union
+from ..db import database, models, ranking, replicas, search, stats, versions, vote_buffer, votes
 from .. import schemas
-from . import auth
-from ..core import texts
-from ..core.limiter import limiter
-from fastapi import Request, Response
+from . import auth, threads
+from .etags import check_etag, make_etag
+from .fastjson import fast_json
+from .pagination import NEXT_CURSOR_HEADER, decode_values, encode_cursor, page_size, paginate
+from ..core import config, events, metrics, texts
+from ..core.cache import PageCache
+from ..core.limiter import limiter, stats as limiter_stats
+from fastapi import Query, Request, Response
 
 router = APIRouter()
 
@@ -17,6 +27,8 @@ def register(request: Request, user: schemas.UserCreate, db: Session = Depends(d
     db_user = db.query(models.User).filter(models.User.email == user.email).first()
     if db_user:
         raise HTTPException(status_code=400, detail=texts.ERROR_EMAIL_ALREADY_EXISTS)
+    # Give the connection back to the pool while the password is hashed
+    db.rollback()
     hashed_password = auth.get_password_hash(user.password)
     new_user = models.User(email=user.email, name=user.name, password_hash=hashed_password)
     db.add(new_user)
@@ -28,6 +40,8 @@ def register(request: Request, user: schemas.UserCreate, db: Session = Depends(d
 @limiter.limit("5/minute")
 def login(request: Request, response: Response, user_credentials: schemas.UserLogin, db: Session = Depends(database.get_db)):
     user = db.query(models.User).filter(models.User.email == user_credentials.email).first()
+    # Give the connection back to the pool while the password is verified
+    db.rollback()
     if not user or not auth.verify_password(user_credentials.password, user.password_hash):
         raise HTTPException(status_code=400, detail=texts.ERROR_INCORRECT_PASSWORD)
     access_token = auth.create_access_token(data={"sub": user.email})
@@ -57,28 +71,40 @@ def update_user_me(
     db: Session = Depends(database.get_db), 
     current_user: models.User = Depends(auth.get_current_user)
 ):
+    # Hash before touching the database so no connection is held meanwhile
+    password_hash = auth.get_password_hash(user_update.password) if user_update.password else None
+
     db_user = db.query(models.User).filter(models.User.id == current_user.id).first()
     
     if user_update.name:
         db_user.name = user_update.name
     
-    if user_update.password:
-        db_user.password_hash = auth.get_password_hash(user_update.password)
+    if password_hash:
+        db_user.password_hash = password_hash
+
+    if user_update.name:
+        versions.bump_responses_version_by_author(db, db_user.id)
         
     db.commit()
     db.refresh(db_user)
+    auth.user_cache.invalidate(db_user.email)
+    if user_update.name:
+        # Cached response pages embed the author's name
+        response_cache.invalidate_members([author_member(db_user.id)])
     return db_user
 
 @router.get("/users/", response_model=List[schemas.UserOut])
 @limiter.limit("60/minute")
 def read_users(
     request: Request, 
-    skip: int = 0, 
-    limit: int = 100, 
+    response: Response,
+    cursor: Optional[str] = None, 
+    limit: Optional[int] = None, 
     db: Session = Depends(database.get_db), 
     current_user: models.User = Depends(auth.get_current_active_admin)
 ):
-    users = db.query(models.User).offset(skip).limit(limit).all()
+    # users has no created_at column; the primary key gives the same order
+    users = paginate(db.query(models.User), [models.User.id], cursor, limit, response)
     return users
 
 @router.put("/users/{user_id}/role", response_model=schemas.UserOut)
@@ -103,34 +129,117 @@ def update_user_role(
             )
 
     target_user.role = role_update.role
+    versions.bump_responses_version_by_author(db, target_user.id)
     db.commit()
     db.refresh(target_user)
+    # Role checks read the database; this refreshes /users/me in this worker
+    auth.user_cache.invalidate(target_user.email)
+    response_cache.clear()
     return target_user
 
+@router.get("/admin/db/pool")
+@limiter.limit("60/minute")
+def read_db_pool_status(request: Request, current_user: models.User = Depends(auth.get_current_active_admin)):
+    pools = database.pool_status()
+    if replicas.replicas:
+        pools["replicas"] = replicas.status()
+    return pools
+
+@router.get("/admin/cache")
+@limiter.limit("60/minute")
+def read_cache_stats(request: Request, current_user: models.User = Depends(auth.get_current_active_admin)):
+    return {"users": auth.user_cache.stats(), "responses": response_cache.stats()}
+
+@router.get("/admin/limiter")
+@limiter.limit("60/minute")
+def read_limiter_stats(request: Request, current_user: models.User = Depends(auth.get_current_active_admin)):
+    return limiter_stats.snapshot()
+
+@router.get("/admin/events")
+@limiter.limit("60/minute")
+async def read_events_stats(request: Request, current_user: models.User = Depends(auth.get_current_active_admin)):
+    # async so it reads the broker's state on the event loop that owns it
+    return events.broker.stats()
+
 # Discussion Endpoints
 @router.post("/discussions/", response_model=schemas.DiscussionOut)
 @limiter.limit("60/minute")
 def create_discussion(request: Request, discussion: schemas.DiscussionCreate, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_active_admin)):
     new_discussion = models.Discussion(**discussion.dict(), user_id=current_user.id)
     db.add(new_discussion)
+    db.flush()
+    search.index_discussions(db, [new_discussion])
     db.commit()
     db.refresh(new_discussion)
     return new_discussion
 
+# The read queries below are plain functions of the session so the async
+# router (async_endpoints.py) can run them through AsyncSession.run_sync.
+# Each *_etag function reads only version counters; the endpoints answer
+# If-None-Match with a 304 before running the full query.
+def discussions_etag(db: Session, cursor: Optional[str], limit: Optional[int]):
+    # The ids and versions of the requested page only, read from the index it
+    # is paginated on, so no write has to bump a counter shared by all pages
+    rows = paginate(
+        db.query(models.Discussion.created_at, models.Discussion.id, models.Discussion.version),
+        [models.Discussion.created_at, models.Discussion.id],
+        cursor, limit, Response()
+    )
+    digest = hashlib.blake2b(repr([(row.id, row.version) for row in rows]).encode(), digest_size=8)
+    return make_etag("discussions", digest.hexdigest())
+
+# The hot list endpoints build plain dicts matching their response_model and
+# return them through fast_json, which skips FastAPI's validation pass.
+def discussion_payload(d: models.Discussion) -> dict:
+    return {
+        "id": d.id,
+        "title": d.title,
+        "content": d.content,
+        "status": d.status,
+        "user_id": d.user_id,
+        "created_at": d.created_at,
+        "agree_count": d.agree_count,
+        "disagree_count": d.disagree_count,
+        "pending_count": d.pending_count,
+        "total_votes": d.total_votes,
+        "last_activity_at": d.last_activity_at,
+    }
+
+def list_discussions(db: Session, cursor: Optional[str], limit: Optional[int], response: Response):
+    discussions = paginate(
+        db.query(models.Discussion),
+        [models.Discussion.created_at, models.Discussion.id],
+        cursor, limit, response
+    )
+    return [discussion_payload(d) for d in discussions]
+
 @router.get("/discussions/", response_model=List[schemas.DiscussionOut])
 @limiter.limit("60/minute")
-def read_discussions(request: Request, skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db)):
-    discussions = db.query(models.Discussion).offset(skip).limit(limit).all()
-    return discussions
+def read_discussions(request: Request, response: Response, cursor: Optional[str] = None, limit: Optional[int] = None, db: Session = Depends(replicas.get_read_db)):
+    not_modified = check_etag(request, response, discussions_etag(db, cursor, limit))
+    if not_modified:
+        return not_modified
+    discussions = list_discussions(db, cursor, limit, response)
+    return fast_json(discussions, response)
 
-@router.get("/discussions/{discussion_id}", response_model=schemas.DiscussionOut)
-@limiter.limit("60/minute")
-def read_discussion(request: Request, discussion_id: int, db: Session = Depends(database.get_db)):
+def discussion_etag(db: Session, discussion_id: int):
+    version = db.query(models.Discussion.version).filter(models.Discussion.id == discussion_id).scalar()
+    return None if version is None else make_etag("discussion", discussion_id, version)
+
+def get_discussion(db: Session, discussion_id: int):
     discussion = db.query(models.Discussion).filter(models.Discussion.id == discussion_id).first()
     if discussion is None:
         raise HTTPException(status_code=404, detail=texts.ERROR_DISCUSSION_NOT_FOUND)
     return discussion
 
+@router.get("/discussions/{discussion_id}", response_model=schemas.DiscussionOut)
+@limiter.limit("60/minute")
+def read_discussion(request: Request, response: Response, discussion_id: int, db: Session = Depends(replicas.get_read_db)):
+    not_modified = check_etag(request, response, discussion_etag(db, discussion_id))
+    if not_modified:
+        return not_modified
+    return get_discussion(db, discussion_id)
+
 @router.put("/discussions/{discussion_id}/finish", response_model=schemas.DiscussionOut)
 @limiter.limit("60/minute")
 def finish_discussion(request: Request, discussion_id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_active_moderator)):
@@ -139,10 +248,32 @@ def finish_discussion(request: Request, discussion_id: int, db: Session = Depend
         raise HTTPException(status_code=404, detail=texts.ERROR_DISCUSSION_NOT_FOUND)
     
     discussion.status = models.DiscussionStatus.finalizada
+    versions.bump_version(db, discussion_id)
     db.commit()
     db.refresh(discussion)
+    events.broker.publish(discussion_id, "discussion_finished", discussion_payload(discussion))
     return discussion
 
+# Live updates for viewers of a discussion, as Server-Sent Events:
+# response_approved (the response), response_removed ({"id"}), votes
+# ({"response_id", "upvotes", "downvotes"}) and discussion_finished (the
+# discussion). The stream holds no database connection: the discussion is
+# looked up in a session closed before it starts.
+def discussion_exists(db: Session, discussion_id: int) -> bool:
+    return db.query(models.Discussion.id).filter(models.Discussion.id == discussion_id).scalar() is not None
+
+@router.get("/discussions/{discussion_id}/events")
+@limiter.limit("60/minute")
+async def discussion_events(request: Request, discussion_id: int):
+    async with database.primary_session() as db:
+        if not await run_in_threadpool(discussion_exists, db, discussion_id):
+            raise HTTPException(status_code=404, detail=texts.ERROR_DISCUSSION_NOT_FOUND)
+    return events.EventStream(events.broker, discussion_id, {
+        "Cache-Control": "no-cache",
+        # Stops nginx from holding events back
+        "X-Accel-Buffering": "no",
+    })
+
 # Response Endpoints
 @router.post("/discussions/{discussion_id}/responses/", response_model=schemas.ResponseOut)
 @limiter.limit("60/minute")
@@ -171,64 +302,339 @@ def create_response(request: Request, discussion_id: int, response: schemas.Resp
         **response.dict(),
         discussion_id=discussion_id,
         user_id=current_user.id,
-        status_aprovacao=models.ApprovalStatus.pendente
+        status_aprovacao=models.ApprovalStatus.pendente,
+        # Close enough to the created_at the database assigns
+        **ranking.scores(0, 0, datetime.now(timezone.utc))
     )
     db.add(new_response)
+    stats.response_created(db, discussion_id)
     db.commit()
     db.refresh(new_response)
     return new_response
 
-@router.get("/discussions/{discussion_id}/responses/", response_model=List[schemas.ResponseOut])
+# Pages of approved responses by discussion id, shared by every reader. The
+# user's own votes are overlaid on each request, so logged-in readers hit the
+# same entries. Pages are keyed by the discussion's responses_version, read
+# fresh on every request, so a write on another worker is never served under
+# its new ETag. A discussion's pages are also dropped when one of its
+# responses is approved, rejected or voted on in this worker (or its counters
+# are flushed by the vote buffer), or when an author on its pages is renamed,
+# to free their space early.
+response_cache = PageCache(config.RESPONSE_CACHE_MAX_BYTES, config.RESPONSE_CACHE_TTL, "responses")
+if vote_buffer.buffer is not None:
+    vote_buffer.buffer.listeners.append(response_cache.invalidate_members)
+
+def response_payload(r: models.Response) -> dict:
+    return {
+        "id": r.id,
+        "discussion_id": r.discussion_id,
+        "user_id": r.user_id,
+        "parent_id": r.parent_id,
+        "content": r.content,
+        "type": r.type,
+        "status_aprovacao": r.status_aprovacao,
+        "is_reliable_source": r.is_reliable_source,
+        "upvotes": r.upvotes,
+        "downvotes": r.downvotes,
+        "created_at": r.created_at,
+        "author": {"id": r.author.id, "email": r.author.email, "name": r.author.name, "role": r.author.role},
+        "user_vote": None,
+    }
+
+def author_member(user_id: int):
+    return ("author", user_id)
+
+def page_members(items) -> list:
+    """Cache members of a page of response payloads: the response ids, and
+    their authors, whose names the payloads embed."""
+    return [item["id"] for item in items] + [author_member(user_id) for user_id in {item["user_id"] for item in items}]
+
+def responses_version(db: Session, discussion_id: int) -> Optional[int]:
+    return db.query(models.Discussion.responses_version).filter(models.Discussion.id == discussion_id).scalar()
+
+def responses_etag(version: Optional[int], discussion_id: int, current_user: Optional[models.User]):
+    if version is None or (current_user and vote_buffer.buffer is not None):
+        # Their vote is committed before the flush bumps the version, so a
+        # refetch right after voting must not get a 304
+        return None
+    # The body carries the reader's own votes, and each of their votes bumps the version
+    return make_etag("responses", discussion_id, version, current_user.id if current_user else 0)
+
+# Keyset order of each ?sort=, and whether it runs descending. Each is served
+# by an index on (discussion_id, status_aprovacao, *columns).
+RESPONSE_ORDERS = {
+    schemas.ResponseSort.new: ([models.Response.created_at, models.Response.id], False),
+    schemas.ResponseSort.top: ([models.Response.score_top, models.Response.id], True),
+    schemas.ResponseSort.hot: ([models.Response.score_hot, models.Response.id], True),
+}
+
+def list_responses(
+    db: Session,
+    discussion_id: int,
+    version: Optional[int],
+    cursor: Optional[str],
+    limit: Optional[int],
+    response: Response,
+    current_user: Optional[models.User],
+    sort: schemas.ResponseSort = schemas.ResponseSort.new
+):
+    key = (version, sort, cursor, page_size(limit))
+    page = response_cache.get(discussion_id, key)
+    if page is None:
+        generation = response_cache.generation(discussion_id)
+        # Only return approved responses for public view
+        # Authors are joined in the same SELECT so serializing ResponseOut.author
+        # does not trigger one lazy load per response.
+        query = db.query(models.Response).options(joinedload(models.Response.author)).filter(
+            models.Response.discussion_id == discussion_id,
+            models.Response.status_aprovacao == models.ApprovalStatus.aprovada
+        )
+        columns, descending = RESPONSE_ORDERS[sort]
+        rows = paginate(query, columns, cursor, limit, response, descending=descending)
+        page = ([response_payload(r) for r in rows], response.headers.get(NEXT_CURSOR_HEADER))
+        response_cache.set(
+            discussion_id, key, page,
+            size=len(json.dumps(page, default=str)),
+            members=page_members(page[0]),
+            generation=generation,
+            lag=replicas.lag(db),
+        )
+    elif page[1]:
+        response.headers[NEXT_CURSOR_HEADER] = page[1]
+    items = page[0]
+
+    user_votes = read_user_votes(db, current_user, [item["id"] for item in items])
+    # Attach user_vote to copies; the cached dicts are shared
+    return [dict(item, user_vote=user_votes[item["id"]]) if item["id"] in user_votes else item for item in items]
+
+def read_user_votes(db: Session, current_user: Optional[models.User], response_ids: List[int]) -> dict:
+    if not current_user or not response_ids:
+        return {}
+    return dict(db.query(models.Vote.response_id, models.Vote.type).filter(
+        models.Vote.user_id == current_user.id,
+        models.Vote.response_id.in_(response_ids)
+    ).all())
+
+def list_response_tree(
+    db: Session,
+    discussion_id: int,
+    version: Optional[int],
+    parent_id: Optional[int],
+    cursor: Optional[str],
+    limit: Optional[int],
+    replies: Optional[int],
+    response: Response,
+    current_user: Optional[models.User]
+):
+    replies = config.RESPONSE_TREE_REPLIES if replies is None else min(max(replies, 0), config.MAX_PAGE_SIZE)
+    key = (version, "tree", replies)
+    children = response_cache.get(discussion_id, key)
+    if children is None:
+        generation = response_cache.generation(discussion_id)
+        rows = db.query(models.Response).options(joinedload(models.Response.author)).filter(
+            models.Response.discussion_id == discussion_id,
+            models.Response.status_aprovacao == models.ApprovalStatus.aprovada
+        ).order_by(*threads.ORDER).all()
+        items = [response_payload(r) for r in rows]
+        children = threads.build_tree(items, replies)
+        response_cache.set(
+            discussion_id, key, children,
+            size=len(json.dumps(items, default=str)),
+            members=page_members(items),
+            generation=generation,
+            lag=replicas.lag(db),
+        )
+    nodes = threads.page(children, parent_id, cursor, page_size(limit), response)
+
+    user_votes = read_user_votes(db, current_user, [node["id"] for node in threads.walk(nodes)])
+    return threads.with_user_votes(nodes, user_votes) if user_votes else nodes
+
+# sort=top|hot ranks the flat list by the stored scores (db/ranking.py).
+# With tree=true, pages of top-level responses (or of the replies to
+# parent_id) nested as ResponseTreeOut, each with up to `replies` replies,
+# oldest first; sort=top|hot is refused there.
+@router.get("/discussions/{discussion_id}/responses/", response_model=Union[List[schemas.ResponseOut], List[schemas.ResponseTreeOut]])
 @limiter.limit("60/minute")
-def read_responses(request: Request, discussion_id: int, db: Session = Depends(database.get_db), current_user: Optional[models.User] = Depends(auth.get_current_user_optional)):
-    # Only return approved responses for public view
-    responses = db.query(models.Response).filter(
-        models.Response.discussion_id == discussion_id,
-        models.Response.status_aprovacao == models.ApprovalStatus.aprovada
-    ).all()
-    
-    # If user is logged in, fetch their votes
-    user_votes = {}
-    if current_user:
-        votes = db.query(models.Vote).filter(
-            models.Vote.user_id == current_user.id,
-            models.Vote.response_id.in_([r.id for r in responses])
-        ).all()
-        user_votes = {v.response_id: v.type for v in votes}
+def read_responses(
+    request: Request,
+    response: Response,
+    discussion_id: int,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    sort: schemas.ResponseSort = schemas.ResponseSort.new,
+    tree: bool = False,
+    parent_id: Optional[int] = None,
+    replies: Optional[int] = None,
+    db: Session = Depends(replicas.get_read_db),
+    current_user: Optional[models.User] = Depends(auth.get_current_user_optional)
+):
+    if tree and sort != schemas.ResponseSort.new:
+        raise HTTPException(status_code=400, detail=texts.ERROR_TREE_SORT)
+    version = responses_version(db, discussion_id)
+    not_modified = check_etag(request, response, responses_etag(version, discussion_id, current_user), vary="Cookie")
+    if not_modified:
+        return not_modified
+    if tree:
+        items = list_response_tree(db, discussion_id, version, parent_id, cursor, limit, replies, response, current_user)
+    else:
+        items = list_responses(db, discussion_id, version, cursor, limit, response, current_user, sort)
+    return fast_json(items, response)
 
-    # Attach user_vote to responses
-    for response in responses:
-        response.user_vote = user_votes.get(response.id)
+# Search
+# Full-text search over discussion titles and contents and approved responses
+# (db/search.py), best match first. The cursor carries the last result's
+# score, so pages stay in order while the index changes underneath.
+def search_results(db: Session, hits) -> List[dict]:
+    """Fill in the text of the search hits, with one query per document type."""
+    discussion_hits = [hit.doc_id for hit in hits if hit.doc_type == search.DISCUSSION]
+    response_hits = [hit.doc_id for hit in hits if hit.doc_type == search.RESPONSE]
+    titles = dict(db.query(models.Discussion.id, models.Discussion.title).filter(
+        models.Discussion.id.in_({hit.discussion_id for hit in hits})).all())
+    contents = {
+        search.DISCUSSION: dict(db.query(models.Discussion.id, models.Discussion.content).filter(
+            models.Discussion.id.in_(discussion_hits)).all()),
+        search.RESPONSE: dict(db.query(models.Response.id, models.Response.content).filter(
+            models.Response.id.in_(response_hits)).all()),
+    }
+    return [
+        {
+            "type": hit.doc_type,
+            "id": hit.doc_id,
+            "discussion_id": hit.discussion_id,
+            "title": titles.get(hit.discussion_id, ""),
+            "content": contents[hit.doc_type].get(hit.doc_id, ""),
+            "score": hit.score,
+        }
+        for hit in hits
+    ]
 
-    return responses
+@router.get("/search", response_model=List[schemas.SearchResult])
+@limiter.limit("60/minute")
+def search_documents(
+    request: Request,
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    db: Session = Depends(replicas.get_read_db)
+):
+    size = page_size(limit)
+    after = decode_values(cursor, [int, models.SearchDocType, int]) if cursor else None
+    hits = search.search(db, q, size + 1, after)
+    if len(hits) > size:
+        hits = hits[:size]
+        last = hits[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor([last.score, last.doc_type.value, last.doc_id])
+    return fast_json(search_results(db, hits), response)
 
 # Moderation Endpoints
 @router.get("/moderation/responses/pending", response_model=List[schemas.ResponseOut])
 @limiter.limit("60/minute")
-def read_pending_responses(request: Request, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_active_moderator)):
-    responses = db.query(models.Response).filter(models.Response.status_aprovacao == models.ApprovalStatus.pendente).all()
-    return responses
+def read_pending_responses(
+    request: Request,
+    response: Response,
+    discussion_id: Optional[int] = None,
+    min_age_minutes: Optional[int] = Query(None, ge=0),
+    max_age_minutes: Optional[int] = Query(None, ge=0),
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_active_moderator)
+):
+    # Oldest first, so the queue is worked through in order. The ages are
+    # measured against the database clock, which also stamps created_at.
+    query = db.query(models.Response).options(joinedload(models.Response.author)).filter(
+        models.Response.status_aprovacao == models.ApprovalStatus.pendente)
+    if discussion_id is not None:
+        query = query.filter(models.Response.discussion_id == discussion_id)
+    if min_age_minutes is not None or max_age_minutes is not None:
+        now = db.scalar(select(func.now()))
+        if min_age_minutes is not None:
+            query = query.filter(models.Response.created_at <= now - timedelta(minutes=min_age_minutes))
+        if max_age_minutes is not None:
+            query = query.filter(models.Response.created_at >= now - timedelta(minutes=max_age_minutes))
+    responses = paginate(query, [models.Response.created_at, models.Response.id], cursor, limit, response)
+    return fast_json([response_payload(r) for r in responses], response)
+
+def moderate(db: Session, response_ids: List[int], approval: models.ApprovalStatus) -> Dict[int, schemas.ModerationResult]:
+    """Set the approval status of the given responses with one UPDATE.
+
+    The rows are locked while they are read, so two moderators acting on the
+    same responses report each change once. Returns the result for every id.
+    """
+    response_ids = list(dict.fromkeys(response_ids))
+    rows = db.query(
+        models.Response.id, models.Response.discussion_id, models.Response.type, models.Response.status_aprovacao
+    ).filter(models.Response.id.in_(response_ids)).with_for_update().all()
+    changed = [row for row in rows if row.status_aprovacao != approval]
+    if changed:
+        db.execute(
+            update(models.Response)
+            .where(models.Response.id.in_([row.id for row in changed]))
+            .values(status_aprovacao=approval)
+            .execution_options(synchronize_session=False)
+        )
+    # Approving a response that is not approved yet, or rejecting an approved
+    # one, changes the public list of its discussion
+    listed = [row for row in changed if models.ApprovalStatus.aprovada in (row.status_aprovacao, approval)]
+    if listed:
+        versions.bump_responses_version_of(db, [row.id for row in listed])
+    stats.responses_moderated(db, [(row.discussion_id, row.type, row.status_aprovacao, approval) for row in changed])
+    # Only approved responses are searchable
+    approved = []
+    if listed and approval == models.ApprovalStatus.aprovada:
+        approved = db.query(models.Response).options(joinedload(models.Response.author)).filter(
+            models.Response.id.in_([row.id for row in listed])).all()
+        search.index_responses(db, approved)
+        approved = [(r.discussion_id, response_payload(r)) for r in approved]
+    elif listed:
+        search.unindex(db, search.RESPONSE, [row.id for row in listed])
+    db.commit()
+
+    for discussion_id in {row.discussion_id for row in listed}:
+        response_cache.invalidate_group(discussion_id)
+    if approved:
+        for discussion_id, payload in approved:
+            events.broker.publish(discussion_id, "response_approved", payload)
+    elif listed:
+        for row in listed:
+            events.broker.publish(row.discussion_id, "response_removed", {"id": row.id})
+
+    results = dict.fromkeys(response_ids, schemas.ModerationResult.not_found)
+    for row in rows:
+        results[row.id] = schemas.ModerationResult.unchanged
+    for row in changed:
+        results[row.id] = schemas.ModerationResult.updated
+    for result, n in Counter(results.values()).items():
+        metrics.MODERATIONS.labels(approval.value, result.value).inc(n)
+    return results
 
 @router.put("/moderation/responses/{response_id}/approve")
 @limiter.limit("60/minute")
 def approve_response(request: Request, response_id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_active_moderator)):
-    response = db.query(models.Response).filter(models.Response.id == response_id).first()
-    if not response:
+    if moderate(db, [response_id], models.ApprovalStatus.aprovada)[response_id] == schemas.ModerationResult.not_found:
         raise HTTPException(status_code=404, detail=texts.ERROR_RESPONSE_NOT_FOUND)
-    response.status_aprovacao = models.ApprovalStatus.aprovada
-    db.commit()
     return {"message": texts.SUCCESS_RESPONSE_APPROVED}
 
 @router.put("/moderation/responses/{response_id}/reject")
 @limiter.limit("60/minute")
 def reject_response(request: Request, response_id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_active_moderator)):
-    response = db.query(models.Response).filter(models.Response.id == response_id).first()
-    if not response:
+    if moderate(db, [response_id], models.ApprovalStatus.rejeitada)[response_id] == schemas.ModerationResult.not_found:
         raise HTTPException(status_code=404, detail=texts.ERROR_RESPONSE_NOT_FOUND)
-    response.status_aprovacao = models.ApprovalStatus.rejeitada
-    db.commit()
     return {"message": texts.SUCCESS_RESPONSE_REJECTED}
 
+@router.post("/moderation/responses/bulk", response_model=schemas.BulkModerationOut)
+@limiter.limit("60/minute")
+def bulk_moderate_responses(request: Request, moderation: schemas.BulkModeration, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_active_moderator)):
+    if len(moderation.ids) > config.MODERATION_BULK_MAX:
+        raise HTTPException(status_code=400, detail=texts.ERROR_TOO_MANY_IDS)
+    if moderation.action == schemas.ModerationAction.approve:
+        approval = models.ApprovalStatus.aprovada
+    else:
+        approval = models.ApprovalStatus.rejeitada
+    results = moderate(db, moderation.ids, approval)
+    return {"results": [{"id": response_id, "result": result} for response_id, result in results.items()]}
+
 @router.post("/responses/{response_id}/vote")
 @limiter.limit("60/minute")
 def vote_response(
@@ -238,68 +644,45 @@ def vote_response(
     db: Session = Depends(database.get_db), 
     current_user: models.User = Depends(auth.get_current_user)
 ):
-    response = db.query(models.Response).filter(models.Response.id == response_id).first()
-    if not response:
+    # The vote row and the counters are changed with conditional statements
+    # in one transaction, so concurrent votes on the same response cannot
+    # overwrite each other's counts.
+    if vote_buffer.buffer is None and not votes.lock_response(db, response_id):
         raise HTTPException(status_code=404, detail=texts.ERROR_RESPONSE_NOT_FOUND)
-    
-    # Check if user already voted
-    existing_vote = db.query(models.Vote).filter(
-        models.Vote.user_id == current_user.id,
-        models.Vote.response_id == response_id
-    ).first()
-
-    if existing_vote:
-        if existing_vote.type == vote_type:
-            # Same vote: remove it (toggle)
-            db.delete(existing_vote)
-            if vote_type == schemas.VoteType.up:
-                response.upvotes -= 1
-            else:
-                response.downvotes -= 1
-        else:
-            # Different vote: change it
-            if existing_vote.type == schemas.VoteType.up:
-                response.upvotes -= 1
-                response.downvotes += 1
-            else:
-                response.downvotes -= 1
-                response.upvotes += 1
-            existing_vote.type = vote_type
+    (up, down), user_vote = votes.record_vote(db, current_user.id, response_id, vote_type)
+    if vote_buffer.buffer is not None:
+        # Write-behind: only the vote row is written now, the counters are
+        # reported as stored plus whatever this worker has not flushed yet.
+        counts = votes.read_counters(db, response_id)
     else:
-        # New vote
-        new_vote = models.Vote(user_id=current_user.id, response_id=response_id, type=vote_type)
-        db.add(new_vote)
-        if vote_type == schemas.VoteType.up:
-            response.upvotes += 1
-        else:
-            response.downvotes += 1
-    
+        counts = votes.apply_counter_deltas(db, response_id, up, down)
+    if counts is None:
+        db.rollback()
+        raise HTTPException(status_code=404, detail=texts.ERROR_RESPONSE_NOT_FOUND)
+    upvotes, downvotes, discussion_id, created_at = counts
+    if vote_buffer.buffer is None and (up or down):
+        # With the buffer, the flush bumps it, rescores the response and adds
+        # to the discussion's vote total when the counters are written
+        versions.bump_responses_version_of(db, [response_id])
+        ranking.update_scores(db, [(response_id, upvotes, downvotes, created_at)])
+        stats.votes_cast(db, discussion_id, up + down)
     db.commit()
-    db.refresh(response)
-    
-    # Return updated counts and user_vote
-    # We need to determine the new user_vote state
-    current_vote_state = None
-    if existing_vote and existing_vote.type == vote_type: # We just deleted it
-         current_vote_state = None
-    elif existing_vote: # We changed it
-         current_vote_state = vote_type
-    else: # We created it
-         current_vote_state = vote_type
-
-    # Actually, if we deleted it, existing_vote is still the object but it's marked for deletion. 
-    # Logic above:
-    # If same vote: delete. user_vote is None.
-    # If different: update. user_vote is new type.
-    # If new: create. user_vote is new type.
-    
-    # Let's simplify the return to just match what frontend might need or just success message
-    # But frontend expects updated counts.
-    
+
+    if vote_buffer.buffer is not None:
+        # The cached counters go stale when the buffer flushes, not now
+        vote_buffer.buffer.add(response_id, up, down)
+        pending_up, pending_down = vote_buffer.buffer.pending_deltas(response_id)
+        upvotes, downvotes = upvotes + pending_up, downvotes + pending_down
+    elif up or down:
+        # Not only the pages holding it: the vote can move it on the ranked ones
+        response_cache.invalidate_group(discussion_id)
+    if up or down:
+        events.broker.publish(discussion_id, "votes", {"response_id": response_id, "upvotes": upvotes, "downvotes": downvotes})
+    metrics.record_vote(up, down, user_vote)
+
     return {
         "message": texts.SUCCESS_VOTE_REGISTERED, 
-        "upvotes": response.upvotes, 
-        "downvotes": response.downvotes,
-        "user_vote": current_vote_state
+        "upvotes": upvotes, 
+        "downvotes": downvotes,
+        "user_vote": user_vote
     }
-
@@ -0,0 +1,34 @@
+from typing import Optional
+
+from fastapi import Request, Response
+
+# ETags are built from version counters (db/versions.py), never from the body,
+# so an unchanged resource is answered before its query runs. no-cache makes
+# browsers revalidate on every request instead of reusing a stale copy.
+CACHE_CONTROL = "no-cache"
+
+def make_etag(*parts) -> str:
+    return '"%s"' % "-".join(str(part) for part in parts)
+
+def if_none_match(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    return etag in [tag.strip().removeprefix("W/") for tag in header.split(",")]
+
+def check_etag(request: Request, response: Response, etag: Optional[str], vary: Optional[str] = None):
+    """Set the ETag on `response` and return a 304 response if the client
+    already has it, or None if the endpoint should build the full body.
+    A None etag (e.g. the resource does not exist) skips the check."""
+    if etag is None:
+        return None
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if vary:
+        headers["Vary"] = vary
+    if if_none_match(request, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
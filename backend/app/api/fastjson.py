@@ -0,0 +1,27 @@
+import time
+from typing import Optional
+
+import orjson
+from fastapi import Response
+from starlette.responses import JSONResponse
+
+from ..core import profiling
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        # Handles datetimes and str enums natively, no default= hook needed
+        return orjson.dumps(content)
+
+def fast_json(payload, response: Optional[Response] = None) -> ORJSONResponse:
+    """Send an already built payload (plain dicts) as is.
+
+    Returning a Response skips the endpoint's response_model, so FastAPI does
+    not validate and copy every row a second time; the response_model is kept
+    for the OpenAPI schema only. FastAPI also ignores headers set on the
+    injected `response` when a Response is returned, so they are copied over.
+    """
+    started = time.perf_counter()
+    # ORJSONResponse encodes the payload when it is created
+    encoded = ORJSONResponse(payload, headers=response.headers if response is not None else None)
+    profiling.record_serialization(time.perf_counter() - started)
+    return encoded
@@ -0,0 +1,59 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException, Response
+from sqlalchemy import DateTime, and_, or_
+
+from ..core import config, texts
+
+# The cursor of the next page is sent in a header so list endpoints keep
+# returning plain JSON arrays.
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def page_size(limit: Optional[int]) -> int:
+    if not limit or limit < 1:
+        return config.DEFAULT_PAGE_SIZE
+    return min(limit, config.MAX_PAGE_SIZE)
+
+def encode_cursor(values) -> str:
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, columns) -> list:
+    return decode_values(cursor, [datetime.fromisoformat if isinstance(c.type, DateTime) else int for c in columns])
+
+def decode_values(cursor: str, parsers) -> list:
+    """Decode a cursor made by encode_cursor, parsing each value with the
+    matching function of `parsers`. Any malformed cursor is a 400."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(payload, list) or len(payload) != len(parsers):
+            raise ValueError(cursor)
+        return [parse(v) for parse, v in zip(parsers, payload)]
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail=texts.ERROR_INVALID_CURSOR)
+
+def paginate(query, columns, cursor: Optional[str], limit: Optional[int], response: Response, descending: bool = False):
+    """Return one page of `query` ordered by `columns`, seeking past `cursor`.
+
+    `columns` must end with a unique column (the primary key) so the ordering
+    is total. The seek predicate is spelled out as
+    `a > x OR (a = x AND b > y)` so it can use a composite index on MySQL.
+    With `descending`, every column is sorted in reverse, which an ascending
+    index serves by scanning backwards.
+    """
+    size = page_size(limit)
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        query = query.filter(or_(*[
+            and_(*[c == v for c, v in zip(columns[:i], values[:i])], columns[i] < values[i] if descending else columns[i] > values[i])
+            for i in range(len(columns))
+        ]))
+    items = query.order_by(*[c.desc() for c in columns] if descending else columns).limit(size + 1).all()
+    if len(items) > size:
+        items = items[:size]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor([getattr(items[-1], c.key) for c in columns])
+    return items
@@ -0,0 +1,73 @@
+"""Threaded view of a discussion's approved responses (read_responses?tree=true).
+
+The tree is built from the flat payloads in a single pass and cached like the
+flat pages. Each response carries only its first few replies, with the total
+in reply_count; the rest are paged from the same endpoint with parent_id and
+the response's replies_cursor.
+"""
+from bisect import bisect_right
+from typing import Optional
+
+from fastapi import Response
+
+from ..db import models
+from .pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+
+# Siblings are in the same order as the flat list
+ORDER = [models.Response.created_at, models.Response.id]
+
+def sort_key(item: dict):
+    return (item["created_at"], item["id"])
+
+def build_tree(items, replies: int) -> dict:
+    """Nest response payloads under their parents.
+
+    `items` must be in (created_at, id) order, which puts every parent before
+    its replies, so one pass over them sees each parent first. Each node keeps
+    its first `replies` replies. Replies to responses missing from `items`
+    (pending or rejected) are left out, as they have nowhere to go.
+
+    Returns {parent_id: (children, sort keys)} for every response with
+    replies, and None for the top level, to cut pages from.
+    """
+    nodes = {}
+    children = {None: ([], [])}
+    for item in items:
+        parent_id = item["parent_id"]
+        parent = nodes.get(parent_id)
+        if parent_id is not None and parent is None:
+            continue
+        node = dict(item, replies=[], reply_count=0, replies_cursor=None)
+        nodes[item["id"]] = node
+        siblings, keys = children.setdefault(parent_id, ([], []))
+        siblings.append(node)
+        keys.append(sort_key(node))
+        if parent is not None:
+            parent["reply_count"] += 1
+            if len(parent["replies"]) < replies:
+                parent["replies"].append(node)
+            elif parent["replies_cursor"] is None and parent["replies"]:
+                # Seeks past the last reply shown, like a page's X-Next-Cursor
+                parent["replies_cursor"] = encode_cursor(sort_key(parent["replies"][-1]))
+    return children
+
+def page(children: dict, parent_id: Optional[int], cursor: Optional[str], size: int, response: Response) -> list:
+    """One page of the children of `parent_id` (the top level for None)."""
+    siblings, keys = children.get(parent_id, ([], []))
+    start = bisect_right(keys, tuple(decode_cursor(cursor, ORDER))) if cursor else 0
+    nodes = siblings[start:start + size]
+    if start + size < len(siblings):
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(sort_key(nodes[-1]))
+    return nodes
+
+def walk(nodes):
+    for node in nodes:
+        yield node
+        yield from walk(node["replies"])
+
+def with_user_votes(nodes, user_votes: dict) -> list:
+    """Copies of the nodes and their replies with the reader's votes; the cached ones are shared."""
+    return [
+        dict(node, user_vote=user_votes.get(node["id"]), replies=with_user_votes(node["replies"], user_votes))
+        for node in nodes
+    ]
@@ -0,0 +1,203 @@
+import threading
+import time
+from collections import OrderedDict
+
+from . import metrics
+
+def lookup_counters(name: str):
+    # Bound once: labels() costs a dict lookup under a lock
+    return metrics.CACHE_LOOKUPS.labels(name, "hit"), metrics.CACHE_LOOKUPS.labels(name, "miss")
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire `ttl` seconds after being set."""
+
+    def __init__(self, maxsize: int, ttl: float, name: str):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.hit_counter, self.miss_counter = lookup_counters(name)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.data.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self.data[key]
+                self.misses += 1
+                self.miss_counter.inc()
+                return None
+            self.data.move_to_end(key)
+            self.hits += 1
+            self.hit_counter.inc()
+            return entry[1]
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = (time.monotonic() + self.ttl, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def invalidate(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+class PageCache:
+    """Thread-safe LRU cache of pages, bounded by their total size in bytes.
+
+    Pages are stored under a group (e.g. a discussion) and are dropped one
+    group at a time. Each page also lists its members (e.g. the ids of the rows
+    on it), so a change to a single row invalidates only the groups holding it.
+    Entries also expire `ttl` seconds after being set, which bounds how stale
+    another worker's copy can get.
+    """
+
+    def __init__(self, maxbytes: int, ttl: float, name: str):
+        self.maxbytes = maxbytes
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.data = OrderedDict()
+        self.groups = {}
+        self.member_groups = {}
+        # Set from a counter of all invalidations, so a page read before one is
+        # not stored after it
+        self.generations = {}
+        self.invalidations = 0
+        # time.monotonic() of each group's last invalidation
+        self.invalidated_at = {}
+        # Groups invalidated more than `ttl` ago are pruned from both dicts;
+        # they then read as at the newest pruned generation and time, which
+        # still turns away any page read before their last invalidation
+        self.pruned_generation = 0
+        self.pruned_at = float("-inf")
+        self.next_prune = time.monotonic() + ttl
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.hit_counter, self.miss_counter = lookup_counters(name)
+
+    def generation(self, group):
+        with self.lock:
+            return self.generations.get(group, self.pruned_generation)
+
+    def get(self, group, key):
+        with self.lock:
+            entry = self.data.get((group, key))
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    self._remove((group, key))
+                self.misses += 1
+                self.miss_counter.inc()
+                return None
+            self.data.move_to_end((group, key))
+            self.hits += 1
+            self.hit_counter.inc()
+            return entry[2]
+
+    def set(self, group, key, value, size: int, members=(), generation: int = 0, lag: float = 0.0):
+        """Store a page that was read while the group was at `generation`.
+
+        Nothing is stored if the group has been invalidated since then, or if
+        the page alone is larger than maxbytes. A page read from a source up
+        to `lag` seconds behind (a replica) may predate the last invalidation,
+        so it is not stored within `lag` seconds of one either.
+        """
+        with self.lock:
+            if self.generations.get(group, self.pruned_generation) != generation or size > self.maxbytes:
+                return
+            if lag and time.monotonic() - self.invalidated_at.get(group, self.pruned_at) < lag:
+                return
+            if (group, key) in self.data:
+                self._remove((group, key))
+            self.data[(group, key)] = (time.monotonic() + self.ttl, size, value)
+            self.bytes += size
+            pages, group_members = self.groups.setdefault(group, (set(), set()))
+            pages.add(key)
+            group_members.update(members)
+            for member in members:
+                self.member_groups.setdefault(member, set()).add(group)
+            while self.bytes > self.maxbytes:
+                self._remove(next(iter(self.data)))
+
+    def invalidate_group(self, group):
+        with self.lock:
+            self._invalidate(group, time.monotonic())
+            pages = self.groups.get(group)
+            for key in list(pages[0]) if pages else ():
+                self._remove((group, key))
+
+    def invalidate_members(self, members):
+        with self.lock:
+            groups = set().union(*(self.member_groups.get(m, ()) for m in members))
+        for group in groups:
+            self.invalidate_group(group)
+
+    def clear(self):
+        with self.lock:
+            now = time.monotonic()
+            for group in self.groups:
+                self._invalidate(group, now)
+            self.data.clear()
+            self.groups.clear()
+            self.member_groups.clear()
+            self.bytes = 0
+
+    def _invalidate(self, group, now: float):
+        self.invalidations += 1
+        self.generations[group] = self.invalidations
+        self.invalidated_at[group] = now
+        if now >= self.next_prune:
+            self._prune(now)
+
+    def _prune(self, now: float):
+        cutoff = now - self.ttl
+        for group, at in list(self.invalidated_at.items()):
+            if at < cutoff:
+                del self.invalidated_at[group]
+                self.pruned_generation = max(self.pruned_generation, self.generations.pop(group))
+                self.pruned_at = max(self.pruned_at, at)
+        self.next_prune = now + self.ttl
+
+    def _remove(self, entry_key):
+        group, key = entry_key
+        self.bytes -= self.data.pop(entry_key)[1]
+        pages, group_members = self.groups[group]
+        pages.discard(key)
+        if not pages:
+            del self.groups[group]
+            for member in group_members:
+                groups = self.member_groups[member]
+                groups.discard(group)
+                if not groups:
+                    del self.member_groups[member]
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.data),
+                "groups": len(self.groups),
+                "bytes": self.bytes,
+                "maxbytes": self.maxbytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            }
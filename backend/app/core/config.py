@@ -1,12 +1,107 @@
 import os
+from urllib.parse import quote_plus
+
 from dotenv import load_dotenv
-import sys
 
-sys.path.append(os.getcwd())
-load_dotenv(os.path.join(os.getcwd(), "app", "core", ".env"))
+# The only place settings are read from: the environment, then the .env file
+# next to this module. Importing this does not touch the database.
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env"))
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 if not SECRET_KEY:
     raise ValueError("No SECRET_KEY set for Flask application")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+
+DATABASE_URL = os.getenv(
+    "DATABASE_URL",
+    "mysql+pymysql://developer:%s@127.0.0.1/politicafatos" % quote_plus(os.getenv("DATABASE_PASSWORD", "password")),
+)
+
+# Authenticated user cache in auth.get_current_user (per worker process)
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+
+# Approved response pages in endpoints.list_responses (per worker process); 0 bytes disables it
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "30"))
+# Replies sent with each response in the threaded view (read_responses?tree=true)
+RESPONSE_TREE_REPLIES = int(os.getenv("RESPONSE_TREE_REPLIES", "3"))
+
+# Password hashing process pool (core/security.py); 0 workers hashes inline
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+# Hashes running or queued at once; further requests wait up to the timeout, then get a 503
+PASSWORD_HASH_CONCURRENCY = int(os.getenv("PASSWORD_HASH_CONCURRENCY", "8"))
+PASSWORD_HASH_QUEUE_TIMEOUT = float(os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT", "5"))
+
+# Lets benchmarks drive the API without tripping the limits
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+# Where the limit windows are counted (core/limiter.py): memory:// per worker,
+# redis://host:6379 or database:// (the app's database) shared by all workers
+RATE_LIMIT_STORAGE_URI = os.getenv("RATE_LIMIT_STORAGE_URI", "memory://")
+# sliding-window-counter weighs the previous window's count by its overlap,
+# for two counters per key; fixed-window and moving-window also work
+RATE_LIMIT_STRATEGY = os.getenv("RATE_LIMIT_STRATEGY", "sliding-window-counter")
+# Connections of database:// (per worker), in a pool of their own: the check
+# runs while the request already holds one of the request pool's
+RATE_LIMIT_DB_POOL_SIZE = int(os.getenv("RATE_LIMIT_DB_POOL_SIZE", "4"))
+
+# Per-request SQL profiling (core/profiling.py): the share of requests that
+# are profiled and can be logged as slow (0 turns it off)
+SQL_PROFILE_SAMPLE_RATE = float(os.getenv("SQL_PROFILE_SAMPLE_RATE", "0.01"))
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "500"))
+SLOW_REQUEST_QUERIES = int(os.getenv("SLOW_REQUEST_QUERIES", "50"))
+# Send profiled requests' timings to the client in a Server-Timing header.
+# It shows database time and query counts to anyone: development only.
+SERVER_TIMING_HEADER = os.getenv("SERVER_TIMING_HEADER", "false").lower() in ("1", "true", "yes")
+
+# Prometheus metrics at /metrics (core/metrics.py). With several workers, also
+# set PROMETHEUS_MULTIPROC_DIR (read by prometheus_client itself).
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Keyset pagination for list endpoints
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "500"))
+# Most responses one POST /moderation/responses/bulk may approve or reject
+MODERATION_BULK_MAX = int(os.getenv("MODERATION_BULK_MAX", "1000"))
+
+# Read replicas of DATABASE_URL for the GET endpoints (db/replicas.py), comma
+# separated; empty sends every read to the primary
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+# round-robin, or least-connections (fewest sessions open on the replica in this worker)
+DB_REPLICA_SELECTION = os.getenv("DB_REPLICA_SELECTION", "round-robin")
+# Seconds an unreachable replica is skipped before it is tried again
+DB_REPLICA_RETRY_INTERVAL = float(os.getenv("DB_REPLICA_RETRY_INTERVAL", "30"))
+# How far behind the primary a replica may be: a client's reads go to the
+# primary for this long after each of its writes
+DB_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", "5"))
+
+# Serve the read endpoints from an async engine (aiomysql / aiosqlite) instead
+# of the blocking SessionLocal. ASYNC_DATABASE_URL defaults to DATABASE_URL
+# with its driver swapped for the async one.
+DB_ASYNC = os.getenv("DB_ASYNC", "false").lower() in ("1", "true", "yes")
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+
+# Connection pool, per worker process. DB_POOL_SIZE + DB_MAX_OVERFLOW is also
+# the number of requests allowed to use the database at once (database.get_db).
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Below MySQL's wait_timeout, so the server never closes a pooled connection first
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+# Write-behind vote counters: votes are committed immediately, but the
+# upvotes/downvotes deltas are buffered per worker and flushed in batches.
+VOTE_WRITE_BEHIND = os.getenv("VOTE_WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+VOTE_FLUSH_INTERVAL = float(os.getenv("VOTE_FLUSH_INTERVAL", "1.0"))
+VOTE_FLUSH_MAX_PENDING = int(os.getenv("VOTE_FLUSH_MAX_PENDING", "1000"))
+# Seconds between recounts of recently voted responses from the votes table (0 disables)
+VOTE_RECONCILE_INTERVAL = float(os.getenv("VOTE_RECONCILE_INTERVAL", "300"))
+
+# Live discussion events (core/events.py). Empty EVENTS_BACKEND_URL keeps
+# events inside each worker; a redis:// URL relays them between workers.
+EVENTS_BACKEND_URL = os.getenv("EVENTS_BACKEND_URL", "")
+# Events buffered per subscriber before a slow client is disconnected
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+EVENTS_HEARTBEAT = float(os.getenv("EVENTS_HEARTBEAT", "15"))
@@ -0,0 +1,260 @@
+import asyncio
+import logging
+import signal
+import threading
+from collections import deque
+
+import orjson
+from starlette.responses import Response
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+# Tells EventSource how long to wait before reconnecting, in milliseconds
+RETRY = b"retry: 3000\n\n"
+# SSE comment line, keeps proxies from closing idle connections
+HEARTBEAT = b": ping\n\n"
+
+def encode_event(event_type: str, data) -> bytes:
+    return b"event: %s\ndata: %s\n\n" % (event_type.encode(), orjson.dumps(data))
+
+class Subscriber:
+    """One connected client: a bounded backlog and a flag to wake its stream.
+
+    Idle subscribers hold no timer and no task of their own besides the
+    response stream, so a worker can keep tens of thousands of them open.
+    """
+    __slots__ = ("messages", "ready", "closed")
+
+    def __init__(self):
+        self.messages = deque()
+        self.ready = asyncio.Event()
+        self.closed = False
+
+class Broker:
+    """Fans discussion events out to this worker's SSE subscribers.
+
+    Subscriber state is only touched on the event loop. publish() may be called
+    from any thread (the sync endpoints run in the threadpool): it encodes the
+    event once and hands it to the backend, which brings it back to deliver()
+    on the loop of this worker, and of every other worker if the backend is
+    shared.
+    """
+
+    def __init__(self, backend, queue_size: int, heartbeat: float):
+        self.backend = backend
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat
+        self.channels = {}
+        self.loop = None
+        self.heartbeat_task = None
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        await self.backend.start(self)
+        self.heartbeat_task = asyncio.create_task(self.send_heartbeats())
+        self.close_on_exit_signals()
+
+    async def stop(self):
+        if self.heartbeat_task is not None:
+            self.heartbeat_task.cancel()
+        await self.backend.stop()
+        self.close_all()
+        self.loop = None
+
+    def close_all(self):
+        for subscribers in self.channels.values():
+            for subscriber in subscribers:
+                subscriber.closed = True
+                subscriber.ready.set()
+
+    def close_on_exit_signals(self):
+        """Uvicorn waits for open connections to finish before it runs the
+        lifespan shutdown, and event streams never finish on their own. End
+        them as soon as the server is told to exit, then run its handler."""
+        if threading.current_thread() is not threading.main_thread():
+            return
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            previous = signal.getsignal(sig)
+            if not callable(previous):
+                continue
+
+            def handler(signum, frame, previous=previous):
+                self.loop.call_soon_threadsafe(self.close_all)
+                previous(signum, frame)
+
+            signal.signal(sig, handler)
+
+    def publish(self, discussion_id: int, event_type: str, data):
+        if self.loop is None:
+            # Not started, e.g. the app is imported by a script
+            return
+        try:
+            self.backend.publish(discussion_id, encode_event(event_type, data))
+        except Exception:
+            # The change is already committed; a lost event must not fail the request
+            logger.exception("Could not publish %s event", event_type)
+
+    def deliver_threadsafe(self, discussion_id: int, message: bytes):
+        loop = self.loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self.deliver, discussion_id, message)
+
+    def deliver(self, discussion_id: int, message: bytes):
+        for subscriber in self.channels.get(discussion_id, ()):
+            self.push(subscriber, message)
+
+    def push(self, subscriber: Subscriber, message: bytes):
+        if len(subscriber.messages) >= self.queue_size:
+            # Too slow to keep up: drop it. EventSource reconnects and the
+            # client reloads the discussion.
+            subscriber.closed = True
+        else:
+            subscriber.messages.append(message)
+        subscriber.ready.set()
+
+    async def send_heartbeats(self):
+        while True:
+            await asyncio.sleep(self.heartbeat)
+            for subscribers in self.channels.values():
+                for subscriber in subscribers:
+                    self.push(subscriber, HEARTBEAT)
+
+    def subscribe(self, discussion_id: int) -> Subscriber:
+        subscriber = Subscriber()
+        self.channels.setdefault(discussion_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, discussion_id: int, subscriber: Subscriber):
+        subscribers = self.channels.get(discussion_id)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self.channels[discussion_id]
+
+    def stats(self):
+        return {
+            "channels": len(self.channels),
+            "subscribers": sum(len(subscribers) for subscribers in self.channels.values()),
+        }
+
+class EventStream(Response):
+    """Response streaming one discussion's events to one client.
+
+    Starlette's StreamingResponse runs each stream in its own task group; this
+    only adds a task waiting for the disconnect, which wakes the subscriber
+    like an event would. Events that queued up meanwhile go out in one write.
+    """
+
+    media_type = "text/event-stream"
+
+    def __init__(self, broker: Broker, discussion_id: int, headers: dict):
+        # Response.__init__ would add a Content-Length for the empty body
+        self.broker = broker
+        self.discussion_id = discussion_id
+        self.status_code = 200
+        self.background = None
+        self.raw_headers = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers.items()]
+        self.raw_headers.append((b"content-type", self.media_type.encode("latin-1")))
+
+    async def __call__(self, scope, receive, send):
+        subscriber = self.broker.subscribe(self.discussion_id)
+        disconnected = False
+
+        async def wait_for_disconnect():
+            nonlocal disconnected
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            disconnected = subscriber.closed = True
+            subscriber.ready.set()
+
+        watcher = asyncio.create_task(wait_for_disconnect())
+        try:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            await send({"type": "http.response.body", "body": RETRY, "more_body": True})
+            while not subscriber.closed:
+                await subscriber.ready.wait()
+                subscriber.ready.clear()
+                if subscriber.messages:
+                    body = b"".join(subscriber.messages)
+                    subscriber.messages.clear()
+                    await send({"type": "http.response.body", "body": body, "more_body": True})
+            if not disconnected:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            watcher.cancel()
+            self.broker.unsubscribe(self.discussion_id, subscriber)
+
+class LocalBackend:
+    """Delivers events to the subscribers of this worker only."""
+
+    async def start(self, broker: Broker):
+        self.broker = broker
+
+    async def stop(self):
+        pass
+
+    def publish(self, discussion_id: int, message: bytes):
+        self.broker.deliver_threadsafe(discussion_id, message)
+
+class RedisBackend:
+    """Relays events through Redis pub/sub, so subscribers connected to any
+    worker get them. Needs the redis package (pip install redis).
+
+    publish() uses a blocking client, as it is called from the sync endpoints'
+    threads; each worker listens on one pattern subscription for all
+    discussions.
+    """
+
+    CHANNEL_PREFIX = "discussion-events:"
+
+    def __init__(self, url: str):
+        import redis
+
+        self.url = url
+        self.client = redis.Redis.from_url(url)
+        self.listener = None
+        self.task = None
+
+    async def start(self, broker: Broker):
+        import redis.asyncio
+
+        self.listener = redis.asyncio.Redis.from_url(self.url)
+        self.pubsub = self.listener.pubsub()
+        await self.pubsub.psubscribe(self.CHANNEL_PREFIX + "*")
+        self.task = asyncio.create_task(self.listen(broker))
+
+    async def listen(self, broker: Broker):
+        prefix = len(self.CHANNEL_PREFIX)
+        while True:
+            try:
+                async for message in self.pubsub.listen():
+                    if message["type"] == "pmessage":
+                        broker.deliver(int(message["channel"][prefix:]), message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # redis-py resubscribes when listen() reconnects
+                logger.exception("Lost the events subscription, retrying")
+                await asyncio.sleep(1)
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+        if self.listener is not None:
+            await self.pubsub.aclose()
+            await self.listener.aclose()
+        self.client.close()
+
+    def publish(self, discussion_id: int, message: bytes):
+        self.client.publish(self.CHANNEL_PREFIX + str(discussion_id), message)
+
+def make_backend(url: str):
+    if not url:
+        return LocalBackend()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    raise ValueError("Unsupported EVENTS_BACKEND_URL: %s" % url)
+
+broker = Broker(make_backend(config.EVENTS_BACKEND_URL), config.EVENTS_QUEUE_SIZE, config.EVENTS_HEARTBEAT)
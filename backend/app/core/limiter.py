@@ -1,4 +1,117 @@
-from slowapi import Limiter
+"""Request rate limits (slowapi).
+
+The windows live in RATE_LIMIT_STORAGE_URI: memory:// counts per worker, so
+N workers allow N times each limit; redis:// (needs `pip install redis`) and
+database:// (db/rate_limits.py) are shared by every worker. A shared storage
+that stops answering falls back to per-worker memory until it recovers.
+
+Requests are counted per logged-in user, and per client address otherwise.
+"""
+import asyncio
+import functools
+import threading
+from collections import Counter
+from functools import lru_cache
+
+import slowapi
+from jose import JWTError, jwt
+from slowapi import _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
+from starlette.concurrency import run_in_threadpool
+
+from . import config, metrics
+
+class LimiterStats:
+    """Running totals of the limit checks of this worker."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checked = Counter()
+        self.rejected = Counter()
+
+    def record_check(self, kind: str):
+        with self.lock:
+            self.checked[kind] += 1
+
+    def record_rejection(self, path: str):
+        with self.lock:
+            self.rejected[path] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "storage": config.RATE_LIMIT_STORAGE_URI.split("://", 1)[0],
+                "strategy": config.RATE_LIMIT_STRATEGY,
+                "storage_dead": limiter._storage_dead,
+                "checked": sum(self.checked.values()),
+                "checked_by_key": dict(self.checked),
+                "rejected": sum(self.rejected.values()),
+                "rejected_by_path": dict(self.rejected.most_common(20)),
+            }
+
+stats = LimiterStats()
+
+@lru_cache(maxsize=4096)
+def token_subject(token: str):
+    """The subject of an access token signed by us. Tokens are reused for their
+    whole lifetime, so each one is verified once; the expiry is not checked, as
+    an expired token still names its user, which is all a rate limit key needs."""
+    try:
+        payload = jwt.decode(
+            token.replace("Bearer ", ""), config.SECRET_KEY, algorithms=[config.ALGORITHM], options={"verify_exp": False}
+        )
+    except JWTError:
+        return None
+    return payload.get("sub")
+
+def rate_limit_key(request) -> str:
+    # Called once per limit checked, right before the check
+    token = request.cookies.get("access_token")
+    subject = token_subject(token) if token else None
+    if subject is not None:
+        stats.record_check("user")
+        return "user:" + subject
+    stats.record_check("address")
+    return "address:" + get_remote_address(request)
+
+def rate_limit_exceeded_handler(request, exc):
+    stats.record_rejection(request.url.path)
+    metrics.RATE_LIMIT_REJECTIONS.labels(metrics.route_of(request.scope)).inc()
+    return _rate_limit_exceeded_handler(request, exc)
+
+if config.RATE_LIMIT_STORAGE_URI.startswith("database://"):
+    from ..db import rate_limits  # noqa: F401 (registers the scheme)
+
+class Limiter(slowapi.Limiter):
+    """slowapi's Limiter, except that with a shared storage the limits of
+    async endpoints are checked in the threadpool: slowapi checks them on the
+    event loop, and a round trip to Redis or the database would block it."""
+
+    def limit(self, *args, **kwargs):
+        decorate = super().limit(*args, **kwargs)
+
+        def decorator(func):
+            wrapper = decorate(func)
+            if (self._storage_uri or "memory://").startswith("memory://") or not asyncio.iscoroutinefunction(func):
+                return wrapper
+
+            @functools.wraps(wrapper)
+            async def checked_in_threadpool(*args, **kwargs):
+                request = kwargs["request"]
+                if self.enabled and self._auto_check and not getattr(request.state, "_rate_limiting_complete", False):
+                    await run_in_threadpool(self._check_request_limit, request, func, False)
+                    # slowapi's wrapper then skips the check and only adds the headers
+                    request.state._rate_limiting_complete = True
+                return await wrapper(*args, **kwargs)
+
+            return checked_in_threadpool
+
+        return decorator
 
-limiter = Limiter(key_func=get_remote_address)
+limiter = Limiter(
+    key_func=rate_limit_key,
+    enabled=config.RATE_LIMIT_ENABLED,
+    storage_uri=config.RATE_LIMIT_STORAGE_URI,
+    strategy=config.RATE_LIMIT_STRATEGY,
+    in_memory_fallback_enabled=not config.RATE_LIMIT_STORAGE_URI.startswith("memory://"),
+)
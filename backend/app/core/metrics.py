@@ -0,0 +1,131 @@
+"""Prometheus metrics, served at /metrics (METRICS_ENABLED).
+
+Requests are timed by MetricsMiddleware; the rest is counted where it
+happens. With several workers, PROMETHEUS_MULTIPROC_DIR makes every worker
+write its samples to files there, and /metrics adds them all up.
+"""
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest, multiprocess,
+)
+from sqlalchemy import event
+from sqlalchemy.pool import Pool
+from starlette.responses import Response
+
+# Requests that match no route share one label, so scanners cannot blow up the series
+UNMATCHED_ROUTE = "<unmatched>"
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time until the response headers are sent, by route.", ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+RESPONSES = Counter("http_responses_total", "Responses sent, by route and status.", ["method", "route", "status"])
+IN_FLIGHT = Gauge("http_requests_in_flight", "Requests being served.", multiprocess_mode="livesum")
+
+DB_CONNECTIONS = Gauge("db_pool_connections", "Database connections open in the pools.", multiprocess_mode="livesum")
+DB_CHECKED_OUT = Gauge("db_pool_checked_out", "Database connections checked out of the pools.", multiprocess_mode="livesum")
+DB_POOL_WAIT = Histogram(
+    "db_pool_wait_seconds", "Time spent waiting for a pooled connection.",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+)
+DB_POOL_TIMEOUTS = Counter("db_pool_timeouts_total", "Checkouts that gave up after DB_POOL_TIMEOUT.")
+DB_READ_SESSIONS = Counter(
+    "db_read_sessions_total", "Read sessions, by where they went (replica, primary_recent_write, primary_fallback).",
+    ["source"],
+)
+
+RATE_LIMIT_REJECTIONS = Counter("rate_limit_rejections_total", "Requests rejected by a rate limit, by route.", ["route"])
+VOTES = Counter("votes_total", "Votes handled, by what they did (added, removed, changed, none).", ["result"])
+MODERATIONS = Counter(
+    "moderation_responses_total", "Responses moderated, by action and result (updated, unchanged, not_found).",
+    ["action", "result"],
+)
+CACHE_LOOKUPS = Counter("cache_lookups_total", "Cache lookups, by cache and result (hit, miss).", ["cache", "result"])
+
+# Pool events fire for every engine, including the async engine's sync pool
+@event.listens_for(Pool, "connect")
+def pool_connect(dbapi_connection, connection_record):
+    DB_CONNECTIONS.inc()
+
+@event.listens_for(Pool, "close")
+def pool_close(dbapi_connection, connection_record):
+    DB_CONNECTIONS.dec()
+
+@event.listens_for(Pool, "close_detached")
+def pool_close_detached(dbapi_connection):
+    DB_CONNECTIONS.dec()
+
+@event.listens_for(Pool, "checkout")
+def pool_checkout(dbapi_connection, connection_record, connection_proxy):
+    DB_CHECKED_OUT.inc()
+
+@event.listens_for(Pool, "checkin")
+def pool_checkin(dbapi_connection, connection_record):
+    DB_CHECKED_OUT.dec()
+
+# labels() takes a lock and builds the key on every call: the middleware
+# keeps the children it has used by their label values
+children = {}
+
+def child(metric, *labels):
+    key = (metric, *labels)
+    found = children.get(key)
+    if found is None:
+        found = children[key] = metric.labels(*labels)
+    return found
+
+def route_of(scope) -> str:
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    # FastAPI only sets the route of its API routes; the plain ones (/metrics,
+    # /docs) have no path parameters, so their path is their template
+    return scope["path"] if "endpoint" in scope else UNMATCHED_ROUTE
+
+def record_vote(up: int, down: int, user_vote):
+    if up + down > 0:
+        result = "added"
+    elif up + down < 0:
+        result = "removed"
+    elif user_vote is not None:
+        result = "changed"
+    else:
+        result = "none"
+    VOTES.labels(result).inc()
+
+class MetricsMiddleware:
+    """Request latency and status by method and route template, and requests in flight."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = []
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status.append(message["status"])
+                child(REQUEST_DURATION, scope["method"], route_of(scope)).observe(time.perf_counter() - started)
+            await send(message)
+
+        IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            IN_FLIGHT.dec()
+            child(RESPONSES, scope["method"], route_of(scope), status[0] if status else 500).inc()
+
+def metrics_endpoint(request):
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
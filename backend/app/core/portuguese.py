@@ -0,0 +1,77 @@
+"""Portuguese text normalization for the search index (db/search.py).
+
+The stemmer follows Savoy's light stemmer for Portuguese (also used by
+Lucene's PortugueseLightStemmer): it folds plurals, feminine forms and
+-mente adverbs, then strips accents, so "políticas", "político" and
+"politicamente" share a term. It does not try to conflate verb tenses.
+"""
+import re
+import unicodedata
+
+# Terms longer than this are cut, to fit search_postings.term
+MAX_TERM_LENGTH = 64
+
+WORD_RE = re.compile(r"\w+")
+
+STOP_WORDS = frozenset("""
+a à ao aos aquela aquelas aquele aqueles aquilo as às até com como da das de dela delas dele deles
+depois do dos e é ela elas ele eles em entre era eram essa essas esse esses esta está estão estas
+este estes eu foi foram há isso isto já lhe lhes mais mas me mesmo meu meus minha minhas muito na
+não nas nem no nos nós num numa o os ou para pela pelas pelo pelos por qual quando que quem se
+sem ser será seu seus só sua suas também te tem têm tu um uma umas uns você vocês vos
+""".split())
+
+def fold_accents(word: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFD", word) if not unicodedata.combining(c))
+
+def remove_suffix(word: str) -> str:
+    n = len(word)
+    if n > 4 and word.endswith("es") and word[-3] in "rslz":
+        return word[:-2]
+    if n > 3 and word.endswith("ns"):
+        return word[:-2] + "m"
+    if n > 4 and word.endswith(("eis", "éis")):
+        return word[:-3] + "el"
+    if n > 4 and word.endswith("ais"):
+        return word[:-2] + "l"
+    if n > 4 and word.endswith("óis"):
+        return word[:-3] + "ol"
+    if n > 4 and word.endswith("is"):
+        return word[:-1] + "l"
+    if n > 3 and word.endswith(("ões", "ães")):
+        return word[:-3] + "ão"
+    if n > 6 and word.endswith("mente"):
+        return word[:-5]
+    if n > 3 and word.endswith("s"):
+        return word[:-1]
+    return word
+
+def normalize_feminine(word: str) -> str:
+    n = len(word)
+    if n > 7 and word.endswith(("inha", "iaca", "eira")):
+        return word[:-1] + "o"
+    if n > 6:
+        if word.endswith(("osa", "ica", "ida", "ada", "iva", "ama")):
+            return word[:-1] + "o"
+        if word.endswith("ona"):
+            return word[:-3] + "ão"
+        if word.endswith("ora"):
+            return word[:-1]
+        if word.endswith("esa"):
+            return word[:-3] + "ês"
+        if word.endswith("na"):
+            return word[:-1] + "o"
+    return word
+
+def stem(word: str) -> str:
+    if len(word) >= 4:
+        word = remove_suffix(word)
+        if len(word) > 3 and word.endswith("a"):
+            word = normalize_feminine(word)
+        if len(word) > 4 and word[-1] in "eao":
+            word = word[:-1]
+    return fold_accents(word)[:MAX_TERM_LENGTH]
+
+def terms(text: str) -> list:
+    """The stemmed terms of `text`, in order, without stop words."""
+    return [stem(word) for word in WORD_RE.findall(text.lower()) if word not in STOP_WORDS]
@@ -0,0 +1,106 @@
+"""Per-request SQL profiling of a sample of the requests (SQL_PROFILE_SAMPLE_RATE).
+
+A sampled request slower than SLOW_REQUEST_MS or running more than
+SLOW_REQUEST_QUERIES statements is logged with its slowest and most repeated
+SQL. With SERVER_TIMING_HEADER its response also gets:
+
+    Server-Timing: db;dur=12.3;desc="7 queries", serialization;dur=1.1, total;dur=20.4
+"""
+import contextvars
+import logging
+import random
+import time
+from collections import Counter
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+# Statements shown in a slow request log entry, and the characters shown of each
+SLOW_LOG_STATEMENTS = 5
+SLOW_LOG_SQL_LENGTH = 300
+
+class RequestProfile:
+    __slots__ = ("statements", "db_seconds", "serialization_seconds")
+
+    def __init__(self):
+        # (seconds, SQL) of every statement
+        self.statements = []
+        self.db_seconds = 0.0
+        self.serialization_seconds = 0.0
+
+current = contextvars.ContextVar("request_profile", default=None)
+
+# On the Engine class, so the engines created later (lazily, or the async
+# engine's sync_engine) are covered too
+@event.listens_for(Engine, "before_cursor_execute")
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and current.get() is not None:
+        context._profile_started = time.perf_counter()
+
+@event.listens_for(Engine, "after_cursor_execute")
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = current.get()
+    started = getattr(context, "_profile_started", None)
+    if profile is not None and started is not None:
+        seconds = time.perf_counter() - started
+        profile.statements.append((seconds, statement))
+        profile.db_seconds += seconds
+
+def record_serialization(seconds: float):
+    profile = current.get()
+    if profile is not None:
+        profile.serialization_seconds += seconds
+
+def server_timing(profile: RequestProfile, total: float) -> bytes:
+    return ('db;dur=%.1f;desc="%d queries", serialization;dur=%.1f, total;dur=%.1f' % (
+        profile.db_seconds * 1000, len(profile.statements), profile.serialization_seconds * 1000, total * 1000
+    )).encode("latin-1")
+
+def one_line(sql: str) -> str:
+    sql = " ".join(sql.split())
+    return sql if len(sql) <= SLOW_LOG_SQL_LENGTH else sql[:SLOW_LOG_SQL_LENGTH] + "..."
+
+def log_slow_request(scope, status, profile: RequestProfile, total: float):
+    slowest = sorted(profile.statements, key=lambda item: item[0], reverse=True)[:SLOW_LOG_STATEMENTS]
+    repeated = [(sql, n) for sql, n in Counter(sql for _, sql in profile.statements).most_common(SLOW_LOG_STATEMENTS) if n > 1]
+    lines = ["Slow request: %s %s -> %s in %.1f ms, %d queries in %.1f ms" % (
+        scope["method"], scope["path"], status, total * 1000, len(profile.statements), profile.db_seconds * 1000)]
+    lines += ["  %.1f ms: %s" % (seconds * 1000, one_line(sql)) for seconds, sql in slowest]
+    lines += ["  %d times: %s" % (n, one_line(sql)) for sql, n in repeated]
+    logger.warning("\n".join(lines))
+
+class ProfilingMiddleware:
+
+    def __init__(self, app, sample_rate: float = None):
+        self.app = app
+        self.sample_rate = config.SQL_PROFILE_SAMPLE_RATE if sample_rate is None else sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or random.random() >= self.sample_rate:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        token = current.set(profile)
+        started = time.perf_counter()
+        outcome = {}
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                total = time.perf_counter() - started
+                outcome["status"], outcome["total"] = message["status"], total
+                if config.SERVER_TIMING_HEADER:
+                    message["headers"] = [*message.get("headers", ()), (b"server-timing", server_timing(profile, total))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current.reset(token)
+            total = outcome.get("total", time.perf_counter() - started)
+            if total * 1000 > config.SLOW_REQUEST_MS or len(profile.statements) > config.SLOW_REQUEST_QUERIES:
+                log_slow_request(scope, outcome.get("status", "error"), profile, total)
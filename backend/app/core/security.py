@@ -0,0 +1,55 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from . import config, texts
+
+# This module is imported by the hashing worker processes, so it must stay
+# light: no database or app imports.
+pwd_context = CryptContext(schemes=["sha256_crypt"], deprecated="auto")
+
+def hash_password(password):
+    return pwd_context.hash(password)
+
+def check_password(plain_password, hashed_password):
+    return pwd_context.verify(plain_password, hashed_password)
+
+# sha256_crypt runs thousands of rounds while holding the GIL. Running it in
+# separate processes keeps a burst of logins from slowing every other request
+# in the worker, and the semaphore bounds how many can queue for a process.
+hash_slots = threading.BoundedSemaphore(max(1, config.PASSWORD_HASH_CONCURRENCY))
+hash_pool = None
+hash_pool_lock = threading.Lock()
+
+def get_hash_pool():
+    global hash_pool
+    with hash_pool_lock:
+        if hash_pool is None:
+            # spawn, not fork: forking a process that runs threads can copy
+            # held locks into the child
+            hash_pool = ProcessPoolExecutor(
+                max_workers=config.PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return hash_pool
+
+def run_hashing(fn, *args):
+    """Run fn(*args) in the hashing pool, or inline if PASSWORD_HASH_WORKERS is 0."""
+    if config.PASSWORD_HASH_WORKERS <= 0:
+        return fn(*args)
+    if not hash_slots.acquire(timeout=config.PASSWORD_HASH_QUEUE_TIMEOUT):
+        raise HTTPException(status_code=503, detail=texts.ERROR_HASHING_BUSY)
+    try:
+        return get_hash_pool().submit(fn, *args).result()
+    finally:
+        hash_slots.release()
+
+def shutdown_hash_pool():
+    global hash_pool
+    with hash_pool_lock:
+        if hash_pool is not None:
+            hash_pool.shutdown()
+            hash_pool = None
@@ -9,6 +9,11 @@ ERROR_FORBIDDEN = "Acesso negado."
 ERROR_DISCUSSION_NOT_FOUND = "Discussão não encontrada."
 ERROR_RESPONSE_NOT_FOUND = "Resposta não encontrada."
 ERROR_INVALID_CREDENTIALS = "Credenciais inválidas."
+ERROR_INVALID_CURSOR = "Cursor de paginação inválido."
+ERROR_DATABASE_BUSY = "Servidor ocupado, tente novamente em instantes."
+ERROR_HASHING_BUSY = "Muitos acessos simultâneos, tente novamente em instantes."
+ERROR_TOO_MANY_IDS = "Muitos itens de uma vez."
+ERROR_TREE_SORT = "A árvore de respostas é ordenada só por data."
 
 # Success Messages
 SUCCESS_USER_CREATED = "Usuário criado com sucesso."
@@ -0,0 +1,245 @@
+"""Bulk load users, discussions, responses and votes from NDJSON or CSV.
+
+Each file holds one record per line (NDJSON: .ndjson/.jsonl/.json) or row
+(CSV with a header), with the columns below. Ids are kept, so the files can
+reference each other, and the format is picked by the file extension:
+
+    users:        id, name, email, password_hash, [role]
+    discussions:  id, title, content, user_id, [status], [created_at]
+    responses:    id, discussion_id, user_id, content, type, [status_aprovacao],
+                  [parent_id], [is_reliable_source], [created_at]
+    votes:        user_id, response_id, type
+
+Optional columns default like the models (responses are pending unless
+status_aprovacao says otherwise); created_at defaults to the import time and
+is read as ISO 8601, in UTC unless it has an offset. Rows are inserted with
+executemany in chunked transactions, bypassing the ORM and the counters the
+endpoints maintain. Those are recomputed afterwards, for the imported
+responses and discussions only: vote counters, ranking scores, discussion
+stats and the search index.
+
+    python -m app.db.bulk_import --users users.csv --discussions discussions.ndjson \\
+        --responses responses.ndjson --votes votes.csv
+"""
+import argparse
+import csv
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import Boolean, DateTime, Enum, Integer, bindparam, func, select, update
+from sqlalchemy.exc import DBAPIError
+
+from . import database, models, ranking, search, stats, versions
+
+responses = models.Response.__table__
+discussions = models.Discussion.__table__
+
+DEFAULT_CHUNK = 5000
+# For the recomputation: ids per IN list
+DERIVED_CHUNK = 1000
+
+COUNTERS_STATEMENT = (
+    update(responses)
+    .where(responses.c.id == bindparam("b_id"))
+    .values(upvotes=bindparam("b_up"), downvotes=bindparam("b_down"))
+)
+
+# Table: (required columns, {optional column: default})
+COLUMNS = {
+    "users": (models.User.__table__, ("id", "name", "email", "password_hash"), {"role": models.Role.regular}),
+    "discussions": (discussions, ("id", "title", "content", "user_id"), {"status": models.DiscussionStatus.ativa, "created_at": None}),
+    "responses": (
+        responses,
+        ("id", "discussion_id", "user_id", "content", "type"),
+        {"status_aprovacao": models.ApprovalStatus.pendente, "parent_id": None, "is_reliable_source": False, "created_at": None},
+    ),
+    "votes": (models.Vote.__table__, ("user_id", "response_id", "type"), {}),
+}
+# Load order, so foreign keys point at rows already inserted
+TABLES = ("users", "discussions", "responses", "votes")
+
+class BadRecord(Exception):
+    """A record that cannot be imported."""
+
+def read_records(path: str):
+    """Yield (line number, record dict) from an NDJSON or CSV file."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if os.path.splitext(path)[1].lower() == ".csv":
+            # The header is line 1
+            for number, record in enumerate(csv.DictReader(f), 2):
+                yield f"{path}:{number}", record
+        else:
+            for number, line in enumerate(f, 1):
+                if line.strip():
+                    yield f"{path}:{number}", json.loads(line)
+
+def converter(column):
+    """str (CSV) or JSON value -> what the column stores."""
+    column_type = column.type
+    if isinstance(column_type, Enum):
+        return column_type.enum_class
+    if isinstance(column_type, Boolean):
+        return lambda value: value if isinstance(value, bool) else str(value).strip().lower() in ("1", "true", "yes", "t")
+    if isinstance(column_type, Integer):
+        return int
+    if isinstance(column_type, DateTime):
+        def to_datetime(value):
+            value = datetime.fromisoformat(value)
+            if value.tzinfo is not None:
+                value = value.astimezone(timezone.utc).replace(tzinfo=None)
+            return value
+        return to_datetime
+    return str
+
+class Loader:
+    """Turns records into rows of one table, every row with the same keys."""
+
+    def __init__(self, name: str, now: datetime):
+        self.table, self.required, defaults = COLUMNS[name]
+        self.defaults = {column: now if column == "created_at" else default for column, default in defaults.items()}
+        self.converters = {column: converter(self.table.c[column]) for column in (*self.required, *self.defaults)}
+
+    def row(self, where: str, record: dict) -> dict:
+        unknown = set(record) - set(self.converters)
+        if unknown:
+            raise BadRecord(f"{where}: unknown columns {', '.join(sorted(unknown))}")
+        row = {}
+        for column, convert in self.converters.items():
+            value = record.get(column)
+            if value is None or value == "":
+                if column in self.required:
+                    raise BadRecord(f"{where}: missing {column}")
+                row[column] = self.defaults[column]
+                continue
+            try:
+                row[column] = convert(value)
+            except (TypeError, ValueError) as e:
+                # TypeError: a JSON number, list or object where text belongs
+                raise BadRecord(f"{where}: bad {column} {value!r} ({e})")
+        return row
+
+class Importer:
+    def __init__(self, engine, chunk: int):
+        self.engine = engine
+        self.chunk = chunk
+        self.now = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+        self.response_ids = []
+        self.discussion_ids = set()
+        self.voted_response_ids = set()
+        # Replies whose parent comes later in the file, linked at the end
+        self.deferred_parents = []
+
+    def insert(self, table, rows, where: str):
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(table.insert(), rows)
+        except DBAPIError as e:
+            raise BadRecord(f"chunk ending at {where}: {e.orig}")
+
+    def load(self, name: str, path: str) -> int:
+        loader = Loader(name, self.now)
+        seen_responses = set()
+        rows, count, where = [], 0, path
+        for where, record in read_records(path):
+            row = loader.row(where, record)
+            if name == "responses":
+                if row["parent_id"] is not None and row["parent_id"] not in seen_responses:
+                    self.deferred_parents.append({"b_id": row["id"], "b_parent_id": row["parent_id"]})
+                    row["parent_id"] = None
+                seen_responses.add(row["id"])
+                self.response_ids.append(row["id"])
+                self.discussion_ids.add(row["discussion_id"])
+            elif name == "discussions":
+                self.discussion_ids.add(row["id"])
+            elif name == "votes":
+                self.voted_response_ids.add(row["response_id"])
+            rows.append(row)
+            if len(rows) >= self.chunk:
+                self.insert(loader.table, rows, where)
+                count += len(rows)
+                rows = []
+        if rows:
+            self.insert(loader.table, rows, where)
+            count += len(rows)
+        return count
+
+    def link_parents(self):
+        stmt = update(responses).where(responses.c.id == bindparam("b_id")).values(parent_id=bindparam("b_parent_id"))
+        for start in range(0, len(self.deferred_parents), self.chunk):
+            with self.engine.begin() as conn:
+                conn.execute(stmt, self.deferred_parents[start:start + self.chunk])
+
+    def count_votes(self, conn, response_ids):
+        """votes.reconcile_counters as one GROUP BY: its correlated counts
+        would scan the votes table once per response where votes.response_id
+        has no index of its own (SQLite)."""
+        vote_rows = models.Vote.__table__
+        counts = {response_id: {"b_id": response_id, "b_up": 0, "b_down": 0} for response_id in response_ids}
+        for response_id, vote_type, count in conn.execute(
+            select(vote_rows.c.response_id, vote_rows.c.type, func.count())
+            .where(vote_rows.c.response_id.in_(response_ids))
+            .group_by(vote_rows.c.response_id, vote_rows.c.type)
+        ):
+            counts[response_id]["b_up" if vote_type == models.VoteType.up else "b_down"] = count
+        conn.execute(COUNTERS_STATEMENT, list(counts.values()))
+
+    def recompute(self):
+        """Everything the endpoints would have maintained, for what was imported."""
+        self.link_parents()
+        response_ids = sorted(self.voted_response_ids.union(self.response_ids))
+        for start in range(0, len(response_ids), DERIVED_CHUNK):
+            ids = response_ids[start:start + DERIVED_CHUNK]
+            with self.engine.begin() as conn:
+                self.count_votes(conn, ids)
+                ranking.recompute(conn, ids)
+                versions.bump_responses_version_of(conn, ids)
+                self.discussion_ids.update(
+                    conn.execute(select(responses.c.discussion_id).where(responses.c.id.in_(ids)).distinct()).scalars()
+                )
+        discussion_ids = sorted(self.discussion_ids)
+        for start in range(0, len(discussion_ids), DERIVED_CHUNK):
+            ids = discussion_ids[start:start + DERIVED_CHUNK]
+            with self.engine.begin() as conn:
+                stats.rebuild(conn, ids)
+                search.index_discussions(conn, conn.execute(select(discussions).where(discussions.c.id.in_(ids))).all())
+        imported = sorted(self.response_ids)
+        for start in range(0, len(imported), DERIVED_CHUNK):
+            with self.engine.begin() as conn:
+                search.index_responses(conn, conn.execute(
+                    select(responses).where(
+                        responses.c.id.in_(imported[start:start + DERIVED_CHUNK]),
+                        responses.c.status_aprovacao == models.ApprovalStatus.aprovada,
+                    )
+                ).all())
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk load users, discussions, responses and votes from NDJSON or CSV files.")
+    for name in TABLES:
+        parser.add_argument("--" + name, metavar="FILE")
+    parser.add_argument("--chunk", type=int, default=DEFAULT_CHUNK, help="rows per INSERT and transaction (default %(default)s)")
+    args = parser.parse_args()
+    if not any(getattr(args, name) for name in TABLES):
+        parser.error("give at least one file to import")
+
+    importer = Importer(database.get_engine(), args.chunk)
+    started = time.perf_counter()
+    try:
+        for name in TABLES:
+            path = getattr(args, name)
+            if path:
+                table_started = time.perf_counter()
+                count = importer.load(name, path)
+                seconds = time.perf_counter() - table_started
+                print("%-12s %9d rows in %7.1fs (%.0f rows/s)" % (name, count, seconds, count / seconds if seconds else 0))
+        derived_started = time.perf_counter()
+        importer.recompute()
+    except BadRecord as e:
+        # Chunks already committed stay in: fix the file and import the rest
+        raise SystemExit("Import stopped at %s" % e)
+    print("%-12s %9s      in %7.1fs" % ("recompute", "", time.perf_counter() - derived_started))
+    print("%-12s %9s      in %7.1fs" % ("total", "", time.perf_counter() - started))
+
+if __name__ == "__main__":
+    main()
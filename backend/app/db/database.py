@@ -1,27 +1,237 @@
-from sqlalchemy import create_engine
+"""Engines and sessions.
+
+Nothing here connects, or even creates an engine, at import time: the first
+get_engine() does, so importing the app is cheap, works while the database
+is down, and is safe before a fork (gunicorn --preload). The schema is
+Alembic's job (`alembic upgrade head`).
+"""
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import create_engine, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+import asyncio
 import os
-from urllib.parse import quote_plus
+from contextlib import asynccontextmanager
+import threading
+import time
+import weakref
+
+from ..core import config, metrics, texts
+
+SQLALCHEMY_DATABASE_URL = config.DATABASE_URL
+
+class PoolStats:
+    """Running totals of the time callers spent waiting for a pooled connection."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.queued = 0
+        self.queue_timeouts = 0
+        self.queue_wait_seconds = 0.0
+
+    def record(self, waited, timed_out=False):
+        with self.lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        if timed_out:
+            metrics.DB_POOL_TIMEOUTS.inc()
+        else:
+            metrics.DB_POOL_WAIT.observe(waited)
+
+    def enter_queue(self):
+        with self.lock:
+            self.queued += 1
+
+    def leave_queue(self, waited, timed_out=False):
+        with self.lock:
+            self.queued -= 1
+            if timed_out:
+                self.queue_timeouts += 1
+            self.queue_wait_seconds += waited
 
-from dotenv import load_dotenv
-import sys
+    def snapshot(self):
+        with self.lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": round(self.wait_seconds, 6),
+                "wait_seconds_max": round(self.max_wait_seconds, 6),
+                "queued_requests": self.queued,
+                "queue_timeouts": self.queue_timeouts,
+                "queue_wait_seconds_total": round(self.queue_wait_seconds, 6),
+            }
 
-sys.path.append(os.getcwd())
-load_dotenv(os.path.join(os.getcwd(), "app", "core", ".env"))
+class TimedQueuePool(QueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
 
-password = os.getenv("DATABASE_PASSWORD", "password")
-SQLALCHEMY_DATABASE_PASSWORD = quote_plus(password)
-SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "mysql+pymysql://developer:%s@127.0.0.1/politicafatos" % SQLALCHEMY_DATABASE_PASSWORD)
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.stats.record(time.perf_counter() - started)
+        return connection
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+class TimedAsyncAdaptedQueuePool(TimedQueuePool, AsyncAdaptedQueuePool):
+    pass
+
+def pool_options():
+    return {
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+    }
+
+def describe_pool(pool):
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        # overflow() counts up from -size as connections are opened
+        "overflow": max(0, pool.overflow()),
+        **pool.stats.snapshot(),
+    }
+
+engine = None
+async_engine = None
+# Bound to their engines by get_engine() / get_async_engine()
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+AsyncSessionLocal = None
+engine_lock = threading.Lock()
+
+def get_engine():
+    global engine
+    if engine is None:
+        with engine_lock:
+            if engine is None:
+                engine = create_engine(SQLALCHEMY_DATABASE_URL, poolclass=TimedQueuePool, **pool_options())
+                SessionLocal.configure(bind=engine)
+    return engine
+
+def configure(url: str):
+    """Use `url` instead of DATABASE_URL, before anything has connected."""
+    global SQLALCHEMY_DATABASE_URL
+    with engine_lock:
+        if engine is not None or async_engine is not None:
+            raise RuntimeError("the database engine is already in use")
+        SQLALCHEMY_DATABASE_URL = url
+
+def dispose_after_fork():
+    # A forked worker must not reuse the parent's pooled connections; close=False
+    # leaves them to the parent instead of closing them under it
+    if engine is not None:
+        engine.dispose(close=False)
+    if async_engine is not None:
+        async_engine.sync_engine.dispose(close=False)
+
+os.register_at_fork(after_in_child=dispose_after_fork)
 
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
+# A sync request keeps its connection until FastAPI has validated the response
+# and closed the session, and both steps need a threadpool thread. If more
+# requests than there are connections get into the threadpool, the ones
+# waiting for a connection can hold every thread and nothing finishes until
+# pool_timeout. Requests therefore queue here, on the event loop, until a
+# connection is free for them.
+class Slots:
+    """`size` slots on each event loop that asks for them.
+
+    An asyncio.Semaphore binds to the first loop that waits on it, so one
+    created at import time breaks once the app runs on another loop (a new
+    TestClient, a server restarted in the same process). Each loop gets its
+    own, created on first use.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.lock = threading.Lock()
+        self.by_loop = weakref.WeakKeyDictionary()
+
+    def semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            slots = self.by_loop.get(loop)
+            if slots is None:
+                slots = self.by_loop[loop] = asyncio.Semaphore(self.size)
+            return slots
+
+db_slots = Slots(config.DB_POOL_SIZE + config.DB_MAX_OVERFLOW)
+
+@asynccontextmanager
+async def queued_session(pool, slots: Slots, make_session):
+    """A session from `make_session`, once one of `slots` (sized to `pool`) is free."""
+    slots = slots.semaphore()
+    stats = pool.stats
+    stats.enter_queue()
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(slots.acquire(), config.DB_POOL_TIMEOUT)
+    except asyncio.TimeoutError:
+        stats.leave_queue(time.perf_counter() - started, timed_out=True)
+        raise HTTPException(status_code=503, detail=texts.ERROR_DATABASE_BUSY)
+    stats.leave_queue(time.perf_counter() - started)
+    db = make_session()
     try:
         yield db
     finally:
-        db.close()
+        await run_in_threadpool(db.close)
+        slots.release()
+
+def primary_session():
+    return queued_session(get_engine().pool, db_slots, SessionLocal)
+
+async def get_db():
+    async with primary_session() as db:
+        yield db
+
+ASYNC_DRIVERS = {"mysql": "mysql+aiomysql", "sqlite": "sqlite+aiosqlite"}
+
+def to_async_url(url):
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()])
+
+def get_async_engine():
+    global async_engine, AsyncSessionLocal
+    if async_engine is None:
+        with engine_lock:
+            if async_engine is None:
+                from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+                async_engine = create_async_engine(
+                    config.ASYNC_DATABASE_URL or to_async_url(SQLALCHEMY_DATABASE_URL),
+                    poolclass=TimedAsyncAdaptedQueuePool,
+                    **pool_options()
+                )
+                # Responses are serialized after the session work is done, outside of the
+                # greenlet, so loaded objects must not expire and trigger lazy IO.
+                AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    return async_engine
+
+async def get_async_db():
+    get_async_engine()
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def pool_status():
+    status = {"sync": describe_pool(get_engine().pool)}
+    if config.DB_ASYNC:
+        status["async"] = describe_pool(get_async_engine().pool)
+    return status
@@ -1,9 +1,14 @@
-from sqlalchemy import Column, Integer, String, Boolean, Text, ForeignKey, Enum, DateTime, UniqueConstraint
+from sqlalchemy import BigInteger, Column, Integer, String, Boolean, Text, ForeignKey, Enum, DateTime, UniqueConstraint, Index
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
 import enum
 
+# SQLite's CURRENT_TIMESTAMP has no fractional seconds. Bind datetimes the same
+# way so comparisons on created_at (keyset pagination) match the stored values.
+Timestamp = DateTime(timezone=True).with_variant(sqlite.DATETIME(truncate_microseconds=True), "sqlite")
+
 class Role(str, enum.Enum):
     regular = "regular"
     moderator = "moderator"
@@ -37,19 +42,46 @@ class User(Base):
 
 class Discussion(Base):
     __tablename__ = "discussions"
+    __table_args__ = (
+        # Keyset pagination (read_discussions); covers the page's ETag query
+        Index('ix_discussions_created_at_id_version', 'created_at', 'id', 'version'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(255), nullable=False)
     content = Column(Text, nullable=False)
     status = Column(Enum(DiscussionStatus), default=DiscussionStatus.ativa)
     user_id = Column(Integer, ForeignKey("users.id"))
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(Timestamp, server_default=func.now())
+    # Bumped on every change to this row / to its list of approved responses,
+    # so the read endpoints can answer If-None-Match without running the query
+    version = Column(Integer, nullable=False, default=0, server_default="0")
+    responses_version = Column(Integer, nullable=False, default=0, server_default="0")
+    # Listed by GET /discussions/, kept up to date by the writes (db/stats.py):
+    # approved responses by type, responses awaiting moderation, the votes on
+    # all of its responses and when a response was last posted or voted on
+    agree_count = Column(Integer, nullable=False, default=0, server_default="0")
+    disagree_count = Column(Integer, nullable=False, default=0, server_default="0")
+    pending_count = Column(Integer, nullable=False, default=0, server_default="0")
+    total_votes = Column(Integer, nullable=False, default=0, server_default="0")
+    last_activity_at = Column(Timestamp, nullable=True)
 
     author = relationship("User", back_populates="discussions")
     responses = relationship("Response", back_populates="discussion")
 
 class Response(Base):
     __tablename__ = "responses"
+    __table_args__ = (
+        # Approved responses of a discussion, in keyset order (read_responses)
+        Index('ix_responses_discussion_id_status_aprovacao_created_at', 'discussion_id', 'status_aprovacao', 'created_at', 'id'),
+        # Approved responses of a discussion by ranking (read_responses?sort=top|hot)
+        Index('ix_responses_discussion_id_status_aprovacao_score_top', 'discussion_id', 'status_aprovacao', 'score_top', 'id'),
+        Index('ix_responses_discussion_id_status_aprovacao_score_hot', 'discussion_id', 'status_aprovacao', 'score_hot', 'id'),
+        # Moderation queue, oldest first (read_pending_responses)
+        Index('ix_responses_status_aprovacao_created_at', 'status_aprovacao', 'created_at', 'id'),
+        # Duplicate reply check (create_response)
+        Index('ix_responses_parent_id_user_id', 'parent_id', 'user_id'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     discussion_id = Column(Integer, ForeignKey("discussions.id"))
@@ -61,7 +93,10 @@ class Response(Base):
     is_reliable_source = Column(Boolean, default=False)
     upvotes = Column(Integer, default=0)
     downvotes = Column(Integer, default=0)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(Timestamp, server_default=func.now())
+    # Ranking scores, rewritten with the vote counters (db/ranking.py)
+    score_top = Column(BigInteger, nullable=False, default=0, server_default="0")
+    score_hot = Column(BigInteger, nullable=False, default=0, server_default="0")
 
     discussion = relationship("Discussion", back_populates="responses")
     author = relationship("User", back_populates="responses")
@@ -82,6 +117,7 @@ class VoteType(str, enum.Enum):
 class Vote(Base):
     __tablename__ = "votes"
     __table_args__ = (
+        # Also serves as the (user_id, response_id) lookup index for votes
         UniqueConstraint('user_id', 'response_id', name='unique_user_response_vote'),
     )
 
@@ -93,3 +129,37 @@ class Vote(Base):
     user = relationship("User", back_populates="votes")
     response = relationship("Response", back_populates="votes")
 
+class SearchDocType(str, enum.Enum):
+    discussion = "discussion"
+    response = "response"
+
+class SearchPosting(Base):
+    """One term of one indexed document (db/search.py). Discussions are
+    indexed when created, responses while they are approved."""
+    __tablename__ = "search_postings"
+    __table_args__ = (
+        # Removing a document from the index
+        Index('ix_search_postings_doc_type_doc_id', 'doc_type', 'doc_id'),
+    )
+
+    # The primary key leads with the term, so a query reads only its terms' postings
+    term = Column(String(64), primary_key=True)
+    doc_type = Column(Enum(SearchDocType), primary_key=True)
+    doc_id = Column(Integer, primary_key=True)
+    discussion_id = Column(Integer, ForeignKey("discussions.id"), nullable=False)
+    # Term frequency score of the term in the document, scaled to an integer
+    weight = Column(Integer, nullable=False)
+
+class RateLimitCounter(Base):
+    """A rate limit window shared by every worker, for
+    RATE_LIMIT_STORAGE_URI=database:// (db/rate_limits.py)."""
+    __tablename__ = "rate_limit_counters"
+    __table_args__ = (
+        # Purging expired windows
+        Index('ix_rate_limit_counters_expires_at', 'expires_at'),
+    )
+
+    key = Column(String(255), primary_key=True)
+    count = Column(Integer, nullable=False)
+    # Unix time in milliseconds
+    expires_at = Column(BigInteger, nullable=False)
@@ -0,0 +1,101 @@
+"""Stored ranking scores of responses, for read_responses?sort=top|hot.
+
+- score_top is the lower bound of the 95% Wilson score interval of the
+  upvote ratio, so 90 up / 10 down ranks above 1 up / 0 down.
+- score_hot is Reddit's hot score: log10 of the net votes plus the creation
+  time in units of 12.5 hours, so a response needs ten times the net votes
+  to stay level with one posted 12.5 hours later. It only moves when the
+  votes do; newer responses simply start higher.
+
+Both are scaled to integers, so keyset pagination compares them exactly.
+They are written whenever the vote counters are (vote_response, the vote
+buffer's flushes and reconciliations). Recompute them all with:
+
+    python -m app.db.ranking
+"""
+import argparse
+import math
+from datetime import datetime, timezone
+
+from sqlalchemy import bindparam, select, update
+
+from . import database, models
+
+responses = models.Response.__table__
+
+# 95% confidence
+Z = 1.96
+TOP_SCALE = 10 ** 9
+HOT_EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc)
+HOT_PERIOD = 45000
+HOT_SCALE = 10 ** 7
+REBUILD_CHUNK = 1000
+
+def wilson_lower_bound(up: int, down: int) -> int:
+    n = up + down
+    if n <= 0:
+        return 0
+    p = up / n
+    bound = (p + Z * Z / (2 * n) - Z * math.sqrt((p * (1 - p) + Z * Z / (4 * n)) / n)) / (1 + Z * Z / n)
+    return round(TOP_SCALE * max(bound, 0.0))
+
+def hot_score(up: int, down: int, created_at: datetime) -> int:
+    net = up - down
+    order = math.log10(max(abs(net), 1))
+    sign = (net > 0) - (net < 0)
+    if created_at.tzinfo is None:
+        # Stored timestamps are UTC
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    seconds = (created_at - HOT_EPOCH).total_seconds()
+    return round(HOT_SCALE * (sign * order + seconds / HOT_PERIOD))
+
+def scores(up: int, down: int, created_at: datetime) -> dict:
+    return {"score_top": wilson_lower_bound(up, down), "score_hot": hot_score(up, down, created_at)}
+
+# One executemany for any number of responses
+UPDATE_STATEMENT = (
+    update(responses)
+    .where(responses.c.id == bindparam("b_id"))
+    .values(score_top=bindparam("b_top"), score_hot=bindparam("b_hot"))
+)
+
+def update_scores(conn, rows):
+    """`rows` are (response_id, upvotes, downvotes, created_at) tuples."""
+    params = []
+    for response_id, up, down, created_at in rows:
+        values = scores(up or 0, down or 0, created_at)
+        params.append({"b_id": response_id, "b_top": values["score_top"], "b_hot": values["score_hot"]})
+    if len(params) == 1:
+        conn.execute(UPDATE_STATEMENT, params[0])
+    elif params:
+        conn.execute(UPDATE_STATEMENT, params)
+
+def recompute(conn, response_ids):
+    """Rescore the given responses from their stored counters."""
+    rows = conn.execute(
+        select(responses.c.id, responses.c.upvotes, responses.c.downvotes, responses.c.created_at)
+        .where(responses.c.id.in_(response_ids))
+        .order_by(responses.c.id)
+    ).all()
+    update_scores(conn, rows)
+
+def rebuild(engine) -> int:
+    """Rescore every response, in chunks."""
+    count, after = 0, 0
+    while True:
+        with engine.begin() as conn:
+            ids = conn.execute(
+                select(responses.c.id).where(responses.c.id > after).order_by(responses.c.id).limit(REBUILD_CHUNK)
+            ).scalars().all()
+            if not ids:
+                return count
+            recompute(conn, ids)
+        count += len(ids)
+        after = ids[-1]
+
+def main():
+    argparse.ArgumentParser(description="Recompute the ranking scores of every response.").parse_args()
+    print("Rescored %d responses" % rebuild(database.get_engine()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""Rate limit storage in the application database, for hosts without Redis.
+
+Registers the database:// scheme with the limits library, so
+RATE_LIMIT_STORAGE_URI=database:// makes every worker count against the same
+windows in rate_limit_counters. Each limited request costs a few indexed
+statements on the primary key, in one short transaction, on a pool of
+RATE_LIMIT_DB_POOL_SIZE connections of its own; Redis is cheaper when it is
+available.
+
+Windows are keyed like limits' MemoryStorage ("<key>/<window number>"), so
+the sliding window counter strategy only needs incr and get. Expired rows
+are deleted by the worker that notices them, at most once a PURGE_INTERVAL.
+"""
+import math
+import os
+import threading
+import time
+
+from limits.storage import SlidingWindowCounterSupport, Storage
+from limits.storage.base import TimestampedSlidingWindow
+from sqlalchemy import case, create_engine, delete, insert, select, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from ..core import config
+from . import database, models
+
+counters = models.RateLimitCounter.__table__
+
+PURGE_INTERVAL = 60
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+class DatabaseStorage(Storage, TimestampedSlidingWindow, SlidingWindowCounterSupport):
+    STORAGE_SCHEME = ["database"]
+
+    def __init__(self, uri=None, wrap_exceptions: bool = False, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self.lock = threading.Lock()
+        self.next_purge = 0.0
+        self._engine = None
+        os.register_at_fork(after_in_child=self.dispose_after_fork)
+
+    @property
+    def base_exceptions(self):
+        return SQLAlchemyError
+
+    @property
+    def engine(self):
+        # Not database.get_engine(): the limits are checked after the request's
+        # dependencies took their connection, so with the request pool used up
+        # every check would wait for a connection only the waiters can free
+        if self._engine is None:
+            with self.lock:
+                if self._engine is None:
+                    self._engine = create_engine(
+                        database.SQLALCHEMY_DATABASE_URL,
+                        poolclass=database.TimedQueuePool,
+                        **dict(database.pool_options(), pool_size=config.RATE_LIMIT_DB_POOL_SIZE, max_overflow=0),
+                    )
+        return self._engine
+
+    def dispose_after_fork(self):
+        if self._engine is not None:
+            self._engine.dispose(close=False)
+
+    def incr(self, key: str, expiry: float, amount: int = 1) -> int:
+        now = now_ms()
+        self.purge(now)
+        expires_at = now + math.ceil(expiry * 1000)
+        expired = counters.c.expires_at <= now
+        # MySQL assigns left to right and later assignments see the new
+        # values, so count has to be set before expires_at
+        stmt = update(counters).where(counters.c.key == key).ordered_values(
+            (counters.c.count, case((expired, amount), else_=counters.c.count + amount)),
+            (counters.c.expires_at, case((expired, expires_at), else_=counters.c.expires_at)),
+        )
+        while True:
+            with self.engine.begin() as conn:
+                if conn.execute(stmt).rowcount:
+                    return conn.execute(select(counters.c.count).where(counters.c.key == key)).scalar()
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(insert(counters).values(key=key, count=amount, expires_at=expires_at))
+                return amount
+            except IntegrityError:
+                # Another worker created the window first: count on it
+                continue
+
+    def decr(self, key: str, amount: int = 1) -> int:
+        now = now_ms()
+        with self.engine.begin() as conn:
+            conn.execute(
+                update(counters)
+                .where(counters.c.key == key, counters.c.expires_at > now)
+                .values(count=case((counters.c.count > amount, counters.c.count - amount), else_=0))
+            )
+            return conn.execute(
+                select(counters.c.count).where(counters.c.key == key, counters.c.expires_at > now)
+            ).scalar() or 0
+
+    def get(self, key: str) -> int:
+        with self.engine.connect() as conn:
+            return conn.execute(
+                select(counters.c.count).where(counters.c.key == key, counters.c.expires_at > now_ms())
+            ).scalar() or 0
+
+    def get_expiry(self, key: str) -> float:
+        with self.engine.connect() as conn:
+            expires_at = conn.execute(select(counters.c.expires_at).where(counters.c.key == key)).scalar()
+        return expires_at / 1000 if expires_at is not None else time.time()
+
+    def clear(self, key: str) -> None:
+        with self.engine.begin() as conn:
+            conn.execute(delete(counters).where(counters.c.key == key))
+
+    def check(self) -> bool:
+        try:
+            with self.engine.connect() as conn:
+                conn.execute(select(1))
+            return True
+        except SQLAlchemyError:
+            return False
+
+    def reset(self) -> int:
+        with self.engine.begin() as conn:
+            return conn.execute(delete(counters)).rowcount
+
+    def purge(self, now: int):
+        with self.lock:
+            if now / 1000 < self.next_purge:
+                return
+            self.next_purge = now / 1000 + PURGE_INTERVAL
+        with self.engine.begin() as conn:
+            conn.execute(delete(counters).where(counters.c.expires_at <= now))
+
+    def window_counts(self, previous_key: str, current_key: str, now: int):
+        """Both windows' counts in one query."""
+        with self.engine.connect() as conn:
+            rows = dict(conn.execute(
+                select(counters.c.key, counters.c.count)
+                .where(counters.c.key.in_([previous_key, current_key]), counters.c.expires_at > now)
+            ).all())
+        return rows.get(previous_key, 0), rows.get(current_key, 0)
+
+    # Sliding window counter, as in limits' MemoryStorage
+
+    def sliding_window(self, key: str, expiry: int, now: float):
+        previous_key, current_key = self.sliding_window_keys(key, expiry, now)
+        previous_count, current_count = self.window_counts(previous_key, current_key, int(now * 1000))
+        previous_ttl = 0.0 if previous_count == 0 else (1 - (((now - expiry) / expiry) % 1)) * expiry
+        current_ttl = (1 - ((now / expiry) % 1)) * expiry + expiry
+        return previous_count, previous_ttl, current_count, current_ttl
+
+    def acquire_sliding_window_entry(self, key: str, limit: int, expiry: int, amount: int = 1) -> bool:
+        if amount > limit:
+            return False
+        now = time.time()
+        previous_count, previous_ttl, current_count, _ = self.sliding_window(key, expiry, now)
+        weighted = previous_count * previous_ttl / expiry
+        if math.floor(weighted + current_count) + amount > limit:
+            return False
+        current_key = self.sliding_window_keys(key, expiry, now)[1]
+        # A window is kept for two periods, to be the next one's previous window
+        current_count = self.incr(current_key, 2 * expiry, amount)
+        if math.floor(weighted + current_count) > limit:
+            # Another worker took the last entry in the meantime
+            self.decr(current_key, amount)
+            return False
+        return True
+
+    def get_sliding_window(self, key: str, expiry: int):
+        return self.sliding_window(key, expiry, time.time())
+
+    def clear_sliding_window(self, key: str, expiry: int) -> None:
+        for window_key in self.sliding_window_keys(key, expiry, time.time()):
+            self.clear(window_key)
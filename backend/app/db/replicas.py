@@ -0,0 +1,170 @@
+"""Read replicas for the GET endpoints.
+
+DATABASE_REPLICA_URLS lists replicas of DATABASE_URL. get_read_db gives the
+read endpoints a session on one of them, picked by DB_REPLICA_SELECTION:
+round-robin, or least-connections (the fewest sessions open on it in this
+worker). The connection is checked out before the session is handed over,
+so a replica that cannot be reached is skipped for DB_REPLICA_RETRY_INTERVAL
+seconds and the next one is tried; with none left, or none configured, the
+read goes to the primary like database.get_db.
+
+Replicas lag behind the primary. ReadYourWritesMiddleware answers every
+successful write (any method but GET, HEAD and OPTIONS) with a cookie that
+sends the client's reads to the primary for the next DB_REPLICA_MAX_LAG
+seconds, whichever worker serves them, so a user who just voted or posted
+sees it. Pages read from a replica are not cached within DB_REPLICA_MAX_LAG
+of their discussion's invalidation (see lag()).
+
+Sessions from get_read_db must not write: replicas are read only.
+"""
+import itertools
+import os
+import threading
+import time
+
+from fastapi import Request
+from sqlalchemy import create_engine, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
+
+from ..core import config, metrics
+from . import database
+
+SELECTIONS = ("round-robin", "least-connections")
+if config.DB_REPLICA_SELECTION not in SELECTIONS:
+    raise ValueError("DB_REPLICA_SELECTION must be one of %s" % ", ".join(SELECTIONS))
+
+# Holds the time (epoch seconds) until which the client reads from the primary
+RECENT_WRITE_COOKIE = "recent_write"
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+class Replica:
+    """One replica: its engine (created on first use, like database.get_engine) and health."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.engine = None
+        self.lock = threading.Lock()
+        self.sessions = sessionmaker(autocommit=False, autoflush=False)
+        # Like database.db_slots, per replica: each has its own pool
+        self.slots = database.Slots(config.DB_POOL_SIZE + config.DB_MAX_OVERFLOW)
+        # Sessions open on it in this worker, for least-connections
+        self.open = 0
+        self.down_until = 0.0
+        self.failures = 0
+
+    def get_engine(self):
+        if self.engine is None:
+            with self.lock:
+                if self.engine is None:
+                    self.engine = create_engine(self.url, poolclass=database.TimedQueuePool, **database.pool_options())
+                    self.sessions.configure(bind=self.engine)
+        return self.engine
+
+    def mark_down(self):
+        self.failures += 1
+        self.down_until = time.monotonic() + config.DB_REPLICA_RETRY_INTERVAL
+
+    def status(self):
+        status = {
+            "url": make_url(self.url).render_as_string(hide_password=True),
+            "healthy": self.down_until <= time.monotonic(),
+            "failures": self.failures,
+            "sessions": self.open,
+        }
+        if self.engine is not None:
+            status.update(database.describe_pool(self.engine.pool))
+        return status
+
+replicas = [Replica(url) for url in config.DATABASE_REPLICA_URLS]
+turns = itertools.count()
+
+def dispose_after_fork():
+    for replica in replicas:
+        if replica.engine is not None:
+            replica.engine.dispose(close=False)
+
+os.register_at_fork(after_in_child=dispose_after_fork)
+
+def healthy(skip=()) -> list:
+    now = time.monotonic()
+    return [replica for replica in replicas if replica.down_until <= now and replica not in skip]
+
+def choose(candidates: list) -> Replica:
+    if config.DB_REPLICA_SELECTION == "least-connections":
+        return min(candidates, key=lambda replica: replica.open)
+    return candidates[next(turns) % len(candidates)]
+
+def wrote_recently(request: Request) -> bool:
+    try:
+        until = float(request.cookies.get(RECENT_WRITE_COOKIE, 0))
+    except ValueError:
+        return False
+    now = time.time()
+    # A cookie further out than one window was not set by us
+    return now < until <= now + int(config.DB_REPLICA_MAX_LAG) + 1
+
+def lag(db: Session) -> float:
+    """How far behind the primary what `db` reads may be."""
+    return config.DB_REPLICA_MAX_LAG if db.info.get("replica") else 0.0
+
+async def get_read_db(request: Request):
+    """A session for reading only: on a replica when one is healthy and the
+    client has not written within DB_REPLICA_MAX_LAG, on the primary otherwise."""
+    if not replicas:
+        async with database.primary_session() as db:
+            yield db
+        return
+    if wrote_recently(request):
+        source = "primary_recent_write"
+    else:
+        tried = []
+        while True:
+            candidates = healthy(tried)
+            if not candidates:
+                break
+            replica = choose(candidates)
+            tried.append(replica)
+            replica.open += 1
+            try:
+                async with database.queued_session(replica.get_engine().pool, replica.slots, replica.sessions) as db:
+                    try:
+                        await run_in_threadpool(db.connection)
+                    except exc.DBAPIError:
+                        replica.mark_down()
+                        continue
+                    db.info["replica"] = True
+                    metrics.DB_READ_SESSIONS.labels("replica").inc()
+                    yield db
+                    return
+            finally:
+                replica.open -= 1
+        source = "primary_fallback"
+    metrics.DB_READ_SESSIONS.labels(source).inc()
+    async with database.primary_session() as db:
+        yield db
+
+def status():
+    return [replica.status() for replica in replicas]
+
+class ReadYourWritesMiddleware:
+    """Pure ASGI: sets RECENT_WRITE_COOKIE on the responses to successful writes."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in READ_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                max_age = int(config.DB_REPLICA_MAX_LAG) + 1
+                cookie = "%s=%d; Max-Age=%d; Path=/; HttpOnly; SameSite=Lax" % (
+                    RECENT_WRITE_COOKIE, time.time() + max_age, max_age)
+                message["headers"] = [*message.get("headers", ()), (b"set-cookie", cookie.encode("latin-1"))]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
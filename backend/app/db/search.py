@@ -0,0 +1,144 @@
+"""Full-text search over discussions and approved responses.
+
+An inverted index in search_postings, one row per (term, document), kept up
+to date by the writes: discussions are indexed when they are created,
+responses when they are approved, and rejected responses are taken out. It
+works the same on MySQL and SQLite and applies the Portuguese stemming and
+stop words of core/portuguese.py, which MySQL FULLTEXT does not.
+
+Documents are ranked by BM25 without length normalization: the sum, over the
+query terms, of the term's saturated frequency in the document times its
+inverse document frequency, computed by one GROUP BY over the postings of
+the query terms.
+
+Index the existing data (after upgrading, or after editing it by hand) with:
+
+    python -m app.db.search
+"""
+import argparse
+import math
+from collections import Counter
+
+from sqlalchemy import and_, case, delete, func, insert, or_, select, true
+
+from ..core import portuguese
+from . import database, models
+
+postings = models.SearchPosting.__table__
+discussions = models.Discussion.__table__
+responses = models.Response.__table__
+
+DISCUSSION = models.SearchDocType.discussion
+RESPONSE = models.SearchDocType.response
+
+# A title word counts as this many occurrences
+TITLE_BOOST = 3
+# BM25 term frequency saturation
+K1 = 1.2
+# Weights and idfs are integers, so scores are exact and a page's last score
+# can be used in the next page's seek predicate
+SCALE = 100
+# Distinct terms of a query that are looked up, the rest is ignored
+MAX_QUERY_TERMS = 10
+REBUILD_CHUNK = 1000
+
+def term_weights(*fields):
+    """`fields` are (text, boost) pairs. Returns {term: scaled weight}."""
+    counts = Counter()
+    for text, boost in fields:
+        for term in portuguese.terms(text):
+            counts[term] += boost
+    return {term: round(SCALE * tf * (K1 + 1) / (tf + K1)) for term, tf in counts.items()}
+
+def index_documents(conn, doc_type: models.SearchDocType, docs):
+    """`docs` are (doc_id, discussion_id, fields) tuples. Postings the
+    documents already had are replaced, so indexing twice is harmless."""
+    docs = list(docs)
+    if not docs:
+        return
+    unindex(conn, doc_type, [doc_id for doc_id, _, _ in docs])
+    rows = [
+        {"term": term, "doc_type": doc_type, "doc_id": doc_id, "discussion_id": discussion_id, "weight": weight}
+        for doc_id, discussion_id, fields in docs
+        for term, weight in term_weights(*fields).items()
+    ]
+    if rows:
+        conn.execute(insert(postings), rows)
+
+def index_discussions(conn, items):
+    index_documents(conn, DISCUSSION, [(d.id, d.id, ((d.title, TITLE_BOOST), (d.content, 1))) for d in items])
+
+def index_responses(conn, items):
+    index_documents(conn, RESPONSE, [(r.id, r.discussion_id, ((r.content, 1),)) for r in items])
+
+def unindex(conn, doc_type: models.SearchDocType, doc_ids):
+    conn.execute(delete(postings).where(postings.c.doc_type == doc_type, postings.c.doc_id.in_(doc_ids)))
+
+def document_count(conn) -> int:
+    # From the stats counters (db/stats.py) rather than a count over responses
+    return conn.execute(
+        select(func.count(discussions.c.id) + func.coalesce(func.sum(discussions.c.agree_count + discussions.c.disagree_count), 0))
+    ).scalar()
+
+def search(conn, query: str, size: int, after=None):
+    """Return up to `size` (doc_type, doc_id, discussion_id, score) rows, best
+    first, seeking past the (score, doc_type, doc_id) of `after`."""
+    query_terms = list(dict.fromkeys(portuguese.terms(query)))[:MAX_QUERY_TERMS]
+    if not query_terms:
+        return []
+    frequencies = conn.execute(
+        select(postings.c.term, func.count()).where(postings.c.term.in_(query_terms)).group_by(postings.c.term)
+    ).all()
+    if not frequencies:
+        return []
+    n = document_count(conn)
+    # At least 1: the counters may lag behind the postings
+    idfs = {term: max(1, round(SCALE * math.log(1 + (n - df + 0.5) / (df + 0.5)))) for term, df in frequencies}
+
+    score = func.sum(postings.c.weight * case(idfs, value=postings.c.term))
+    stmt = (
+        select(postings.c.doc_type, postings.c.doc_id, postings.c.discussion_id, score.label("score"))
+        .where(postings.c.term.in_(list(idfs)))
+        .group_by(postings.c.doc_type, postings.c.doc_id, postings.c.discussion_id)
+    )
+    if after is not None:
+        last_score, last_type, last_id = after
+        stmt = stmt.having(or_(
+            score < last_score,
+            and_(score == last_score, or_(
+                postings.c.doc_type > last_type,
+                and_(postings.c.doc_type == last_type, postings.c.doc_id > last_id),
+            )),
+        ))
+    stmt = stmt.order_by(score.desc(), postings.c.doc_type, postings.c.doc_id).limit(size)
+    return conn.execute(stmt).all()
+
+def rebuild(engine):
+    """Index every discussion and approved response from scratch, in chunks."""
+    with engine.begin() as conn:
+        conn.execute(delete(postings))
+    counts = {}
+    for doc_type, table, condition, index in (
+        (DISCUSSION, discussions, true(), index_discussions),
+        (RESPONSE, responses, responses.c.status_aprovacao == models.ApprovalStatus.aprovada, index_responses),
+    ):
+        counts[doc_type], after = 0, 0
+        while True:
+            with engine.begin() as conn:
+                items = conn.execute(
+                    select(table).where(condition, table.c.id > after).order_by(table.c.id).limit(REBUILD_CHUNK)
+                ).all()
+                index(conn, items)
+            if not items:
+                break
+            counts[doc_type] += len(items)
+            after = items[-1].id
+    return counts
+
+def main():
+    argparse.ArgumentParser(description="Rebuild the search index from the discussions and approved responses.").parse_args()
+    counts = rebuild(database.get_engine())
+    print("Indexed %d discussions and %d responses" % (counts[DISCUSSION], counts[RESPONSE]))
+
+if __name__ == "__main__":
+    main()
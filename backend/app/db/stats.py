@@ -0,0 +1,156 @@
+"""Per-discussion counters listed by GET /discussions/.
+
+The counters live on the discussions row and are moved by the writes that
+change them, in the caller's transaction (like versions.py). Each change also
+bumps the discussion's version, as the counters are part of what the
+discussion endpoints return.
+
+Recompute them from scratch, e.g. after editing responses by hand, with:
+
+    python -m app.db.stats [--discussion ID ...]
+"""
+import argparse
+from collections import Counter
+
+from sqlalchemy import bindparam, func, select, update
+
+from . import database, models
+
+discussions = models.Discussion.__table__
+responses = models.Response.__table__
+
+REBUILD_CHUNK = 500
+
+def counter_of(response_type, approval):
+    """The counter a response of this type and approval status is counted in, if any."""
+    if approval == models.ApprovalStatus.pendente:
+        return "pending_count"
+    if approval == models.ApprovalStatus.aprovada:
+        return "agree_count" if response_type == models.ResponseType.concordo else "disagree_count"
+    return None
+
+def response_created(conn, discussion_id: int):
+    conn.execute(
+        update(discussions)
+        .where(discussions.c.id == discussion_id)
+        .values(
+            pending_count=discussions.c.pending_count + 1,
+            last_activity_at=func.now(),
+            version=discussions.c.version + 1,
+        )
+    )
+
+def responses_moderated(conn, changes):
+    """`changes` holds the (discussion_id, type, old status, new status) of each
+    response whose approval status changed. One UPDATE per discussion."""
+    deltas = {}
+    for discussion_id, response_type, old, new in changes:
+        counts = deltas.setdefault(discussion_id, Counter())
+        for approval, step in ((old, -1), (new, 1)):
+            column = counter_of(response_type, approval)
+            if column is not None:
+                counts[column] += step
+    # In id order, so concurrent moderators lock the rows in the same order
+    for discussion_id, counts in sorted(deltas.items()):
+        values = {column: discussions.c[column] + step for column, step in counts.items() if step}
+        if values:
+            conn.execute(
+                update(discussions)
+                .where(discussions.c.id == discussion_id)
+                .values(version=discussions.c.version + 1, **values)
+            )
+
+# Also run as an executemany by the vote buffer's flushes
+VOTES_CAST_STATEMENT = (
+    update(discussions)
+    .where(discussions.c.id == bindparam("b_id"))
+    .values(
+        total_votes=discussions.c.total_votes + bindparam("b_delta"),
+        last_activity_at=func.now(),
+        version=discussions.c.version + 1,
+    )
+)
+
+def votes_cast(conn, discussion_id: int, delta: int):
+    """A vote on one of the discussion's responses added `delta` to its total
+    (0 when it switched from up to down or back)."""
+    conn.execute(VOTES_CAST_STATEMENT, {"b_id": discussion_id, "b_delta": delta})
+
+def votes_cast_many(conn, deltas):
+    """`deltas` maps discussion ids to the change of their vote totals."""
+    rows = [{"b_id": discussion_id, "b_delta": delta} for discussion_id, delta in sorted(deltas.items())]
+    if rows:
+        conn.execute(VOTES_CAST_STATEMENT, rows)
+
+def votes_cast_on(conn, response_deltas):
+    """Like votes_cast_many, with deltas by response id."""
+    rows = conn.execute(
+        select(responses.c.id, responses.c.discussion_id).where(responses.c.id.in_(list(response_deltas)))
+    ).all()
+    deltas = Counter()
+    for response_id, discussion_id in rows:
+        deltas[discussion_id] += response_deltas[response_id]
+    votes_cast_many(conn, deltas)
+
+def vote_total():
+    return (
+        select(func.coalesce(func.sum(func.coalesce(responses.c.upvotes, 0) + func.coalesce(responses.c.downvotes, 0)), 0))
+        .where(responses.c.discussion_id == discussions.c.id)
+        .scalar_subquery()
+    )
+
+def recount_votes_of(conn, response_ids):
+    """Recompute the vote totals of the discussions of the given responses
+    from their counters, after the vote buffer reconciled them. Only the
+    totals that were off are written, so their ETags survive."""
+    total = vote_total()
+    conn.execute(
+        update(discussions)
+        .where(
+            discussions.c.id.in_(select(responses.c.discussion_id).where(responses.c.id.in_(response_ids))),
+            discussions.c.total_votes != total,
+        )
+        .values(total_votes=total, version=discussions.c.version + 1)
+    )
+
+def rebuild(conn, discussion_ids=None):
+    """Recompute every counter of the given discussions (all by default) in a
+    single UPDATE with correlated subqueries. Votes are not timestamped, so
+    last_activity_at becomes the time of the newest response."""
+
+    def count(*conditions):
+        return (
+            select(func.count())
+            .where(responses.c.discussion_id == discussions.c.id, *conditions)
+            .scalar_subquery()
+        )
+
+    approved = responses.c.status_aprovacao == models.ApprovalStatus.aprovada
+    stmt = update(discussions).values(
+        agree_count=count(approved, responses.c.type == models.ResponseType.concordo),
+        disagree_count=count(approved, responses.c.type == models.ResponseType.discordo),
+        pending_count=count(responses.c.status_aprovacao == models.ApprovalStatus.pendente),
+        total_votes=vote_total(),
+        last_activity_at=select(func.max(responses.c.created_at)).where(responses.c.discussion_id == discussions.c.id).scalar_subquery(),
+        version=discussions.c.version + 1,
+    )
+    if discussion_ids is not None:
+        stmt = stmt.where(discussions.c.id.in_(discussion_ids))
+    return conn.execute(stmt).rowcount
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute the per-discussion counters from the responses table.")
+    parser.add_argument("--discussion", type=int, action="append", help="only this discussion (repeatable)")
+    args = parser.parse_args()
+
+    engine = database.get_engine()
+    with engine.connect() as conn:
+        ids = args.discussion or conn.execute(select(discussions.c.id).order_by(discussions.c.id)).scalars().all()
+    # One transaction per chunk, so live writes are not blocked for long
+    for start in range(0, len(ids), REBUILD_CHUNK):
+        with engine.begin() as conn:
+            rebuild(conn, ids[start:start + REBUILD_CHUNK])
+    print("Rebuilt the counters of %d discussions" % len(ids))
+
+if __name__ == "__main__":
+    main()
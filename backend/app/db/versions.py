@@ -0,0 +1,36 @@
+from sqlalchemy import select, update
+
+from . import models
+
+discussions = models.Discussion.__table__
+responses = models.Response.__table__
+
+# Every function takes a Session or a Connection and runs inside the caller's
+# transaction, so a version never moves without the change it stands for.
+
+def bump_version(conn, discussion_id: int):
+    """The discussion row itself changed."""
+    conn.execute(update(discussions).where(discussions.c.id == discussion_id).values(version=discussions.c.version + 1))
+
+def bump_responses_version(conn, discussion_id: int):
+    """The discussion's list of approved responses changed."""
+    conn.execute(
+        update(discussions)
+        .where(discussions.c.id == discussion_id)
+        .values(responses_version=discussions.c.responses_version + 1)
+    )
+
+def bump_responses_version_of(conn, response_ids):
+    """The given responses changed (e.g. their vote counters)."""
+    bump_responses_version_where(conn, responses.c.id.in_(response_ids))
+
+def bump_responses_version_by_author(conn, user_id: int):
+    """The author embedded in the user's responses changed."""
+    bump_responses_version_where(conn, responses.c.user_id == user_id)
+
+def bump_responses_version_where(conn, condition):
+    conn.execute(
+        update(discussions)
+        .where(discussions.c.id.in_(select(responses.c.discussion_id).where(condition)))
+        .values(responses_version=discussions.c.responses_version + 1)
+    )
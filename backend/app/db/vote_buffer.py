@@ -0,0 +1,182 @@
+import logging
+import threading
+import time
+
+from sqlalchemy import bindparam, select, update
+
+from ..core import config
+from . import models, ranking, stats, versions, votes
+
+logger = logging.getLogger(__name__)
+
+responses = models.Response.__table__
+
+# One executemany for the whole batch. Rows are updated in id order so two
+# workers flushing at once lock them in the same order and cannot deadlock.
+FLUSH_STATEMENT = (
+    update(responses)
+    .where(responses.c.id == bindparam("b_id"))
+    .values(upvotes=responses.c.upvotes + bindparam("b_up"), downvotes=responses.c.downvotes + bindparam("b_down"))
+)
+
+RECONCILE_CHUNK = 500
+RECONCILE_SWEEP = 5000
+
+class VoteBuffer:
+    """Write-behind buffer for the upvotes/downvotes counters.
+
+    Votes themselves are committed to the votes table by the request. Only
+    the counter deltas are collected here and written to responses in one
+    batched UPDATE by a background thread every `flush_interval` seconds, or
+    as soon as `max_pending` votes are waiting, so a viral response takes one
+    row lock per flush instead of one per vote and no request waits for it.
+    """
+
+    def __init__(self, get_engine, flush_interval: float, max_pending: int, reconcile_interval: float):
+        # Called when the buffer writes, so the engine is only created once needed
+        self.get_engine = get_engine
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.reconcile_interval = reconcile_interval
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.pending = {}
+        self.pending_votes = 0
+        # Responses whose counters changed since the last reconciliation
+        self.dirty = set()
+        self.sweep_after = 0
+        self.stopping = threading.Event()
+        # Set when max_pending votes are waiting, to flush before the interval
+        self.wake = threading.Event()
+        # Called with the response ids whose counters were written by a flush or
+        # reconciliation, e.g. to drop cached copies
+        self.listeners = []
+        self.thread = None
+
+    def add(self, response_id: int, up: int, down: int):
+        with self.lock:
+            counts = self.pending.setdefault(response_id, [0, 0])
+            counts[0] += up
+            counts[1] += down
+            self.pending_votes += 1
+            full = self.pending_votes >= self.max_pending
+        if full:
+            if self.thread is None:
+                # No flusher running (e.g. a script), so the caller flushes.
+                # Its vote is already committed: a failed flush keeps the
+                # deltas for the next one instead of failing the caller
+                try:
+                    self.flush()
+                except Exception:
+                    logger.exception("Vote buffer flush failed")
+            else:
+                self.wake.set()
+
+    def pending_deltas(self, response_id: int):
+        with self.lock:
+            return tuple(self.pending.get(response_id, (0, 0)))
+
+    def flush(self):
+        with self.flush_lock:
+            with self.lock:
+                batch, self.pending, self.pending_votes = self.pending, {}, 0
+            rows = [
+                {"b_id": response_id, "b_up": up, "b_down": down}
+                for response_id, (up, down) in sorted(batch.items())
+                if up or down
+            ]
+            if not rows:
+                return
+            try:
+                with self.get_engine().begin() as conn:
+                    conn.execute(FLUSH_STATEMENT, rows)
+                    versions.bump_responses_version_of(conn, [row["b_id"] for row in rows])
+                    ranking.recompute(conn, [row["b_id"] for row in rows])
+                    stats.votes_cast_on(conn, {row["b_id"]: row["b_up"] + row["b_down"] for row in rows})
+            except Exception:
+                # Put the deltas back so the next flush retries them
+                with self.lock:
+                    for row in rows:
+                        counts = self.pending.setdefault(row["b_id"], [0, 0])
+                        counts[0] += row["b_up"]
+                        counts[1] += row["b_down"]
+                raise
+            self.dirty.update(batch)
+        for listener in self.listeners:
+            listener(list(batch))
+
+    def reconcile(self):
+        """Recompute counters from the votes table.
+
+        Covers the responses flushed since the last run plus the next slice
+        of a rolling sweep over all responses, which repairs deltas lost when
+        a worker died with votes still buffered. Responses with deltas still
+        buffered here are left for later: their votes are committed, so
+        recounting them now would count those votes again once flushed. The
+        deltas another worker holds cannot be seen; its flush marks them dirty
+        there, so its next run corrects any vote counted twice.
+        """
+        self.flush()
+        with self.flush_lock:
+            dirty, self.dirty = self.dirty, set()
+        with self.get_engine().connect() as conn:
+            sweep = conn.execute(
+                select(responses.c.id).where(responses.c.id > self.sweep_after).order_by(responses.c.id).limit(RECONCILE_SWEEP)
+            ).scalars().all()
+        self.sweep_after = sweep[-1] if len(sweep) == RECONCILE_SWEEP else 0
+        # Their flush marks them dirty again. A vote buffered while its
+        # response is being recounted is still counted twice until then.
+        with self.lock:
+            buffered = set(self.pending)
+        ids = sorted(dirty.union(sweep).difference(buffered))
+        for start in range(0, len(ids), RECONCILE_CHUNK):
+            with self.get_engine().begin() as conn:
+                votes.reconcile_counters(conn, ids[start:start + RECONCILE_CHUNK])
+                ranking.recompute(conn, ids[start:start + RECONCILE_CHUNK])
+                stats.recount_votes_of(conn, ids[start:start + RECONCILE_CHUNK])
+                # Only the dirty responses are expected to change; bumping the
+                # whole sweep would expire every ETag each run
+                chunk_dirty = dirty.intersection(ids[start:start + RECONCILE_CHUNK])
+                if chunk_dirty:
+                    versions.bump_responses_version_of(conn, sorted(chunk_dirty))
+            for listener in self.listeners:
+                listener(ids[start:start + RECONCILE_CHUNK])
+
+    def run(self):
+        reconciled_at = time.monotonic()
+        while True:
+            self.wake.wait(self.flush_interval)
+            # Cleared before flushing, so votes added during the flush wake it again
+            self.wake.clear()
+            if self.stopping.is_set():
+                return
+            try:
+                self.flush()
+                if self.reconcile_interval and time.monotonic() - reconciled_at >= self.reconcile_interval:
+                    reconciled_at = time.monotonic()
+                    self.reconcile()
+            except Exception:
+                logger.exception("Vote buffer flush failed")
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="vote-buffer", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the background flusher and write out everything still pending."""
+        self.stopping.set()
+        self.wake.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.flush()
+
+buffer = None
+if config.VOTE_WRITE_BEHIND:
+    from .database import get_engine
+
+    buffer = VoteBuffer(
+        get_engine,
+        flush_interval=config.VOTE_FLUSH_INTERVAL,
+        max_pending=config.VOTE_FLUSH_MAX_PENDING,
+        reconcile_interval=config.VOTE_RECONCILE_INTERVAL,
+    )
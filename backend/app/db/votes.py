@@ -0,0 +1,108 @@
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from . import models
+
+# Statements issued through the ORM session must not try to synchronize the
+# identity map: there is nothing loaded to synchronize and it costs a SELECT.
+NO_SYNC = {"synchronize_session": False}
+
+def counter_deltas(vote_type: models.VoteType, step: int):
+    return (step, 0) if vote_type == models.VoteType.up else (0, step)
+
+def insert_vote_if_absent(db: Session, user_id: int, response_id: int, vote_type: models.VoteType) -> bool:
+    stmt = insert(models.Vote).values(user_id=user_id, response_id=response_id, type=vote_type)
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        stmt = stmt.prefix_with("IGNORE")
+    elif dialect == "sqlite":
+        stmt = stmt.prefix_with("OR IGNORE")
+    return db.execute(stmt).rowcount == 1
+
+def lock_response(db: Session, response_id: int) -> bool:
+    """Lock the response row until commit; False if it does not exist.
+
+    Taken before record_vote when the counters are updated in the same
+    transaction. Otherwise, on InnoDB, the vote INSERT takes a shared lock on
+    the response through the foreign key, and two voters each holding one
+    deadlock on the counter UPDATE, which needs it exclusively.
+    """
+    return db.execute(
+        select(models.Response.id).where(models.Response.id == response_id).with_for_update()
+    ).first() is not None
+
+def record_vote(db: Session, user_id: int, response_id: int, vote_type: models.VoteType):
+    """Create, toggle off or change the user's vote on a response.
+
+    Each step is a single conditional statement on the (user_id, response_id)
+    unique key, tried in order of likelihood, so no row is read into Python and
+    two requests from the same user cannot both apply. Returns the
+    (upvotes, downvotes) deltas to apply to the response and the user's vote
+    afterwards.
+    """
+    key = (models.Vote.user_id == user_id, models.Vote.response_id == response_id)
+    # A second pass only happens when a concurrent request from the same user
+    # deleted or inserted the vote between our statements.
+    for _ in range(2):
+        if insert_vote_if_absent(db, user_id, response_id, vote_type):
+            return counter_deltas(vote_type, 1), vote_type
+        deleted = db.execute(
+            delete(models.Vote).where(*key, models.Vote.type == vote_type).execution_options(**NO_SYNC)
+        ).rowcount
+        if deleted:
+            return counter_deltas(vote_type, -1), None
+        changed = db.execute(
+            update(models.Vote).where(*key).values(type=vote_type).execution_options(**NO_SYNC)
+        ).rowcount
+        if changed:
+            up, down = counter_deltas(vote_type, 1)
+            return (up - down, down - up), vote_type
+    # The insert was ignored for another reason, e.g. the response does not
+    # exist (MySQL's INSERT IGNORE also swallows foreign key errors).
+    return (0, 0), None
+
+# The discussion id comes along for the live events (core/events.py), the
+# creation time for the hot score (db/ranking.py)
+COUNTER_COLUMNS = (models.Response.upvotes, models.Response.downvotes, models.Response.discussion_id, models.Response.created_at)
+
+def apply_counter_deltas(db: Session, response_id: int, up: int, down: int):
+    """Add the deltas to the response's counters in one UPDATE and return the new
+    (upvotes, downvotes, discussion_id, created_at), or None if the response does not exist."""
+    stmt = (
+        update(models.Response)
+        .where(models.Response.id == response_id)
+        .values(upvotes=models.Response.upvotes + up, downvotes=models.Response.downvotes + down)
+        .execution_options(**NO_SYNC)
+    )
+    if db.get_bind().dialect.update_returning:
+        return db.execute(stmt.returning(*COUNTER_COLUMNS)).first()
+    if db.execute(stmt).rowcount == 0:
+        return None
+    # The UPDATE holds the row lock until commit, so this reads our own result
+    return read_counters(db, response_id)
+
+def read_counters(db: Session, response_id: int):
+    return db.execute(select(*COUNTER_COLUMNS).where(models.Response.id == response_id)).first()
+
+def reconcile_counters(conn, response_ids=None):
+    """Recompute upvotes/downvotes from the votes table, for every response or
+    only the given ids, in a single UPDATE with correlated counts. The given
+    rows are locked first, in id order, so no counter update lands between
+    the counts and the write."""
+    responses, votes_table = models.Response.__table__, models.Vote.__table__
+    if response_ids is not None:
+        conn.execute(
+            select(responses.c.id).where(responses.c.id.in_(response_ids)).order_by(responses.c.id).with_for_update()
+        ).all()
+
+    def count(vote_type):
+        return (
+            select(func.count())
+            .where(votes_table.c.response_id == responses.c.id, votes_table.c.type == vote_type)
+            .scalar_subquery()
+        )
+
+    stmt = update(responses).values(upvotes=count(models.VoteType.up), downvotes=count(models.VoteType.down))
+    if response_ids is not None:
+        stmt = stmt.where(responses.c.id.in_(response_ids))
+    return conn.execute(stmt).rowcount
@@ -1,7 +1,7 @@
 from pydantic import BaseModel, EmailStr
 from typing import Optional, List
 from datetime import datetime
-from .db.models import Role, ResponseType, ApprovalStatus, DiscussionStatus
+from .db.models import Role, ResponseType, ApprovalStatus, DiscussionStatus, SearchDocType
 import enum
 
 # User Schemas
@@ -43,6 +43,11 @@ class DiscussionOut(DiscussionBase):
     status: DiscussionStatus
     user_id: int
     created_at: datetime
+    agree_count: int = 0
+    disagree_count: int = 0
+    pending_count: int = 0
+    total_votes: int = 0
+    last_activity_at: Optional[datetime] = None
 
     class Config:
         orm_mode = True
@@ -60,6 +65,11 @@ class VoteType(str, enum.Enum):
     up = "up"
     down = "down"
 
+class ResponseSort(str, enum.Enum):
+    new = "new"
+    top = "top"
+    hot = "hot"
+
 class ResponseOut(ResponseBase):
     id: int
     discussion_id: int
@@ -75,6 +85,42 @@ class ResponseOut(ResponseBase):
     class Config:
         orm_mode = True
 
+class ResponseTreeOut(ResponseOut):
+    # The first replies only; reply_count has them all, and replies_cursor
+    # pages the rest when some replies were left out after the ones shown
+    replies: List["ResponseTreeOut"] = []
+    reply_count: int = 0
+    replies_cursor: Optional[str] = None
+
+class ModerationAction(str, enum.Enum):
+    approve = "approve"
+    reject = "reject"
+
+class BulkModeration(BaseModel):
+    ids: List[int]
+    action: ModerationAction
+
+class ModerationResult(str, enum.Enum):
+    updated = "updated"
+    unchanged = "unchanged"
+    not_found = "not_found"
+
+class ModerationResultOut(BaseModel):
+    id: int
+    result: ModerationResult
+
+class BulkModerationOut(BaseModel):
+    results: List[ModerationResultOut]
+
+class SearchResult(BaseModel):
+    type: SearchDocType
+    id: int
+    discussion_id: int
+    # The discussion's title, also for responses
+    title: str
+    content: str
+    score: int
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -0,0 +1,174 @@
+"""Seed a throwaway database with a realistic discussion dataset.
+
+Users (one admin, one moderator per thousand users, the rest regular), their
+discussions, and responses spread over the last --days. A share of the
+responses reply to an earlier approved response, 80% are approved and 15%
+still pending. Votes go mostly to a few popular responses.
+
+Rows are written with executemany in chunks, with the vote counters and
+ranking scores already computed; the per-discussion stats and the search
+index are then rebuilt from them. Every user's password is PASSWORD.
+
+    python -m benchmarks.dataset --url sqlite:///bench_load.db --users 10000 --discussions 200
+"""
+import argparse
+import os
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, select
+
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from app.core import security  # noqa: E402
+from app.db import models, ranking, search, stats  # noqa: E402
+
+PASSWORD = "benchmark-password"
+CHUNK = 5000
+STATUSES = [models.ApprovalStatus.aprovada] * 16 + [models.ApprovalStatus.pendente] * 3 + [models.ApprovalStatus.rejeitada]
+WORDS = ("reforma tributária imposto saúde educação segurança pública orçamento votação congresso senado "
+         "câmara eleição proposta economia emprego inflação juros salário mínimo meio ambiente transporte "
+         "moradia previdência fonte dados pesquisa estudo governo município estado federal").split()
+
+
+def text(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def email(user_id):
+    return "user%d@example.com" % user_id
+
+
+def moderator_ids(users):
+    return list(range(2, 2 + max(1, users // 1000)))
+
+
+def generate(rng, args):
+    """Build every row in memory: (users, discussions, responses, votes)."""
+    # Naive UTC, whole seconds: what the database stores
+    now = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+    start = now - timedelta(days=args.days)
+    moderators = set(moderator_ids(args.users))
+    password_hash = security.hash_password(PASSWORD)
+    users = [
+        {"id": i, "name": "user %d" % i, "email": email(i), "password_hash": password_hash,
+         "role": models.Role.admin if i == 1 else models.Role.moderator if i in moderators else models.Role.regular}
+        for i in range(1, args.users + 1)
+    ]
+
+    discussions, responses = [], []
+    for discussion_id in range(1, args.discussions + 1):
+        opened = start + timedelta(seconds=rng.randint(0, args.days * 86400 * 4 // 5))
+        discussions.append({"id": discussion_id, "title": text(rng, 8), "content": text(rng, 40), "status": models.DiscussionStatus.ativa,
+                            "user_id": 1, "created_at": opened})
+        approved, replied = [], set()
+        # Within each discussion created_at increases with id, like live traffic
+        count = max(0, round(rng.gauss(args.responses, args.responses / 3)))
+        offsets = sorted(rng.randint(0, int((now - opened).total_seconds())) for _ in range(count))
+        for offset in offsets:
+            response_id = len(responses) + 1
+            user_id = rng.randint(1, args.users)
+            parent_id = None
+            if approved and rng.random() < args.replies:
+                parent_id = rng.choice(approved)
+                if (parent_id, user_id) in replied:
+                    parent_id = None
+                else:
+                    replied.add((parent_id, user_id))
+            status = rng.choice(STATUSES)
+            responses.append({
+                "id": response_id, "discussion_id": discussion_id, "user_id": user_id, "content": text(rng, rng.randint(10, 80)),
+                "type": rng.choice((models.ResponseType.concordo, models.ResponseType.discordo)), "status_aprovacao": status,
+                "parent_id": parent_id, "is_reliable_source": rng.random() < 0.1, "upvotes": 0, "downvotes": 0,
+                "created_at": opened + timedelta(seconds=offset),
+            })
+            if status == models.ApprovalStatus.aprovada:
+                approved.append(response_id)
+
+    votes = []
+    targets = [r for r in responses if r["status_aprovacao"] == models.ApprovalStatus.aprovada]
+    if targets:
+        # Heavy tailed: a few responses get most of the votes
+        weights = [rng.paretovariate(1.2) for _ in targets]
+        cast = set()
+        for target in rng.choices(targets, weights, k=args.votes):
+            user_id = rng.randint(1, args.users)
+            if (user_id, target["id"]) in cast:
+                continue
+            cast.add((user_id, target["id"]))
+            vote_type = models.VoteType.up if rng.random() < 0.75 else models.VoteType.down
+            target["upvotes" if vote_type == models.VoteType.up else "downvotes"] += 1
+            votes.append({"id": len(votes) + 1, "user_id": user_id, "response_id": target["id"], "type": vote_type})
+    for response in responses:
+        response.update(ranking.scores(response["upvotes"], response["downvotes"], response["created_at"]))
+    return users, discussions, responses, votes
+
+
+def insert(engine, table, rows):
+    for offset in range(0, len(rows), CHUNK):
+        with engine.begin() as conn:
+            conn.execute(table.insert(), rows[offset:offset + CHUNK])
+
+
+def seed(url, args):
+    """Recreate the schema at `url` and fill it. Returns the row counts."""
+    rng = random.Random(args.seed)
+    users, discussions, responses, votes = generate(rng, args)
+    engine = create_engine(url)
+    models.Base.metadata.drop_all(engine)
+    models.Base.metadata.create_all(engine)
+    for model, rows in ((models.User, users), (models.Discussion, discussions), (models.Response, responses), (models.Vote, votes)):
+        insert(engine, model.__table__, rows)
+    with engine.begin() as conn:
+        stats.rebuild(conn)
+    search.rebuild(engine)
+    engine.dispose()
+    return {"users": len(users), "discussions": len(discussions), "responses": len(responses), "votes": len(votes)}
+
+
+def load_ids(url):
+    """What the load test picks from, read back from a seeded database."""
+    engine = create_engine(url)
+    responses = models.Response.__table__
+    with engine.connect() as conn:
+        ids = {
+            "users": conn.execute(select(models.User.id).where(models.User.role == models.Role.regular)).scalars().all(),
+            "moderators": conn.execute(select(models.User.id).where(models.User.role != models.Role.regular)).scalars().all(),
+            "discussions": conn.execute(select(models.Discussion.id)).scalars().all(),
+            "approved": defaultdict(list),
+            "pending": conn.execute(
+                select(responses.c.id).where(responses.c.status_aprovacao == models.ApprovalStatus.pendente)
+            ).scalars().all(),
+        }
+        for response_id, discussion_id in conn.execute(
+            select(responses.c.id, responses.c.discussion_id).where(responses.c.status_aprovacao == models.ApprovalStatus.aprovada)
+        ):
+            ids["approved"][discussion_id].append(response_id)
+    engine.dispose()
+    return ids
+
+
+def add_arguments(parser):
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--discussions", type=int, default=100)
+    parser.add_argument("--responses", type=int, default=200, help="responses per discussion, on average")
+    parser.add_argument("--replies", type=float, default=0.3, help="share of responses that reply to another")
+    parser.add_argument("--votes", type=int, default=100000)
+    parser.add_argument("--days", type=int, default=30, help="the responses' created_at span this many days")
+    parser.add_argument("--seed", type=int, default=1, help="random seed, for repeatable datasets")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="sqlite:///bench_load.db")
+    add_arguments(parser)
+    args = parser.parse_args()
+    started = time.perf_counter()
+    counts = seed(args.url, args)
+    print("Seeded %s in %.1fs" % (", ".join("%d %s" % (n, name) for name, n in counts.items()), time.perf_counter() - started))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Hold many idle event streams open and time one event's fan-out.
+
+Seeds a throwaway database with one discussion and one approved response,
+opens --connections GET /discussions/1/events streams against a single
+uvicorn worker and reports the worker's resident memory per connection.
+It then casts one vote and measures how long it takes until every stream
+has received the votes event.
+
+Run from the backend directory (each connection uses a file descriptor on
+both ends, so raise `ulimit -n` first):
+
+    python -m benchmarks.events --connections 10000
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+from sqlalchemy import create_engine
+
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from app.api import auth  # noqa: E402
+from app.db import models  # noqa: E402
+from benchmarks.server import start_server, stop_server  # noqa: E402
+
+
+def seed(url):
+    engine = create_engine(url)
+    models.Base.metadata.drop_all(engine)
+    models.Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(models.User.__table__.insert(), [
+            {"id": 1, "name": "voter", "email": "voter@example.com", "password_hash": "x", "role": "regular"}])
+        conn.execute(models.Discussion.__table__.insert(), [
+            {"id": 1, "title": "live", "content": "...", "status": "ativa", "user_id": 1}])
+        conn.execute(models.Response.__table__.insert(), [
+            {"id": 1, "discussion_id": 1, "user_id": 1, "content": "...", "type": "concordo",
+             "status_aprovacao": "aprovada", "is_reliable_source": False, "upvotes": 0, "downvotes": 0}])
+    engine.dispose()
+
+
+def rss_mb(pid):
+    with open("/proc/%d/status" % pid) as f:
+        return int(f.read().split("VmRSS:")[1].split()[0]) / 1024
+
+
+async def connect(port):
+    # Raw sockets: an HTTP client per stream would cost more than the server side
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET /discussions/1/events HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    await writer.drain()
+    await reader.readuntil(b"retry: 3000\n\n")
+    return reader, writer
+
+
+async def run(port, pid, args):
+    before = rss_mb(pid)
+    streams = []
+    for start in range(0, args.connections, 500):
+        streams += await asyncio.gather(*[connect(port) for _ in range(min(500, args.connections - start))])
+    after = rss_mb(pid)
+    print("%d streams: worker RSS %.0f MB -> %.0f MB (%.1f KB per stream)" % (
+        len(streams), before, after, (after - before) * 1024 / len(streams)))
+
+    cookie = "access_token=\"Bearer %s\"" % auth.create_access_token({"sub": "voter@example.com"}, None)
+    started = time.perf_counter()
+    async with httpx.AsyncClient(base_url="http://127.0.0.1:%d" % port) as client:
+        r = await client.post("/responses/1/vote", params={"vote_type": "up"}, headers={"Cookie": cookie})
+        r.raise_for_status()
+    await asyncio.gather(*[reader.readuntil(b"event: votes\n") for reader, _ in streams])
+    print("votes event reached all streams in %.0f ms" % ((time.perf_counter() - started) * 1000))
+    for _, writer in streams:
+        writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="sqlite:///bench_events.db")
+    parser.add_argument("--port", type=int, default=8768)
+    parser.add_argument("--connections", type=int, default=10000)
+    args = parser.parse_args()
+
+    seed(args.url)
+    proc = start_server(args.url, args.port)
+    try:
+        asyncio.run(run(args.port, proc.pid, args))
+    finally:
+        stop_server(proc)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Benchmark the hot path indexes on a seeded dataset.
+
+Seeds a throwaway database, then runs the hot queries with and without the
+hot path indexes on responses, printing the EXPLAIN plan and the
+median latency of each query.
+
+Run from the backend directory:
+
+    python -m benchmarks.indexes --url sqlite:///bench_indexes.db --responses 2000000
+
+The target database is dropped and recreated unless --reuse is given, so never
+point --url at real data.
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+
+from sqlalchemy import create_engine, text
+
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from app.db import models  # noqa: E402
+
+INDEXES = [
+    "ix_responses_discussion_id_status_aprovacao_created_at",
+    "ix_responses_discussion_id_status_aprovacao_score_top",
+    "ix_responses_discussion_id_status_aprovacao_score_hot",
+    "ix_responses_status_aprovacao_created_at",
+    "ix_responses_parent_id_user_id",
+]
+
+QUERIES = {
+    "read_responses": (
+        "SELECT id FROM responses WHERE discussion_id = :discussion_id AND status_aprovacao = 'aprovada'",
+        lambda a: {"discussion_id": random.randint(1, a.discussions)},
+    ),
+    "read_responses_top": (
+        "SELECT id FROM responses WHERE discussion_id = :discussion_id AND status_aprovacao = 'aprovada' "
+        "ORDER BY score_top DESC, id DESC LIMIT 20",
+        lambda a: {"discussion_id": random.randint(1, a.discussions)},
+    ),
+    "read_pending_responses": (
+        "SELECT id FROM responses WHERE status_aprovacao = 'pendente' ORDER BY created_at, id LIMIT 100",
+        lambda a: {},
+    ),
+    "duplicate_reply_check": (
+        "SELECT id FROM responses WHERE parent_id = :parent_id AND user_id = :user_id LIMIT 1",
+        lambda a: {"parent_id": random.randint(1, a.responses), "user_id": random.randint(1, a.users)},
+    ),
+    "user_vote_lookup": (
+        "SELECT id FROM votes WHERE user_id = :user_id AND response_id = :response_id LIMIT 1",
+        lambda a: {"user_id": random.randint(1, a.users), "response_id": random.randint(1, a.responses)},
+    ),
+}
+
+
+def chunks(rows, size=10000):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def seed(engine, args):
+    models.Base.metadata.drop_all(engine)
+    models.Base.metadata.create_all(engine)
+    rng = random.Random(42)
+    users = ({"id": i, "name": "user %d" % i, "email": "user%d@example.com" % i, "password_hash": "x", "role": "regular"}
+             for i in range(1, args.users + 1))
+    discussions = ({"id": i, "title": "discussion %d" % i, "content": "...", "status": "ativa", "user_id": 1}
+                   for i in range(1, args.discussions + 1))
+
+    def responses():
+        for i in range(1, args.responses + 1):
+            parent_id = rng.randint(1, i - 1) if i > 1 and rng.random() < 0.3 else None
+            status = rng.choices(["aprovada", "pendente", "rejeitada"], [80, 15, 5])[0]
+            yield {"id": i, "discussion_id": rng.randint(1, args.discussions), "user_id": rng.randint(1, args.users),
+                   "content": "...", "type": rng.choice(["concordo", "discordo"]), "status_aprovacao": status,
+                   "parent_id": parent_id, "is_reliable_source": False, "upvotes": 0, "downvotes": 0,
+                   "score_top": rng.randint(0, 10 ** 9)}
+
+    def votes():
+        seen = set()
+        while len(seen) < args.votes:
+            key = (rng.randint(1, args.users), rng.randint(1, args.responses))
+            if key not in seen:
+                seen.add(key)
+                yield {"user_id": key[0], "response_id": key[1], "type": rng.choice(["up", "down"])}
+
+    for table, rows in [(models.User, users), (models.Discussion, discussions),
+                        (models.Response, responses()), (models.Vote, votes())]:
+        started = time.perf_counter()
+        count = 0
+        for batch in chunks(rows):
+            with engine.begin() as conn:
+                conn.execute(table.__table__.insert(), batch)
+            count += len(batch)
+        print("seeded %-12s %10d rows in %.1fs" % (table.__tablename__, count, time.perf_counter() - started))
+
+
+def explain(conn, sql, params):
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    return [" | ".join(str(c) for c in row) for row in conn.execute(text(prefix + sql), params)]
+
+
+def measure(engine, args, label):
+    print("\n== %s ==" % label)
+    with engine.connect() as conn:
+        for name, (sql, make_params) in QUERIES.items():
+            print("\n%s" % name)
+            for line in explain(conn, sql, make_params(args)):
+                print("  plan: %s" % line)
+            timings = []
+            for _ in range(args.repeat):
+                params = make_params(args)
+                started = time.perf_counter()
+                conn.execute(text(sql), params).fetchall()
+                timings.append((time.perf_counter() - started) * 1000)
+            print("  median %.3f ms, max %.3f ms over %d runs" % (statistics.median(timings), max(timings), args.repeat))
+
+
+def set_indexes(engine, present):
+    indexes = {index.name: index for index in models.Response.__table__.indexes}
+    with engine.begin() as conn:
+        for name in INDEXES:
+            if present:
+                indexes[name].create(conn, checkfirst=True)
+            else:
+                indexes[name].drop(conn, checkfirst=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="sqlite:///bench_indexes.db")
+    parser.add_argument("--users", type=int, default=50000)
+    parser.add_argument("--discussions", type=int, default=2000)
+    parser.add_argument("--responses", type=int, default=2000000)
+    parser.add_argument("--votes", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--reuse", action="store_true", help="skip seeding and reuse the existing dataset")
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    if not args.reuse:
+        seed(engine, args)
+
+    set_indexes(engine, present=False)
+    measure(engine, args, "before (primary keys and unique constraints only)")
+    set_indexes(engine, present=True)
+    measure(engine, args, "after (hot path indexes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Measure read latency while a login storm is running.
+
+Seeds a throwaway database, then runs concurrent readers of
+GET /discussions/{id}/responses/ alongside concurrent POST /auth/login
+requests. It runs three times: readers alone, during a storm with hashing
+inline (PASSWORD_HASH_WORKERS=0) and during a storm with the hashing process
+pool. Each run prints read p50/p99 and login throughput.
+
+Run from the backend directory:
+
+    python -m benchmarks.login_storm --readers 20 --logins 40 --duration 15
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+
+import httpx
+from sqlalchemy import create_engine
+
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from app.core import security  # noqa: E402
+from app.db import models  # noqa: E402
+from benchmarks.server import percentile, start_server, stop_server  # noqa: E402
+
+PASSWORD = "benchmark-password"
+
+
+def seed(url, users, discussions):
+    engine = create_engine(url)
+    models.Base.metadata.drop_all(engine)
+    models.Base.metadata.create_all(engine)
+    # Every user gets the same password; verifying costs the same either way
+    password_hash = security.hash_password(PASSWORD)
+    with engine.begin() as conn:
+        conn.execute(models.User.__table__.insert(), [
+            {"id": i, "name": "user %d" % i, "email": "user%d@example.com" % i, "password_hash": password_hash,
+             "role": "regular"} for i in range(1, users + 1)])
+        conn.execute(models.Discussion.__table__.insert(), [
+            {"id": i, "title": "discussion %d" % i, "content": "...", "status": "ativa", "user_id": 1}
+            for i in range(1, discussions + 1)])
+        conn.execute(models.Response.__table__.insert(), [
+            {"discussion_id": d, "user_id": 1, "content": "response %d" % r, "type": "concordo",
+             "status_aprovacao": "aprovada", "is_reliable_source": False, "upvotes": 0, "downvotes": 0}
+            for d in range(1, discussions + 1) for r in range(20)])
+    engine.dispose()
+
+
+async def run(port, args, logins):
+    read_latencies = []
+    login_count = 0
+    login_errors = 0
+    deadline = time.perf_counter() + args.duration
+    limits = httpx.Limits(max_connections=args.readers + logins)
+    async with httpx.AsyncClient(base_url="http://127.0.0.1:%d" % port, limits=limits, timeout=60) as client:
+        async def reader():
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                r = await client.get("/discussions/%d/responses/" % random.randint(1, args.discussions))
+                if r.status_code == 200:
+                    read_latencies.append((time.perf_counter() - started) * 1000)
+
+        async def login():
+            nonlocal login_count, login_errors
+            while time.perf_counter() < deadline:
+                r = await client.post("/auth/login", json={
+                    "email": "user%d@example.com" % random.randint(1, args.users), "password": PASSWORD})
+                if r.status_code == 200:
+                    login_count += 1
+                else:
+                    login_errors += 1
+
+        await asyncio.gather(*[reader() for _ in range(args.readers)], *[login() for _ in range(logins)])
+    return sorted(read_latencies), login_count, login_errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="sqlite:///bench_login.db")
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--discussions", type=int, default=20)
+    parser.add_argument("--readers", type=int, default=20)
+    parser.add_argument("--logins", type=int, default=40, help="concurrent login clients")
+    parser.add_argument("--duration", type=float, default=15.0)
+    args = parser.parse_args()
+
+    seed(args.url, args.users, args.discussions)
+    runs = [
+        ("no storm", 0, {}),
+        ("storm, inline", args.logins, {"PASSWORD_HASH_WORKERS": 0}),
+        ("storm, pool", args.logins, {}),
+    ]
+    for label, logins, settings in runs:
+        proc = start_server(args.url, args.port, **settings)
+        try:
+            reads, login_count, login_errors = asyncio.run(run(args.port, args, logins))
+        finally:
+            stop_server(proc)
+        print("%-14s reads %7.1f/s  read p50 %7.1f ms  read p99 %7.1f ms  logins %6.1f/s  login errors %d" % (
+            label, len(reads) / args.duration, percentile(reads, 0.50), percentile(reads, 0.99),
+            login_count / args.duration, login_errors))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Time serializing a list of ResponseOut objects on the old and new paths.
+
+Builds --count Response rows (with authors) in memory and times:
+
+- response_model + json: validate into ResponseOut, jsonable_encoder,
+  json.dumps (FastAPI with the stdlib JSONResponse)
+- response_model + dump_json: validate into ResponseOut, then pydantic-core
+  dumps to bytes (FastAPI's default when no response class is set)
+- response_model + orjson: validate, jsonable_encoder, orjson.dumps (a
+  custom default response class, which turns the dump_json path off)
+- payload + orjson: endpoints.response_payload dicts sent by fast_json,
+  with no validation pass
+
+Every path must produce the same JSON. Run from the backend directory:
+
+    python -m benchmarks.serialization --count 10000
+"""
+import argparse
+import json
+import os
+import timeit
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+os.environ.setdefault("SECRET_KEY", "benchmark")
+# Keep the app from touching a real database on import
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app import schemas  # noqa: E402
+from app.api import endpoints  # noqa: E402
+from app.api.fastjson import ORJSONResponse, fast_json  # noqa: E402
+from app.db import models  # noqa: E402
+
+
+def build(count):
+    authors = [models.User(id=i, name="user %d" % i, email="user%d@example.com" % i, role=models.Role.regular)
+               for i in range(1, 101)]
+    started = datetime(2026, 1, 1)
+    return [
+        models.Response(
+            id=i, discussion_id=1, user_id=authors[i % 100].id, author=authors[i % 100],
+            content="response %d " % i * 10, type=models.ResponseType.concordo, parent_id=None,
+            status_aprovacao=models.ApprovalStatus.aprovada, is_reliable_source=False,
+            upvotes=i % 50, downvotes=i % 7, created_at=started + timedelta(seconds=i, microseconds=i),
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = build(args.count)
+    adapter = TypeAdapter(List[schemas.ResponseOut])
+
+    def validate():
+        return adapter.validate_python(rows, from_attributes=True)
+
+    paths = {
+        "response_model + json": lambda: json.dumps(
+            jsonable_encoder(validate()), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode(),
+        "response_model + dump_json": lambda: adapter.dump_json(validate()),
+        "response_model + orjson": lambda: ORJSONResponse(jsonable_encoder(validate())).body,
+        "payload + orjson": lambda: fast_json([endpoints.response_payload(r) for r in rows]).body,
+    }
+
+    expected = None
+    for label, path in paths.items():
+        body = json.loads(path())
+        if expected is None:
+            expected = body
+        elif body != expected:
+            raise SystemExit("%s produced different JSON" % label)
+        best = min(timeit.repeat(path, number=1, repeat=args.repeat))
+        print("%-28s %8.1f ms per %d responses" % (label, best * 1000, args.count))
+
+
+if __name__ == "__main__":
+    main()
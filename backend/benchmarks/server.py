@@ -0,0 +1,35 @@
+"""Helpers shared by the benchmark scripts."""
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+
+def start_server(url, port, workers=1, **settings):
+    """Start uvicorn on `url` with rate limiting off and extra settings as env vars."""
+    env = dict(os.environ, DATABASE_URL=url, RATE_LIMIT_ENABLED="0", **{k: str(v) for k, v in settings.items()})
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning"], env=env)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            httpx.get("http://127.0.0.1:%d/" % port)
+            return proc
+        except httpx.TransportError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("server did not start")
+
+
+def stop_server(proc):
+    proc.terminate()
+    proc.wait()
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return float("nan")
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p))]
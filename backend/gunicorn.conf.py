@@ -0,0 +1,9 @@
+# Picked up by gunicorn when started from this directory
+import os
+
+def child_exit(server, worker):
+    # Drops the exited worker's live gauges (in flight requests, pool
+    # connections) from /metrics; its counters are kept
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -1,19 +1,30 @@
+from contextlib import asynccontextmanager
+from typing import Optional
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api import endpoints
-from app.db import models, database
-from app.core.limiter import limiter
-from slowapi import _rate_limit_exceeded_handler
+from app.api import endpoints, async_endpoints
+from app.api.pagination import NEXT_CURSOR_HEADER
+from app.db import database, replicas, vote_buffer
+from app.core import config, events, security
+from app.core.metrics import MetricsMiddleware, metrics_endpoint
+from app.core.profiling import ProfilingMiddleware
+from app.core.limiter import limiter, rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
-from slowapi.middleware import SlowAPIMiddleware
+from slowapi.middleware import SlowAPIASGIMiddleware
 
-# Create tables
-models.Base.metadata.create_all(bind=database.engine)
+# The schema is managed by Alembic: run `alembic upgrade head` before starting.
 
-app = FastAPI(title="PoliticaFatos API")
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
-app.add_middleware(SlowAPIMiddleware)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if vote_buffer.buffer is not None:
+        vote_buffer.buffer.start()
+    await events.broker.start()
+    yield
+    await events.broker.stop()
+    # Write out buffered vote counters before the worker exits
+    if vote_buffer.buffer is not None:
+        vote_buffer.buffer.stop()
+    security.shutdown_hash_pool()
 
 # CORS
 origins = [
@@ -23,16 +34,51 @@ origins = [
     "http://localhost:3000",
 ]
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+def create_app(database_url: Optional[str] = None) -> FastAPI:
+    """Build the application without touching the database.
 
-app.include_router(endpoints.router)
+    Settings come from the environment (app/core/config.py); `database_url`
+    overrides DATABASE_URL. The engine is created by the first request that
+    needs it, in the worker serving it, so the app can be built before
+    gunicorn forks its workers (--preload).
+    """
+    if database_url is not None:
+        database.configure(database_url)
 
-@app.get("/")
-def read_root():
-    return {"message": "Welcome to PoliticaFatos API"}
+    app = FastAPI(title="PoliticaFatos API", lifespan=lifespan)
+    app.state.limiter = limiter
+    app.add_exception_handler(RateLimitExceeded, rate_limit_exceeded_handler)
+    # The pure ASGI variant: BaseHTTPMiddleware adds a task group and memory
+    # streams to every request, which adds up over long-lived event streams
+    app.add_middleware(SlowAPIASGIMiddleware)
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=[NEXT_CURSOR_HEADER],
+    )
+    if replicas.replicas:
+        app.add_middleware(replicas.ReadYourWritesMiddleware)
+    if config.METRICS_ENABLED:
+        app.add_middleware(MetricsMiddleware)
+        app.add_route("/metrics", metrics_endpoint, include_in_schema=False)
+    # Added last, so it is outermost and its total covers the other middleware
+    if config.SQL_PROFILE_SAMPLE_RATE > 0:
+        app.add_middleware(ProfilingMiddleware)
+
+    # Routes are matched in registration order, so the async read endpoints
+    # shadow their sync counterparts when enabled.
+    if config.DB_ASYNC:
+        app.include_router(async_endpoints.router)
+    app.include_router(endpoints.router)
+
+    @app.get("/")
+    def read_root():
+        return {"message": "Welcome to PoliticaFatos API"}
+
+    return app
+
+app = create_app()
@@ -0,0 +1,66 @@
+"""Fixtures for the API tests.
+
+Every test that uses the database runs on a throwaway SQLite file and, when
+TEST_DATABASE_URL is set (e.g. a MySQL database that may be wiped), again on
+that database, for what only shows up there, like InnoDB locks.
+"""
+import os
+import tempfile
+
+# Settings are read when app.core.config is first imported
+SQLITE_URL = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db")
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+os.environ["DATABASE_URL"] = SQLITE_URL
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+os.environ["PASSWORD_HASH_WORKERS"] = "0"
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+
+import main  # noqa: E402
+from app.api import auth, endpoints  # noqa: E402
+from app.db import database, models  # noqa: E402
+
+engines = {}
+
+def engine_for(url: str):
+    if url not in engines:
+        # SQLite runs one writer at a time and wakes waiting ones unfairly, so
+        # under the concurrency tests some writers wait longer than its 5 s default
+        connect_args = {"timeout": 60} if url.startswith("sqlite") else {}
+        engines[url] = create_engine(url, poolclass=database.TimedQueuePool, connect_args=connect_args, **database.pool_options())
+    return engines[url]
+
+@pytest.fixture(params=[SQLITE_URL] + ([TEST_DATABASE_URL] if TEST_DATABASE_URL else []), ids=lambda url: url.split(":", 1)[0])
+def engine(request, monkeypatch):
+    engine = engine_for(request.param)
+    # What the app connects to, for this test
+    monkeypatch.setattr(database, "SQLALCHEMY_DATABASE_URL", request.param)
+    monkeypatch.setattr(database, "engine", engine)
+    database.SessionLocal.configure(bind=engine)
+    models.Base.metadata.drop_all(engine)
+    models.Base.metadata.create_all(engine)
+    auth.user_cache.clear()
+    endpoints.response_cache.clear()
+    yield engine
+
+@pytest.fixture
+def db(engine):
+    session = database.SessionLocal()
+    yield session
+    session.close()
+
+@pytest.fixture
+def client(engine):
+    return TestClient(main.app)
+
+def add_user(db, email: str, role=models.Role.regular) -> models.User:
+    user = models.User(name=email.split("@")[0], email=email, password_hash="-", role=role)
+    db.add(user)
+    db.commit()
+    return user
+
+def cookies_of(user: models.User) -> dict:
+    return {"access_token": '"Bearer %s"' % auth.create_access_token({"sub": user.email})}
@@ -0,0 +1,23 @@
+from app.db import models
+
+from conftest import add_user, cookies_of
+
+def test_demotion_applies_while_the_user_is_cached(db, client):
+    moderator = add_user(db, "moderator@example.com", models.Role.moderator)
+    cookies = cookies_of(moderator)
+    assert client.get("/moderation/responses/pending", cookies=cookies).status_code == 200
+    assert client.get("/users/me", cookies=cookies).json()["role"] == "moderator"
+
+    # As another worker would: the row changes, this worker's cache is not told
+    moderator.role = models.Role.regular
+    db.commit()
+    assert client.get("/users/me", cookies=cookies).json()["role"] == "moderator"
+    assert client.get("/moderation/responses/pending", cookies=cookies).status_code == 400
+
+def test_promotion_applies_while_the_user_is_cached(db, client):
+    user = add_user(db, "user@example.com")
+    cookies = cookies_of(user)
+    assert client.get("/moderation/responses/pending", cookies=cookies).status_code == 400
+    user.role = models.Role.moderator
+    db.commit()
+    assert client.get("/moderation/responses/pending", cookies=cookies).status_code == 200
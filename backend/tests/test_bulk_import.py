@@ -0,0 +1,23 @@
+"""Bulk import: bad values stop the import with BadRecord and the line."""
+import json
+
+import pytest
+
+from app.db import bulk_import, models
+
+def write_ndjson(path, records):
+    path.write_text("".join(json.dumps(record) + "\n" for record in records), encoding="utf-8")
+    return str(path)
+
+@pytest.mark.parametrize("created_at", [1700000000, ["2024-01-01"], {"at": "2024-01-01"}, "yesterday"])
+def test_bad_timestamps_are_bad_records(engine, db, tmp_path, created_at):
+    importer = bulk_import.Importer(engine, bulk_import.DEFAULT_CHUNK)
+    users = write_ndjson(tmp_path / "users.ndjson", [{"id": 1, "name": "a", "email": "a@example.com", "password_hash": "-"}])
+    discussions = write_ndjson(tmp_path / "discussions.ndjson", [
+        {"id": 1, "title": "t", "content": "c", "user_id": 1, "created_at": "2024-01-01T12:00:00+02:00"},
+        {"id": 2, "title": "t", "content": "c", "user_id": 1, "created_at": created_at},
+    ])
+    assert importer.load("users", users) == 1
+    with pytest.raises(bulk_import.BadRecord, match=r"discussions\.ndjson:2: bad created_at"):
+        importer.load("discussions", discussions)
+    assert db.query(models.Discussion).count() == 0
@@ -0,0 +1,54 @@
+"""PageCache forgets old invalidations without storing pages read before them,
+and drops the groups of a member."""
+from app.core import cache
+
+class Clock:
+    now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def test_invalidations_are_pruned(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    pages = cache.PageCache(maxbytes=1000, ttl=30, name="test")
+    for group in range(1000):
+        pages.invalidate_group(group)
+    clock.now += 31
+    pages.invalidate_group("last")
+    assert list(pages.generations) == ["last"]
+    assert list(pages.invalidated_at) == ["last"]
+
+def test_pruned_group_refuses_pages_read_before_its_invalidation(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    pages = cache.PageCache(maxbytes=1000, ttl=30, name="test")
+    before = pages.generation("a")
+    pages.invalidate_group("a")
+    clock.now += 31
+    pages.invalidate_group("b")
+    assert "a" not in pages.generations
+    pages.set("a", "page", "stale", 1, generation=before)
+    assert pages.get("a", "page") is None
+    pages.set("a", "page", "fresh", 1, generation=pages.generation("a"))
+    assert pages.get("a", "page") == "fresh"
+
+def test_clear_bumps_every_group():
+    pages = cache.PageCache(maxbytes=1000, ttl=30, name="test")
+    generation = pages.generation("a")
+    pages.set("a", "page", "v", 1, generation=generation)
+    pages.clear()
+    pages.set("a", "page", "v", 1, generation=generation)
+    assert pages.get("a", "page") is None
+
+def test_member_of_several_groups_invalidates_each():
+    pages = cache.PageCache(maxbytes=1000, ttl=30, name="test")
+    pages.set("a", "page", "a", 1, members=[1, "shared"])
+    pages.set("b", "page", "b", 1, members=[2, "shared"])
+    pages.set("c", "page", "c", 1, members=[3])
+    pages.invalidate_members(["shared"])
+    assert pages.get("a", "page") is None
+    assert pages.get("b", "page") is None
+    assert pages.get("c", "page") == "c"
+    assert "shared" not in pages.member_groups
+    assert pages.member_groups == {3: {"c"}}
@@ -0,0 +1,22 @@
+"""The connection slots work on every event loop the app runs on."""
+import asyncio
+
+from app.db import database
+
+async def contend():
+    """Two sessions for one slot: the second waits for the first."""
+    async with database.primary_session():
+        second = asyncio.ensure_future(enter())
+        await asyncio.sleep(0.05)
+        assert not second.done()
+    await asyncio.wait_for(second, 5)
+
+async def enter():
+    async with database.primary_session():
+        pass
+
+def test_slots_are_per_event_loop(engine, monkeypatch):
+    monkeypatch.setattr(database, "db_slots", database.Slots(1))
+    # Each asyncio.run is a new loop, as each TestClient is
+    asyncio.run(contend())
+    asyncio.run(contend())
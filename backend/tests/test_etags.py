@@ -0,0 +1,74 @@
+"""The list endpoints answer If-None-Match from version counters, and every
+change to what they list moves their ETag."""
+from app.api import endpoints
+from app.db import models
+
+from conftest import add_user, cookies_of
+
+def listing_etag(client):
+    r = client.get("/discussions/")
+    assert r.status_code == 200, r.text
+    return r.headers["etag"]
+
+def test_discussions_etag_follows_the_listing(engine, db, client):
+    admin = cookies_of(add_user(db, "admin@example.com", models.Role.admin))
+    reader = cookies_of(add_user(db, "reader@example.com"))
+    etag = listing_etag(client)
+    assert client.get("/discussions/", headers={"If-None-Match": etag}).status_code == 304
+
+    changes = [
+        lambda: client.post("/discussions/", json={"title": "t", "content": "c"}, cookies=admin),
+        lambda: client.post("/discussions/1/responses/", json={"content": "c", "type": "concordo"}, cookies=reader),
+        lambda: client.put("/discussions/1/finish", cookies=admin),
+    ]
+    for change in changes:
+        r = change()
+        assert r.status_code == 200, r.text
+        new_etag = listing_etag(client)
+        assert new_etag != etag
+        etag = new_etag
+    assert client.get("/discussions/", headers={"If-None-Match": etag}).status_code == 304
+
+def test_cached_responses_follow_writes_of_other_workers(engine, db, client):
+    admin = add_user(db, "admin@example.com", models.Role.admin)
+    discussion = models.Discussion(title="t", content="c", user_id=admin.id)
+    db.add(discussion)
+    db.commit()
+    response = models.Response(discussion_id=discussion.id, user_id=admin.id, content="c",
+                               type=models.ResponseType.concordo, status_aprovacao=models.ApprovalStatus.aprovada)
+    db.add(response)
+    db.commit()
+    url = "/discussions/%d/responses/" % discussion.id
+    first = client.get(url)
+    assert first.json()[0]["upvotes"] == 0
+
+    # As another worker would: the rows change, this worker's cache is not told
+    response.upvotes = 1
+    discussion.responses_version += 1
+    db.commit()
+    second = client.get(url)
+    assert second.headers["etag"] != first.headers["etag"]
+    assert second.json()[0]["upvotes"] == 1
+
+def test_renaming_drops_only_the_pages_listing_the_author(engine, db, client):
+    admin = add_user(db, "admin@example.com", models.Role.admin)
+    author = add_user(db, "author@example.com")
+    discussions = [models.Discussion(title="t", content="c", user_id=admin.id) for _ in range(3)]
+    db.add_all(discussions)
+    db.commit()
+    for discussion, user in zip(discussions, (author, author, admin)):
+        db.add(models.Response(discussion_id=discussion.id, user_id=user.id, content="c",
+                               type=models.ResponseType.concordo, status_aprovacao=models.ApprovalStatus.aprovada))
+    db.commit()
+    urls = ["/discussions/%d/responses/" % discussion.id for discussion in discussions]
+    for url in urls:
+        client.get(url)
+        client.get(url + "?tree=true")
+    assert set(endpoints.response_cache.groups) == {discussion.id for discussion in discussions}
+
+    r = client.put("/users/me", json={"name": "Renamed"}, cookies=cookies_of(author))
+    assert r.status_code == 200, r.text
+    assert set(endpoints.response_cache.groups) == {discussions[2].id}
+    for url in urls[:2]:
+        assert client.get(url).json()[0]["author"]["name"] == "Renamed"
+        assert client.get(url + "?tree=true").json()[0]["author"]["name"] == "Renamed"
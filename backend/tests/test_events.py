@@ -0,0 +1,4 @@
+"""The event stream of a discussion that does not exist is a 404, not an idle stream."""
+def test_events_of_unknown_discussion(engine, client):
+    r = client.get("/discussions/999/events")
+    assert r.status_code == 404
@@ -0,0 +1,80 @@
+"""Rate limit keys, and the windows shared by the workers."""
+import asyncio
+import os
+import threading
+from datetime import timedelta
+
+import pytest
+from limits import parse
+from limits.strategies import SlidingWindowCounterRateLimiter
+from starlette.requests import Request
+
+from app.api import auth
+from app.core import limiter
+from app.db import database, rate_limits
+
+LIMIT = parse("3/minute")
+
+def test_expired_token_still_names_its_user():
+    token = auth.create_access_token({"sub": "user@example.com"}, expires_delta=timedelta(minutes=-1))
+    assert limiter.token_subject("Bearer " + token) == "user@example.com"
+
+def test_forged_token_names_no_one():
+    token = auth.create_access_token({"sub": "user@example.com"})
+    assert limiter.token_subject("Bearer " + token[:-2] + "xx") is None
+
+def hits_of_two_workers(first, second):
+    workers = [SlidingWindowCounterRateLimiter(first), SlidingWindowCounterRateLimiter(second)]
+    return [workers[i % 2].hit(LIMIT, "user:a") for i in range(6)]
+
+def test_database_window_is_shared_by_two_workers(engine):
+    first, second = rate_limits.DatabaseStorage("database://"), rate_limits.DatabaseStorage("database://")
+    assert hits_of_two_workers(first, second) == [True] * 3 + [False] * 3
+
+def test_database_storage_has_its_own_pool(engine):
+    storage = rate_limits.DatabaseStorage("database://")
+    assert storage.engine is not database.get_engine()
+    assert storage.engine.pool.size() == rate_limits.config.RATE_LIMIT_DB_POOL_SIZE
+
+@pytest.fixture
+def redis_storages():
+    redis = pytest.importorskip("redis")
+    from limits.storage import RedisStorage
+
+    url = os.getenv("TEST_REDIS_URL")
+    if url:
+        storages = [RedisStorage(url), RedisStorage(url)]
+        storages[0].reset()
+        return storages
+    fakeredis = pytest.importorskip("fakeredis")
+    # limits runs Lua scripts, which fakeredis needs lupa for
+    pytest.importorskip("lupa")
+    server = fakeredis.FakeServer()
+    return [
+        RedisStorage("redis://", connection_pool=redis.ConnectionPool(connection_class=fakeredis.FakeConnection, server=server))
+        for _ in range(2)
+    ]
+
+def test_redis_window_is_shared_by_two_workers(redis_storages):
+    assert hits_of_two_workers(*redis_storages) == [True] * 3 + [False] * 3
+
+def checking_threads(storage_uri: str) -> list:
+    threads = []
+
+    def key(request):
+        threads.append(threading.current_thread())
+        return "k"
+
+    shared = limiter.Limiter(key_func=key, storage_uri=storage_uri)
+
+    @shared.limit("5/minute")
+    async def endpoint(request: Request):
+        return "ok"
+
+    request = Request({"type": "http", "method": "GET", "path": "/x", "headers": [], "query_string": b""})
+    assert asyncio.run(endpoint(request=request)) == "ok"
+    return threads
+
+def test_async_endpoints_check_shared_limits_in_the_threadpool(engine):
+    assert checking_threads("database://") and threading.main_thread() not in checking_threads("database://")
+    assert checking_threads("memory://") == [threading.main_thread()]
@@ -0,0 +1,65 @@
+"""Bulk moderation reports a result per id and keeps the discussion's
+counters in step with the responses' statuses."""
+from collections import Counter
+
+from app.db import models
+
+from conftest import add_user, cookies_of
+
+def counters(client, discussion_id):
+    discussion = client.get("/discussions/%d" % discussion_id).json()
+    return {name: discussion[name] for name in ("pending_count", "agree_count", "disagree_count")}
+
+def recount(db, discussion_id):
+    """The counters as they should be, from the responses themselves."""
+    db.expire_all()
+    statuses = Counter(
+        "pending_count" if status == models.ApprovalStatus.pendente else
+        "agree_count" if type == models.ResponseType.concordo else "disagree_count"
+        for type, status in db.query(models.Response.type, models.Response.status_aprovacao).filter(
+            models.Response.discussion_id == discussion_id,
+            models.Response.status_aprovacao != models.ApprovalStatus.rejeitada)
+    )
+    return {name: statuses[name] for name in ("pending_count", "agree_count", "disagree_count")}
+
+def bulk(client, cookies, ids, action):
+    r = client.post("/moderation/responses/bulk", json={"ids": ids, "action": action}, cookies=cookies)
+    assert r.status_code == 200, r.text
+    return [(result["id"], result["result"]) for result in r.json()["results"]]
+
+def test_bulk_results_and_counters_stay_consistent(engine, db, client):
+    admin = cookies_of(add_user(db, "admin@example.com", models.Role.admin))
+    author = cookies_of(add_user(db, "author@example.com"))
+    discussion_id = client.post("/discussions/", json={"title": "t", "content": "c"}, cookies=admin).json()["id"]
+    ids = [
+        client.post("/discussions/%d/responses/" % discussion_id, json={"content": "c", "type": type},
+                    cookies=author).json()["id"]
+        for type in ("concordo", "concordo", "concordo", "discordo", "discordo")
+    ]
+    assert counters(client, discussion_id) == {"pending_count": 5, "agree_count": 0, "disagree_count": 0}
+    missing = max(ids) + 1
+
+    # Repeated ids are reported once, unknown ones as not_found
+    assert bulk(client, admin, [ids[0], ids[1], ids[3], missing, ids[0]], "approve") == [
+        (ids[0], "updated"), (ids[1], "updated"), (ids[3], "updated"), (missing, "not_found")]
+    assert counters(client, discussion_id) == recount(db, discussion_id) == {
+        "pending_count": 2, "agree_count": 2, "disagree_count": 1}
+
+    # Already approved: unchanged, and counted once
+    assert bulk(client, admin, [ids[0], ids[2]], "approve") == [(ids[0], "unchanged"), (ids[2], "updated")]
+    assert counters(client, discussion_id) == recount(db, discussion_id) == {
+        "pending_count": 1, "agree_count": 3, "disagree_count": 1}
+
+    # Rejecting approved and pending responses alike
+    assert bulk(client, admin, [ids[1], ids[3], ids[4]], "reject") == [
+        (ids[1], "updated"), (ids[3], "updated"), (ids[4], "updated")]
+    assert bulk(client, admin, [ids[4], missing], "reject") == [(ids[4], "unchanged"), (missing, "not_found")]
+    assert counters(client, discussion_id) == recount(db, discussion_id) == {
+        "pending_count": 0, "agree_count": 2, "disagree_count": 0}
+    assert {r["id"] for r in client.get("/discussions/%d/responses/" % discussion_id).json()} == {ids[0], ids[2]}
+
+def test_pending_ages_must_not_be_negative(engine, db, client):
+    admin = cookies_of(add_user(db, "admin@example.com", models.Role.admin))
+    for param in ("min_age_minutes", "max_age_minutes"):
+        assert client.get("/moderation/responses/pending", params={param: -1}, cookies=admin).status_code == 422
+        assert client.get("/moderation/responses/pending", params={param: 0}, cookies=admin).status_code == 200
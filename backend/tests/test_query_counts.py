@@ -0,0 +1,67 @@
+"""The list endpoints run the same number of statements whatever the page
+holds: no per-row lazy loads of authors, replies or the reader's votes."""
+import pytest
+from sqlalchemy import event
+
+from app.api import auth, endpoints
+from app.db import models
+
+from conftest import add_user, cookies_of
+
+def seed(db, responses: int):
+    """A discussion with `responses` approved and as many pending responses,
+    each by a different author, with replies and the reader's votes."""
+    admin = add_user(db, "admin@example.com", models.Role.admin)
+    reader = add_user(db, "reader@example.com")
+    discussion = models.Discussion(title="t", content="c", user_id=admin.id)
+    db.add(discussion)
+    db.commit()
+    for i in range(responses):
+        author = add_user(db, "author%d@example.com" % i)
+        for status in (models.ApprovalStatus.aprovada, models.ApprovalStatus.pendente):
+            db.add(models.Response(discussion_id=discussion.id, user_id=author.id, content="c%d" % i,
+                                   type=models.ResponseType.concordo, status_aprovacao=status))
+    db.commit()
+    approved = db.query(models.Response).filter(models.Response.status_aprovacao == models.ApprovalStatus.aprovada).all()
+    for parent, reply in zip(approved[::2], approved[1::2]):
+        reply.parent_id = parent.id
+    for response in approved:
+        db.add(models.Vote(user_id=reader.id, response_id=response.id, type=models.VoteType.up))
+    db.commit()
+    return discussion.id, cookies_of(reader), cookies_of(admin)
+
+def count_statements(engine, client, url, cookies):
+    # Cold caches: every request pays for its user and its page
+    auth.user_cache.clear()
+    endpoints.response_cache.clear()
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        r = client.get(url, cookies=cookies)
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    assert r.status_code == 200, r.text
+    return len(statements), len(r.json())
+
+@pytest.mark.parametrize("path, who", [
+    ("/discussions/{id}/responses/", "reader"),
+    ("/discussions/{id}/responses/?sort=top", "reader"),
+    ("/discussions/{id}/responses/?tree=true", "reader"),
+    ("/discussions/{id}/responses/", None),
+    ("/moderation/responses/pending", "admin"),
+])
+def test_statements_do_not_grow_with_the_page(engine, db, client, path, who):
+    counts = []
+    for size in (3, 30):
+        models.Base.metadata.drop_all(engine)
+        models.Base.metadata.create_all(engine)
+        discussion_id, reader, admin = seed(db, size)
+        cookies = {"reader": reader, "admin": admin}.get(who, {})
+        statements, rows = count_statements(engine, client, path.format(id=discussion_id), cookies)
+        assert rows > 1
+        counts.append(statements)
+    assert counts[0] == counts[1]
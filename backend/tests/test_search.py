@@ -0,0 +1,74 @@
+"""Search: Portuguese stemming, BM25 ranking, the index following moderation,
+and cursor paging."""
+from app.core import portuguese
+from app.db import models
+
+from conftest import add_user, cookies_of
+
+def test_stemming_conflates_inflections():
+    assert portuguese.terms("políticas") == portuguese.terms("político") == portuguese.terms("politicamente")
+    assert portuguese.terms("eleições") == portuguese.terms("eleição")
+    assert portuguese.terms("Os cidadãos e as leis") == portuguese.terms("cidadão lei")
+
+def setup_discussion(db, client):
+    admin = cookies_of(add_user(db, "admin@example.com", models.Role.admin))
+    author = cookies_of(add_user(db, "author@example.com"))
+    r = client.post("/discussions/", json={"title": "Orçamento", "content": "Debate aberto"}, cookies=admin)
+    assert r.status_code == 200, r.text
+    return r.json()["id"], admin, author
+
+def post_responses(client, discussion_id, author, contents):
+    ids = []
+    for content in contents:
+        r = client.post("/discussions/%d/responses/" % discussion_id, json={"content": content, "type": "concordo"}, cookies=author)
+        assert r.status_code == 200, r.text
+        ids.append(r.json()["id"])
+    return ids
+
+def moderate(client, admin, ids, action):
+    r = client.post("/moderation/responses/bulk", json={"ids": ids, "action": action}, cookies=admin)
+    assert r.status_code == 200, r.text
+
+def search(client, q, **params):
+    r = client.get("/search", params={"q": q, **params})
+    assert r.status_code == 200, r.text
+    return r
+
+def test_ranking_follows_term_frequency_and_rarity(engine, db, client):
+    discussion_id, admin, author = setup_discussion(db, client)
+    ids = post_responses(client, discussion_id, author, [
+        "escolas",
+        "escolas escolas escola",
+        "escolas e hospitais",
+        "hospitais",
+    ])
+    moderate(client, admin, ids, "approve")
+    # More occurrences rank higher; the rarer term outweighs the common one
+    assert [hit["id"] for hit in search(client, "escola").json()] == [ids[1], ids[0], ids[2]]
+    assert [hit["id"] for hit in search(client, "escolas hospitais").json()][0] == ids[2]
+
+def test_rejected_responses_leave_the_index(engine, db, client):
+    discussion_id, admin, author = setup_discussion(db, client)
+    ids = post_responses(client, discussion_id, author, ["bibliotecas públicas"])
+    assert search(client, "biblioteca").json() == []
+    moderate(client, admin, ids, "approve")
+    assert [hit["id"] for hit in search(client, "biblioteca").json()] == ids
+    moderate(client, admin, ids, "reject")
+    assert search(client, "biblioteca").json() == []
+
+def test_cursor_pages_have_no_duplicates_or_gaps(engine, db, client):
+    discussion_id, admin, author = setup_discussion(db, client)
+    # Ties on purpose: several responses share each score
+    ids = post_responses(client, discussion_id, author, ["praça " * (1 + i % 3) for i in range(17)])
+    moderate(client, admin, ids, "approve")
+    everything = [(hit["type"], hit["id"]) for hit in search(client, "praças", limit=100).json()]
+    assert sorted(hit_id for _, hit_id in everything) == sorted(ids)
+
+    paged, cursor = [], None
+    while True:
+        r = search(client, "praças", limit=4, **({"cursor": cursor} if cursor else {}))
+        paged += [(hit["type"], hit["id"]) for hit in r.json()]
+        cursor = r.headers.get("x-next-cursor")
+        if not cursor:
+            break
+    assert paged == everything
@@ -0,0 +1,83 @@
+"""The threaded view: walking every page of the tree reaches each approved
+response exactly once, with the right reply counts."""
+from collections import Counter
+
+import pytest
+
+from app.db import models
+
+from conftest import add_user
+
+def seed(db):
+    """Seven top-level responses: the first with five replies, one of them
+    replied to in turn, the fourth with one, and a pending reply left out.
+    Returns the discussion id and {approved response id: parent id}."""
+    admin = add_user(db, "admin@example.com", models.Role.admin)
+    discussion = models.Discussion(title="t", content="c", user_id=admin.id)
+    db.add(discussion)
+    db.commit()
+
+    def add(parent_id=None, status=models.ApprovalStatus.aprovada):
+        response = models.Response(discussion_id=discussion.id, user_id=admin.id, content="c", parent_id=parent_id,
+                                   type=models.ResponseType.concordo, status_aprovacao=status)
+        db.add(response)
+        db.commit()
+        return response.id
+
+    parents = {add(): None for _ in range(7)}
+    top = list(parents)
+    replies = [add(top[0]) for _ in range(5)]
+    parents.update({id: top[0] for id in replies})
+    parents[add(replies[1])] = replies[1]
+    parents[add(top[3])] = top[3]
+    add(top[3], status=models.ApprovalStatus.pendente)
+    return discussion.id, parents
+
+def get_page(client, discussion_id, replies, parent_id=None, cursor=None):
+    params = {"tree": "true", "limit": 3, "replies": replies}
+    if parent_id is not None:
+        params["parent_id"] = parent_id
+    if cursor:
+        params["cursor"] = cursor
+    r = client.get("/discussions/%d/responses/" % discussion_id, params=params)
+    assert r.status_code == 200, r.text
+    return r.json(), r.headers.get("x-next-cursor")
+
+@pytest.mark.parametrize("replies", [0, 2, 10])
+def test_walking_the_tree_reaches_every_response_once(engine, db, client, replies):
+    discussion_id, parents = seed(db)
+    reply_counts = Counter(parent for parent in parents.values() if parent is not None)
+    seen = []
+
+    def visit(nodes, parent_id):
+        for node in nodes:
+            seen.append(node["id"])
+            assert parents[node["id"]] == parent_id
+            assert node["reply_count"] == reply_counts[node["id"]]
+            assert len(node["replies"]) == min(replies, node["reply_count"])
+            visit(node["replies"], node["id"])
+            if len(node["replies"]) < node["reply_count"]:
+                # The rest of the replies, from past the last one shown
+                assert (node["replies_cursor"] is None) == (not node["replies"])
+                visit_pages(node["id"], node["replies_cursor"])
+            else:
+                assert node["replies_cursor"] is None
+
+    def visit_pages(parent_id, cursor=None):
+        while True:
+            nodes, cursor = get_page(client, discussion_id, replies, parent_id, cursor)
+            assert 0 < len(nodes) <= 3
+            visit(nodes, parent_id)
+            if not cursor:
+                break
+
+    visit_pages(None)
+    assert sorted(seen) == sorted(parents)
+
+def test_tree_refuses_other_sorts(engine, db, client):
+    discussion_id, _ = seed(db)
+    url = "/discussions/%d/responses/" % discussion_id
+    for sort in ("top", "hot"):
+        assert client.get(url, params={"tree": "true", "sort": sort}).status_code == 400
+        assert client.get(url, params={"sort": sort}).status_code == 200
+    assert client.get(url, params={"tree": "true", "sort": "new"}).status_code == 200
@@ -0,0 +1,76 @@
+"""The vote buffer flushes off the request, and its reconciliation does not
+count buffered votes twice."""
+import threading
+
+from app.db import models
+from app.db.vote_buffer import VoteBuffer
+
+from conftest import add_user
+
+class RecordingBuffer(VoteBuffer):
+    def __init__(self):
+        super().__init__(get_engine=None, flush_interval=60, max_pending=2, reconcile_interval=0)
+        self.flushed_by = []
+        self.flushed = threading.Event()
+
+    def flush(self):
+        with self.lock:
+            if not self.pending:
+                return
+            self.pending, self.pending_votes = {}, 0
+        self.flushed_by.append(threading.current_thread().name)
+        self.flushed.set()
+
+def test_full_buffer_wakes_the_flusher():
+    buffer = RecordingBuffer()
+    buffer.start()
+    try:
+        buffer.add(1, 1, 0)
+        assert not buffer.flushed.is_set()
+        buffer.add(2, 0, 1)
+        # Long before flush_interval
+        assert buffer.flushed.wait(5)
+        assert buffer.flushed_by == ["vote-buffer"]
+    finally:
+        buffer.stop()
+
+def test_full_buffer_without_flusher_flushes_inline():
+    buffer = RecordingBuffer()
+    buffer.add(1, 1, 0)
+    buffer.add(2, 0, 1)
+    assert buffer.flushed_by == [threading.current_thread().name]
+
+class FailingBuffer(RecordingBuffer):
+    def flush(self):
+        raise RuntimeError("database is down")
+
+def test_failed_inline_flush_does_not_fail_the_vote(caplog):
+    buffer = FailingBuffer()
+    buffer.add(1, 1, 0)
+    buffer.add(2, 0, 1)
+    assert "Vote buffer flush failed" in caplog.text
+
+def test_reconcile_leaves_buffered_responses(engine, db):
+    author = add_user(db, "author@example.com")
+    discussion = models.Discussion(title="t", content="c", user_id=author.id)
+    db.add(discussion)
+    db.commit()
+    response = models.Response(discussion_id=discussion.id, user_id=author.id, content="c",
+                               type=models.ResponseType.concordo, status_aprovacao=models.ApprovalStatus.aprovada)
+    db.add(response)
+    db.commit()
+    # Committed by the request, its delta still buffered
+    db.add(models.Vote(user_id=author.id, response_id=response.id, type=models.VoteType.up))
+    db.commit()
+    buffer = VoteBuffer(lambda: engine, flush_interval=60, max_pending=100, reconcile_interval=0)
+    buffer.add(response.id, 1, 0)
+    flush = buffer.flush
+    # As if the vote arrived right after reconcile's own flush
+    buffer.flush = lambda: None
+    buffer.reconcile()
+    db.refresh(response)
+    assert response.upvotes == 0
+    buffer.flush = flush
+    buffer.flush()
+    db.refresh(response)
+    assert response.upvotes == 1
@@ -0,0 +1,85 @@
+"""Thousands of votes on one response at once leave its counters equal to
+the votes table: no lost updates, and no deadlock between the vote insert,
+the counters and the discussion stats (InnoDB, with TEST_DATABASE_URL)."""
+import asyncio
+
+import httpx
+from sqlalchemy import func, insert, select
+
+import main
+from app.api import auth
+from app.db import models
+
+from conftest import add_user
+
+VOTERS = 600
+# Five votes per user, in order; all users at once, so the sync endpoint runs
+# them on every threadpool thread in parallel
+SEQUENCES = [
+    ("up", "up", "up", "up", "up"),
+    ("down", "up", "down", "down", "up"),
+    ("up", "down", "down", "up", "up"),
+    ("down", "down", "down", "up", "down"),
+]
+
+def final_vote(sequence):
+    """What the vote endpoint leaves after `sequence`: a repeated vote removes it."""
+    vote = None
+    for vote_type in sequence:
+        vote = None if vote == vote_type else vote_type
+    return vote
+
+def vote_counts(db, response_id):
+    return dict(db.execute(
+        select(models.Vote.type, func.count()).where(models.Vote.response_id == response_id).group_by(models.Vote.type)
+    ).all())
+
+def test_parallel_votes_match_the_votes_table(db):
+    author = add_user(db, "author@example.com")
+    discussion = models.Discussion(title="t", content="c", user_id=author.id)
+    db.add(discussion)
+    db.commit()
+    response = models.Response(discussion_id=discussion.id, user_id=author.id, content="c",
+                               type=models.ResponseType.concordo, status_aprovacao=models.ApprovalStatus.aprovada)
+    db.add(response)
+    db.commit()
+    emails = ["voter%d@example.com" % i for i in range(VOTERS)]
+    db.execute(insert(models.User), [
+        {"name": email, "email": email, "password_hash": "-", "role": models.Role.regular} for email in emails
+    ])
+    db.commit()
+    voters = [{"access_token": '"Bearer %s"' % auth.create_access_token({"sub": email})} for email in emails]
+
+    async def vote(client, sequence):
+        statuses = []
+        for vote_type in sequence:
+            r = await client.post("/responses/%d/vote" % response.id, params={"vote_type": vote_type})
+            statuses.append(r.status_code)
+        return statuses
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        clients = [httpx.AsyncClient(transport=transport, base_url="http://test", cookies=cookies) for cookies in voters]
+        try:
+            # Every request finishes before the loop closes, even if one fails
+            return await asyncio.gather(
+                *[vote(client, SEQUENCES[i % len(SEQUENCES)]) for i, client in enumerate(clients)], return_exceptions=True
+            )
+        finally:
+            for client in clients:
+                await client.aclose()
+
+    statuses = asyncio.run(run())
+    errors = [user_statuses for user_statuses in statuses if isinstance(user_statuses, BaseException)]
+    assert not errors, errors[0]
+    assert sum(len(user_statuses) for user_statuses in statuses) >= 3000
+    assert all(status == 200 for user_statuses in statuses for status in user_statuses), statuses
+
+    db.expire_all()
+    counts = vote_counts(db, response.id)
+    stored = db.get(models.Response, response.id)
+    assert (stored.upvotes, stored.downvotes) == (counts.get(models.VoteType.up, 0), counts.get(models.VoteType.down, 0))
+    finals = [final_vote(SEQUENCES[i % len(SEQUENCES)]) for i in range(VOTERS)]
+    assert (stored.upvotes, stored.downvotes) == (finals.count("up"), finals.count("down"))
+    db.refresh(discussion)
+    assert discussion.total_votes == stored.upvotes + stored.downvotes
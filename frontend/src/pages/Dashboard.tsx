@@ -1,7 +1,7 @@
 import React, { useEffect, useState } from 'react';
 import { Tabs, Row, Col, Card, Tag, Button, Typography, Skeleton, message, Modal, Form, Input } from 'antd';
 import { Link } from 'react-router-dom';
-import api from '../services/api';
+import api, { getAllPages } from '../services/api';
 import { DiscussionStatus, Role } from '../types';
 import type { Discussion } from '../types';
 import { TEXTS } from '../utils/textDictionary';
@@ -22,8 +22,7 @@ const Dashboard: React.FC = () => {
 
     const fetchDiscussions = async () => {
         try {
-            const response = await api.get<Discussion[]>('/discussions/');
-            setDiscussions(response.data);
+            setDiscussions(await getAllPages<Discussion>('/discussions/'));
         } catch (error) {
             message.error(TEXTS.ERROR_GENERIC);
         } finally {
@@ -68,6 +67,14 @@ const Dashboard: React.FC = () => {
                                 }}>
                                     {item.content}
                                 </div>
+                                <div style={{ display: 'flex', gap: 12, marginBottom: 16, fontSize: '13px', color: 'var(--text-secondary)' }}>
+                                    <span style={{ color: '#52c41a' }}>{item.agree_count} concordam</span>
+                                    <span style={{ color: '#ff4d4f' }}>{item.disagree_count} discordam</span>
+                                    <span>{item.total_votes} votos</span>
+                                    {user && user.role !== Role.REGULAR && item.pending_count > 0 && (
+                                        <span>{item.pending_count} pendentes</span>
+                                    )}
+                                </div>
                             </div>
                             <div style={{ display: 'flex', justifyContent: 'space-between', alignItems: 'center', marginTop: 'auto' }}>
                                 <Tag
@@ -77,7 +84,7 @@ const Dashboard: React.FC = () => {
                                     {item.status.toUpperCase()}
                                 </Tag>
                                 <span style={{ fontSize: '12px', color: 'var(--text-secondary)' }}>
-                                    {new Date(item.created_at).toLocaleDateString()}
+                                    {new Date(item.last_activity_at ?? item.created_at).toLocaleDateString()}
                                 </span>
                             </div>
                         </Card>
@@ -2,7 +2,7 @@ import React, { useEffect, useState } from 'react';
 import { useParams } from 'react-router-dom';
 import { Row, Col, Card, Typography, Tag, Divider, Button, Form, Input, Radio, message, Badge, Tooltip, Space } from 'antd';
 import { CheckCircleOutlined, LikeOutlined, DislikeOutlined, MessageOutlined } from '@ant-design/icons';
-import api from '../services/api';
+import api, { getAllPages } from '../services/api';
 import { ResponseType, DiscussionStatus, Role } from '../types';
 import type { Discussion, Response } from '../types';
 import { TEXTS } from '../utils/textDictionary';
@@ -19,6 +19,7 @@ interface ResponseItemProps {
     onCancelReply: () => void;
     onSubmitReply: (values: any) => void;
     submittingReply: boolean;
+    onLoadReplies: (item: Response) => void;
 
     containerStyle?: React.CSSProperties;
     cardStyle?: React.CSSProperties;
@@ -32,6 +33,7 @@ const ResponseItem: React.FC<ResponseItemProps> = ({
     onCancelReply,
     onSubmitReply,
     submittingReply,
+    onLoadReplies,
 
     containerStyle,
     cardStyle
@@ -163,6 +165,7 @@ const ResponseItem: React.FC<ResponseItemProps> = ({
                                 onCancelReply={onCancelReply}
                                 onSubmitReply={onSubmitReply}
                                 submittingReply={submittingReply}
+                                onLoadReplies={onLoadReplies}
 
                                 containerStyle={replyContainerStyle}
                                 cardStyle={replyCardStyle}
@@ -171,10 +174,48 @@ const ResponseItem: React.FC<ResponseItemProps> = ({
                     })}
                 </div>
             )}
+            {(item.reply_count ?? 0) > (item.replies?.length ?? 0) && (
+                <Button type="link" size="small" style={{ marginLeft: 32 }} onClick={() => onLoadReplies(item)}>
+                    Ver mais {(item.reply_count ?? 0) - (item.replies?.length ?? 0)} respostas
+                </Button>
+            )}
         </div>
     );
 };
 
+// The responses are kept as the server's threaded view: top-level responses
+// with their replies nested, the first few of each loaded up front.
+const mapTree = (list: Response[], update: (r: Response) => Response): Response[] =>
+    list.map(r => update(r.replies ? { ...r, replies: mapTree(r.replies, update) } : r));
+
+const containsResponse = (list: Response[], responseId: number): boolean =>
+    list.some(r => r.id === responseId || containsResponse(r.replies ?? [], responseId));
+
+const insertResponse = (list: Response[], added: Response): Response[] => {
+    const node: Response = { ...added, replies: [], reply_count: 0, replies_cursor: null };
+    if (containsResponse(list, added.id)) return list;
+    if (!added.parent_id) return [...list, node];
+    return mapTree(list, r => {
+        if (r.id !== added.parent_id) return r;
+        const replies = r.replies ?? [];
+        const count = r.reply_count ?? replies.length;
+        // Only append when every earlier reply is loaded, so the order holds
+        return { ...r, reply_count: count + 1, replies: count === replies.length ? [...replies, node] : replies };
+    });
+};
+
+const removeResponse = (list: Response[], responseId: number): Response[] =>
+    list.filter(r => r.id !== responseId).map(r => {
+        const replies = r.replies ?? [];
+        if (!containsResponse(replies, responseId)) return r;
+        const direct = replies.some(reply => reply.id === responseId);
+        return {
+            ...r,
+            replies: removeResponse(replies, responseId),
+            reply_count: (r.reply_count ?? replies.length) - (direct ? 1 : 0),
+        };
+    });
+
 const DiscussionDetail: React.FC = () => {
     const { id } = useParams<{ id: string }>();
     const { user } = useAuthStore();
@@ -192,14 +233,41 @@ const DiscussionDetail: React.FC = () => {
         fetchData();
     }, [id]);
 
+    // Live updates pushed by the server instead of refetching the whole list
+    useEffect(() => {
+        const source = new EventSource(`${api.defaults.baseURL}/discussions/${id}/events`);
+        const on = (type: string, handle: (data: any) => void) =>
+            source.addEventListener(type, (event) => handle(JSON.parse((event as MessageEvent).data)));
+
+        on('response_approved', (approved: Response) => {
+            setResponses(prev => insertResponse(prev, approved));
+        });
+        on('response_removed', ({ id: removedId }: { id: number }) => {
+            setResponses(prev => removeResponse(prev, removedId));
+        });
+        on('votes', ({ response_id, upvotes, downvotes }: { response_id: number; upvotes: number; downvotes: number }) => {
+            setResponses(prev => mapTree(prev, r => r.id === response_id ? { ...r, upvotes, downvotes } : r));
+        });
+        on('discussion_finished', (finished: Discussion) => setDiscussion(finished));
+
+        // Events sent while the stream was down are lost, so catch up after a reconnect
+        let connected = false;
+        source.onopen = () => {
+            if (connected) fetchData();
+            connected = true;
+        };
+
+        return () => source.close();
+    }, [id]);
+
     const fetchData = async () => {
         try {
-            const [discRes, respRes] = await Promise.all([
+            const [discRes, allResponses] = await Promise.all([
                 api.get<Discussion>(`/discussions/${id}`),
-                api.get<Response[]>(`/discussions/${id}/responses/`)
+                getAllPages<Response>(`/discussions/${id}/responses/`, { tree: true })
             ]);
             setDiscussion(discRes.data);
-            setResponses(respRes.data);
+            setResponses(allResponses);
         } catch (error) {
             message.error(TEXTS.ERROR_GENERIC);
         } finally {
@@ -305,38 +373,23 @@ const DiscussionDetail: React.FC = () => {
         }
     };
 
-    // Organize responses: Top level only for the columns, replies nested inside
-    const organizeResponses = (allResponses: Response[]) => {
-        const map = new Map<number, Response>();
-        const roots: Response[] = [];
-
-        // Deep copy to avoid mutating state directly if we were using it elsewhere
-        // But here we are building a new structure for render
-        const allResponsesCopy = JSON.parse(JSON.stringify(allResponses));
-
-        // Initialize map
-        allResponsesCopy.forEach((r: Response) => {
-            r.replies = []; // Ensure replies array exists
-            map.set(r.id, r);
-        });
-
-        allResponsesCopy.forEach((r: Response) => {
-            if (r.parent_id) {
-                const parent = map.get(r.parent_id);
-                if (parent) {
-                    parent.replies?.push(r);
-                }
-            } else {
-                roots.push(r);
-            }
-        });
-
-        return roots;
+    const handleLoadReplies = async (parent: Response) => {
+        try {
+            const res = await api.get<Response[]>(`/discussions/${id}/responses/`, {
+                params: { tree: true, parent_id: parent.id, cursor: parent.replies_cursor ?? undefined }
+            });
+            setResponses(prev => mapTree(prev, r => r.id !== parent.id ? r : {
+                ...r,
+                replies: [...(r.replies ?? []), ...res.data.filter(reply => !containsResponse(r.replies ?? [], reply.id))],
+                replies_cursor: res.headers['x-next-cursor'] ?? null,
+            }));
+        } catch (error) {
+            message.error(TEXTS.ERROR_GENERIC);
+        }
     };
 
-    const rootResponses = organizeResponses(responses);
-    const agreeResponses = rootResponses.filter(r => r.type === ResponseType.CONCORDO);
-    const disagreeResponses = rootResponses.filter(r => r.type === ResponseType.DISCORDO);
+    const agreeResponses = responses.filter(r => r.type === ResponseType.CONCORDO);
+    const disagreeResponses = responses.filter(r => r.type === ResponseType.DISCORDO);
 
     if (loading || !discussion) return <div style={{ padding: 24 }}>Carregando...</div>;
 
@@ -377,6 +430,7 @@ const DiscussionDetail: React.FC = () => {
                             onCancelReply={() => setReplyingTo(null)}
                             onSubmitReply={handleReplySubmit}
                             submittingReply={submittingReply}
+                            onLoadReplies={handleLoadReplies}
 
                         />
                     ))}
@@ -393,6 +447,7 @@ const DiscussionDetail: React.FC = () => {
                             onCancelReply={() => setReplyingTo(null)}
                             onSubmitReply={handleReplySubmit}
                             submittingReply={submittingReply}
+                            onLoadReplies={handleLoadReplies}
 
                         />
                     ))}
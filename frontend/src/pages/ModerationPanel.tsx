@@ -7,19 +7,29 @@ import { TEXTS } from '../utils/textDictionary';
 
 const { Title } = Typography;
 
+type ModerationAction = 'approve' | 'reject';
+
+interface BulkModerationResult {
+    results: { id: number; result: 'updated' | 'unchanged' | 'not_found' }[];
+}
+
 const ModerationPanel: React.FC = () => {
     const [responses, setResponses] = useState<Response[]>([]);
+    const [cursor, setCursor] = useState<string | undefined>();
+    const [selected, setSelected] = useState<React.Key[]>([]);
     const [loading, setLoading] = useState(true);
 
     useEffect(() => {
         fetchPendingResponses();
     }, []);
 
-    const fetchPendingResponses = async () => {
+    // The queue is served oldest first, one page at a time
+    const fetchPendingResponses = async (after?: string) => {
         setLoading(true);
         try {
-            const res = await api.get<Response[]>('/moderation/responses/pending');
-            setResponses(res.data);
+            const res = await api.get<Response[]>('/moderation/responses/pending', { params: { cursor: after } });
+            setResponses(after ? (current) => [...current, ...res.data] : res.data);
+            setCursor(res.headers['x-next-cursor']);
         } catch (error) {
             message.error(TEXTS.ERROR_GENERIC);
         } finally {
@@ -27,11 +37,16 @@ const ModerationPanel: React.FC = () => {
         }
     };
 
-    const handleAction = async (id: number, action: 'approve' | 'reject') => {
+    const handleAction = (id: number, action: ModerationAction) => handleBulkAction([id], action);
+
+    const handleBulkAction = async (ids: number[], action: ModerationAction) => {
         try {
-            await api.put(`/moderation/responses/${id}/${action}`);
+            const res = await api.post<BulkModerationResult>('/moderation/responses/bulk', { ids, action });
+            // Responses that were moderated meanwhile or deleted leave the queue as well
+            const done = new Set(res.data.results.map((r) => r.id));
+            setResponses((current) => current.filter((r) => !done.has(r.id)));
+            setSelected((current) => current.filter((key) => !done.has(Number(key))));
             message.success(action === 'approve' ? TEXTS.SUCCESS_GENERIC : "Resposta rejeitada.");
-            fetchPendingResponses();
         } catch (error) {
             message.error(TEXTS.ERROR_GENERIC);
         }
@@ -98,12 +113,38 @@ const ModerationPanel: React.FC = () => {
     return (
         <div>
             <Title level={2}>{TEXTS.MODERATION_TITLE}</Title>
+            <Space style={{ marginBottom: 16 }}>
+                <Button
+                    type="primary"
+                    icon={<CheckOutlined />}
+                    disabled={selected.length === 0}
+                    onClick={() => handleBulkAction(selected.map(Number), 'approve')}
+                    style={selected.length ? { backgroundColor: '#52c41a', borderColor: '#52c41a' } : undefined}
+                >
+                    {TEXTS.APPROVE_BUTTON} ({selected.length})
+                </Button>
+                <Button
+                    danger
+                    icon={<CloseOutlined />}
+                    disabled={selected.length === 0}
+                    onClick={() => handleBulkAction(selected.map(Number), 'reject')}
+                >
+                    {TEXTS.REJECT_BUTTON} ({selected.length})
+                </Button>
+            </Space>
             <Table
                 dataSource={responses}
                 columns={columns}
                 rowKey="id"
                 loading={loading}
+                rowSelection={{ selectedRowKeys: selected, onChange: setSelected }}
+                pagination={false}
             />
+            {cursor && (
+                <Button style={{ marginTop: 16 }} onClick={() => fetchPendingResponses(cursor)} loading={loading}>
+                    Carregar mais
+                </Button>
+            )}
         </div>
     );
 };
@@ -1,6 +1,6 @@
 import React, { useEffect, useState } from 'react';
 import { Table, Select, message, Typography, Card } from 'antd';
-import api from '../services/api';
+import api, { getAllPages } from '../services/api';
 import { Role, type User } from '../types';
 
 const { Title } = Typography;
@@ -13,8 +13,7 @@ const UserManagement: React.FC = () => {
     const fetchUsers = async () => {
         setLoading(true);
         try {
-            const response = await api.get('/users/');
-            setUsers(response.data);
+            setUsers(await getAllPages<User>('/users/'));
         } catch (error) {
             message.error('Erro ao carregar usuários.');
             console.error(error);
@@ -17,4 +17,17 @@ api.interceptors.response.use(
     }
 );
 
+// List endpoints are cursor paginated; the next page's cursor comes back in
+// the X-Next-Cursor header until the last page.
+export async function getAllPages<T>(url: string, params?: Record<string, unknown>): Promise<T[]> {
+    const items: T[] = [];
+    let cursor: string | undefined;
+    do {
+        const response = await api.get<T[]>(url, { params: { ...params, cursor } });
+        items.push(...response.data);
+        cursor = response.headers['x-next-cursor'];
+    } while (cursor);
+    return items;
+}
+
 export default api;
@@ -39,6 +39,11 @@ export interface Discussion {
     user_id: number;
     created_at: string; // ISO string
     author?: User;
+    agree_count: number;
+    disagree_count: number;
+    pending_count: number;
+    total_votes: number;
+    last_activity_at: string | null;
 }
 
 export interface Response {
@@ -55,6 +60,10 @@ export interface Response {
     created_at: string; // ISO string
     author?: User;
     replies?: Response[];
+    // Threaded view: all replies, of which `replies` holds the first ones,
+    // and the cursor to page the rest
+    reply_count?: number;
+    replies_cursor?: string | null;
     user_vote?: 'up' | 'down' | null;
 }
 